@@ -1,14 +1,13 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 import asyncio
 import json
 import sys
 import os
 from datetime import datetime
-import uuid
 import logging
 
 # Add the project root to the Python path
@@ -17,7 +16,9 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # Import the main orchestrator function
-from main import main as run_main_script
+from src.agents.events import WorkflowEvent
+from backend.jobs import ReportJobManager, ReportJob, JobClient, QueueFullError
+from backend.report_store import ReportStore
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -46,6 +47,8 @@ class ReportRequest(BaseModel):
     query: str = Field(..., description="The user's query for real estate analysis")
     report_date: Optional[str] = Field(None, description="Optional date for the report (e.g., 'March 21, 2024')")
     language: Optional[str] = Field("English", description="Language for the report (English/Persian)")
+    deadline_seconds: Optional[float] = Field(None, description="End-to-end time budget in seconds; defaults to the budget of the query's urgency level")
+    urgency_level: Optional[str] = Field(None, description="Optional urgency (urgent/high/normal/low) to schedule the report at until the query has been analysed")
 
 class ReportResponse(BaseModel):
     status: str
@@ -64,8 +67,144 @@ class HealthResponse(BaseModel):
     timestamp: str
     version: str
 
-# In-memory storage for demo purposes (use a proper database in production)
-report_storage = {}
+# Generated reports, persisted in SQLite and shared by every server worker (see backend/report_store.py)
+report_store = ReportStore()
+
+def store_job_report(job: ReportJob):
+    """Keep the report of a finished job, under the job's id"""
+    report_store.put({
+        "report_id": job.job_id,
+        "query": job.query,
+        "report": job.report,
+        "timestamp": datetime.now().isoformat(),
+        "language": job.language,
+        "work_order": job.work_order
+    })
+
+# Every report runs as a job on a bounded worker pool (see backend/jobs.py)
+job_manager = ReportJobManager(on_success=store_job_report)
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_manager.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_manager.stop()
+
+def queue_full_error(e: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=ErrorResponse(
+            status="error",
+            error="queue_full",
+            message=str(e),
+            timestamp=datetime.now().isoformat()
+        ).dict(),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+# Client tier of each API key, e.g. API_KEY_TIERS="key1:premium,key2:batch";
+# requests without a known key get DEFAULT_CLIENT_TIER
+API_KEY_TIERS = dict(
+    entry.strip().split(":", 1) for entry in os.getenv("API_KEY_TIERS", "").split(",") if ":" in entry
+)
+
+def get_client_tier(http_request: Request) -> Optional[str]:
+    """Tier of the API key a request was made with (X-API-Key header)"""
+    return API_KEY_TIERS.get(http_request.headers.get("X-API-Key", ""))
+
+async def submit_report_job(request: ReportRequest, http_request: Request) -> ReportJob:
+    """Queue a report job at the priority of its client and urgency, or answer 429 if the queue is full"""
+    try:
+        return await job_manager.submit(
+            request.query,
+            request.report_date,
+            request.language,
+            request.deadline_seconds,
+            tier=get_client_tier(http_request),
+            urgency_level=request.urgency_level
+        )
+    except QueueFullError as e:
+        raise queue_full_error(e)
+
+# Streamed token events are batched into SSE frames of at least this many characters,
+# or whatever has arrived after this many seconds
+SSE_MIN_FRAME_CHARS = int(os.getenv("SSE_MIN_FRAME_CHARS", "200"))
+SSE_MAX_FRAME_DELAY = float(os.getenv("SSE_MAX_FRAME_DELAY", "0.25"))
+
+# How often a streaming request checks that its client is still connected
+SSE_DISCONNECT_POLL_INTERVAL = float(os.getenv("SSE_DISCONNECT_POLL_INTERVAL", "1.0"))
+
+async def cancel_on_disconnect(http_request: Request, client: JobClient, interval: float = SSE_DISCONNECT_POLL_INTERVAL):
+    """Detach a request from its report job as soon as its client disconnects, cancelling
+    the job (and every task it started) if no other request is attached to it.
+
+    Polling matters because the research stages can go minutes without sending
+    a frame, so a failed write would only notice the disconnect much later.
+    """
+    job = client.job
+    while not job.finished:
+        if await http_request.is_disconnected():
+            client.release("client disconnected")
+            return
+        try:
+            await asyncio.wait_for(job.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def coalesce_events(events: AsyncIterator[WorkflowEvent], min_chars: int = SSE_MIN_FRAME_CHARS, max_delay: float = SSE_MAX_FRAME_DELAY) -> AsyncIterator[WorkflowEvent]:
+    """Batch consecutive token events of a stage so each SSE frame carries a reasonable amount of text.
+
+    Every other event flushes the pending tokens and is passed through as is.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    buffer: List[WorkflowEvent] = []
+    buffered_chars = 0
+    flush_at = None
+    next_event = None
+
+    def flush() -> WorkflowEvent:
+        return WorkflowEvent(type="token", stage=buffer[0].stage, data="".join(e.data for e in buffer))
+
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(flush_at - loop.time(), 0) if buffer else None
+            done, _ = await asyncio.wait({next_event}, timeout=timeout)
+
+            if next_event in done:
+                try:
+                    event = next_event.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    next_event = None
+                if event.type != "token" or (buffer and event.stage != buffer[0].stage):
+                    if buffer:
+                        yield flush()
+                        buffer, buffered_chars = [], 0
+                    if event.type != "token":
+                        yield event
+                        continue
+                if not buffer:
+                    flush_at = loop.time() + max_delay
+                buffer.append(event)
+                buffered_chars += len(event.data)
+                if buffered_chars < min_chars:
+                    continue
+
+            # Enough text, or the oldest buffered token has waited long enough
+            yield flush()
+            buffer, buffered_chars = [], 0
+
+        if buffer:
+            yield flush()
+    finally:
+        if next_event is not None:
+            next_event.cancel()
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -77,97 +216,91 @@ async def health_check():
     )
 
 @app.post("/generate_report", response_model=ReportResponse)
-async def generate_report(request: ReportRequest):
+async def generate_report(request: ReportRequest, http_request: Request):
     """Generate a complete real estate analysis report"""
+    job = await submit_report_job(request, http_request)
+    client = JobClient(job_manager, job)
+
+    logger.info(f"Generating report {job.job_id} for query: {request.query}")
+    watcher = asyncio.create_task(cancel_on_disconnect(http_request, client))
     try:
-        report_id = str(uuid.uuid4())
-        logger.info(f"Generating report {report_id} for query: {request.query}")
-        
-        # Run the async generator and collect all chunks
-        full_report_chunks = []
-        async for chunk in run_main_script(request.query, request.report_date):
-            full_report_chunks.append(chunk)
-        
-        final_report = "".join(full_report_chunks)
-        
-        # Store the report
-        report_data = {
-            "report_id": report_id,
-            "query": request.query,
-            "report": final_report,
-            "timestamp": datetime.now().isoformat(),
-            "language": request.language
-        }
-        report_storage[report_id] = report_data
-        
-        logger.info(f"Report {report_id} generated successfully")
-        
-        return ReportResponse(
-            status="success",
-            report_id=report_id,
-            report=final_report,
-            timestamp=datetime.now().isoformat()
-        )
+        await job.wait()
+    finally:
+        watcher.cancel()
+        if not job.finished:
+            client.release("client disconnected")
 
-    except Exception as e:
-        logger.error(f"Error generating report: {str(e)}")
+    if job.report is None:
+        logger.error(f"Error generating report {job.job_id}: {job.error}")
         raise HTTPException(
             status_code=500,
             detail=ErrorResponse(
                 status="error",
                 error="report_generation_failed",
-                message=str(e),
+                message=job.error or f"Report job {job.status}",
                 timestamp=datetime.now().isoformat()
             ).dict()
         )
 
+    logger.info(f"Report {job.job_id} generated successfully")
+
+    return ReportResponse(
+        status="success" if job.status == "succeeded" else "error",
+        report_id=job.job_id,
+        report=job.report,
+        timestamp=datetime.now().isoformat()
+    )
+
 @app.post("/generate_report_stream")
-async def generate_report_stream(request: ReportRequest):
-    """Generate a real estate analysis report with streaming response"""
+async def generate_report_stream(request: ReportRequest, http_request: Request):
+    """Generate a real estate analysis report with streaming response.
+
+    Sends server-sent events: a "metadata" frame, the workflow's typed events
+    (stage_start, stage_end, work_order, advice, token, final_report, error; see
+    src/agents/events.py) and a "complete" frame. If the client disconnects, the
+    report job is cancelled and the work spent on it is added to /metrics.
+    """
+    # Admission happens before the stream starts, so a full queue is a plain 429
+    job = await submit_report_job(request, http_request)
+    client = JobClient(job_manager, job)
+
     try:
         async def generate_stream():
-            report_id = str(uuid.uuid4())
-            logger.info(f"Streaming report {report_id} for query: {request.query}")
+            logger.info(f"Streaming report {job.job_id} for query: {request.query}")
             
             # Send initial metadata
             initial_data = {
                 "type": "metadata",
-                "report_id": report_id,
+                "report_id": job.job_id,
+                "job_id": job.job_id,
                 "timestamp": datetime.now().isoformat(),
                 "query": request.query
             }
             yield f"data: {json.dumps(initial_data)}\n\n"
             
-            # Stream the report chunks
-            full_report_chunks = []
-            async for chunk in run_main_script(request.query, request.report_date):
-                full_report_chunks.append(chunk)
-                chunk_data = {
-                    "type": "chunk",
-                    "content": chunk,
+            # The job runs on a worker; a disconnect cancels it mid-stage
+            watcher = asyncio.create_task(cancel_on_disconnect(http_request, client))
+            try:
+                # Stream the workflow's typed events as they happen, tokens batched into frames
+                async for event in coalesce_events(job.subscribe()):
+                    yield f"data: {json.dumps(event.to_dict(), ensure_ascii=False)}\n\n"
+                if job.status != "succeeded":
+                    return
+                
+                # Send completion signal
+                completion_data = {
+                    "type": "complete",
+                    "report_id": job.job_id,
                     "timestamp": datetime.now().isoformat()
                 }
-                yield f"data: {json.dumps(chunk_data)}\n\n"
-            
-            # Send completion signal
-            final_report = "".join(full_report_chunks)
-            report_data = {
-                "report_id": report_id,
-                "query": request.query,
-                "report": final_report,
-                "timestamp": datetime.now().isoformat(),
-                "language": request.language
-            }
-            report_storage[report_id] = report_data
-            
-            completion_data = {
-                "type": "complete",
-                "report_id": report_id,
-                "timestamp": datetime.now().isoformat()
-            }
-            yield f"data: {json.dumps(completion_data)}\n\n"
-            
-            logger.info(f"Streaming report {report_id} completed")
+                yield f"data: {json.dumps(completion_data)}\n\n"
+                
+                logger.info(f"Streaming report {job.job_id} completed")
+            finally:
+                watcher.cancel()
+                # Not finished on its own: the client went away
+                if not job.finished:
+                    client.release("client disconnected")
 
         return StreamingResponse(
             generate_stream(),
@@ -191,55 +324,151 @@ async def generate_report_stream(request: ReportRequest):
             ).dict()
         )
 
-@app.get("/reports/{report_id}")
-async def get_report(report_id: str):
-    """Retrieve a previously generated report"""
-    if report_id not in report_storage:
+@app.post("/jobs", status_code=202)
+async def submit_job(request: ReportRequest, http_request: Request):
+    """Queue a report job; poll GET /jobs/{job_id} for its status and progress"""
+    job = await submit_report_job(request, http_request)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "accepted",
+            "job_id": job.job_id,
+            "job_url": f"/jobs/{job.job_id}",
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
+def get_job_or_404(job_id: str) -> ReportJob:
+    job = job_manager.get(job_id)
+    if job is None:
         raise HTTPException(
             status_code=404,
             detail=ErrorResponse(
                 status="error",
-                error="report_not_found",
-                message=f"Report with ID {report_id} not found",
+                error="job_not_found",
+                message=f"Job with ID {job_id} not found",
                 timestamp=datetime.now().isoformat()
             ).dict()
         )
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of a report job; once it succeeded, its report is at /reports/{report_id}"""
+    job = get_job_or_404(job_id)
+    return {
+        "status": "success",
+        "job": job.to_dict(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running report job (identical requests attached to it keep it running)"""
+    job = get_job_or_404(job_id)
+    if not job_manager.release(job_id, "cancelled by client"):
+        raise HTTPException(
+            status_code=409,
+            detail=ErrorResponse(
+                status="error",
+                error="job_not_cancellable",
+                message=f"Job {job_id} is {job.status} and cannot be cancelled",
+                timestamp=datetime.now().isoformat()
+            ).dict()
+        )
+    return {
+        "status": "success",
+        "message": f"Job {job_id} cancelled" if job.status == "cancelled" else f"Detached from job {job_id}; it keeps running for {job.clients} other clients",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Operational metrics of the API"""
+    return {
+        "status": "success",
+        "wasted_work": job_manager.wasted_work.to_dict(),
+        "jobs": job_manager.stats(),
+        "report_store": await asyncio.to_thread(report_store.stats),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def report_not_found(report_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail=ErrorResponse(
+            status="error",
+            error="report_not_found",
+            message=f"Report with ID {report_id} not found",
+            timestamp=datetime.now().isoformat()
+        ).dict()
+    )
+
+@app.get("/reports/search")
+async def search_reports(
+    q: str = Query(..., min_length=1, description="Words to look for in earlier queries, work orders and reports"),
+    limit: int = Query(20, ge=1, le=200, description="Maximum number of results"),
+    language: Optional[str] = Query(None, description="Only reports in this language"),
+    client_type: Optional[str] = Query(None, description="Only reports for this client type")
+):
+    """Full-text search over stored reports, best matches first, with highlighted snippets"""
+    results = await asyncio.to_thread(report_store.search, q, limit, language, client_type)
+    return {
+        "status": "success",
+        "query": q,
+        "results": results,
+        "count": len(results),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/reports/{report_id}")
+async def get_report(report_id: str):
+    """Retrieve a previously generated report"""
+    # SQLite reads and decompression run off the event loop
+    report = await asyncio.to_thread(report_store.get, report_id)
+    if report is None:
+        raise report_not_found(report_id)
     
-    return report_storage[report_id]
+    return report
 
 @app.get("/reports")
-async def list_reports():
-    """List all generated reports"""
-    reports = []
-    for report_id, report_data in report_storage.items():
-        reports.append({
-            "report_id": report_id,
-            "query": report_data["query"],
-            "timestamp": report_data["timestamp"],
-            "language": report_data.get("language", "English")
-        })
+async def list_reports(
+    limit: int = Query(50, ge=1, le=200, description="Reports per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    language: Optional[str] = Query(None, description="Only reports in this language"),
+    client_type: Optional[str] = Query(None, description="Only reports for this client type"),
+    with_total: Optional[bool] = Query(None, description="Count the matching reports (by default only on the first page)")
+):
+    """List generated reports, newest first, a page at a time"""
+    try:
+        reports, next_cursor, total_count = await asyncio.to_thread(
+            report_store.list, limit, cursor, language, client_type, with_total
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=ErrorResponse(
+                status="error",
+                error="invalid_cursor",
+                message=str(e),
+                timestamp=datetime.now().isoformat()
+            ).dict()
+        )
     
     return {
         "status": "success",
         "reports": reports,
-        "total_count": len(reports)
+        "total_count": total_count,
+        "next_cursor": next_cursor
     }
 
 @app.delete("/reports/{report_id}")
 async def delete_report(report_id: str):
     """Delete a specific report"""
-    if report_id not in report_storage:
-        raise HTTPException(
-            status_code=404,
-            detail=ErrorResponse(
-                status="error",
-                error="report_not_found",
-                message=f"Report with ID {report_id} not found",
-                timestamp=datetime.now().isoformat()
-            ).dict()
-        )
+    if not await asyncio.to_thread(report_store.delete, report_id):
+        raise report_not_found(report_id)
     
-    del report_storage[report_id]
     return {
         "status": "success",
         "message": f"Report {report_id} deleted successfully",
@@ -258,8 +487,12 @@ async def root():
             "health": "/health",
             "generate_report": "/generate_report",
             "generate_report_stream": "/generate_report_stream",
+            "jobs": "/jobs",
+            "get_job": "/jobs/{job_id}",
+            "metrics": "/metrics",
             "get_report": "/reports/{report_id}",
             "list_reports": "/reports",
+            "search_reports": "/reports/search",
             "delete_report": "/reports/{report_id}"
         }
     }
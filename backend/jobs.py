@@ -0,0 +1,603 @@
+"""
+Background report jobs with a bounded worker pool and admission control.
+
+Every report, whether requested through the job API or the report endpoints,
+runs as a ReportJob. A fixed number of workers take jobs from a bounded queue;
+when the queue is full new jobs are rejected with an estimate of when to retry,
+so a burst of requests queues up (or is turned away) instead of running
+unbounded inside the web process. Queued jobs are started in weighted fair
+order by priority (client tier and urgency, see src/agents/utils/priority.py),
+and the same priority orders their calls for LLM and search slots.
+
+Identical requests arriving while one is queued or running (same normalized
+query, language and report date) attach to that job instead of starting
+another: they get its events from the start, then live, and the job is only
+cancelled once every client attached to it has let go.
+
+Workers run jobs on the server's event loop by default. With
+JOB_WORKER_PROCESSES=true each job runs in a separate worker process instead,
+its events forwarded back to the server; running process jobs cannot be
+cancelled, only queued ones.
+"""
+
+import os
+import sys
+import re
+import math
+import time
+import uuid
+import unicodedata
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from main import main_events, MarkdownRenderer
+from src.agents.events import (
+    WorkflowEvent, STAGE_WORKFLOW, STAGE_QUERY_UNDERSTANDING, STAGE_STRATEGIC_ADVICE, STAGE_REPORT_GENERATION
+)
+from src.agents.utils.rate_limiter import RunUsage, track_run_usage
+from src.agents.utils.priority import PRIORITY_LEVELS, RunPriority, track_run_priority
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+JOB_WORKER_PROCESSES = os.getenv("JOB_WORKER_PROCESSES", "false").lower() == "true"
+# Finished jobs are kept this long for status queries
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# Share of job starts each priority level gets while jobs of several levels are waiting
+JOB_PRIORITY_WEIGHTS = {
+    level: float(os.getenv(f"JOB_WEIGHT_{level.upper()}", default))
+    for level, default in zip(PRIORITY_LEVELS, ["6", "3", "1"])
+}
+# A job queued longer than this is started next whatever its priority
+JOB_MAX_WAIT_SECONDS = float(os.getenv("JOB_MAX_WAIT_SECONDS", "600"))
+# Attach identical concurrent requests to one job instead of running each
+JOB_COALESCING = os.getenv("JOB_COALESCING", "true").lower() == "true"
+# Assumed job duration for Retry-After estimates until some jobs have finished
+DEFAULT_JOB_SECONDS = 300.0
+
+PIPELINE_STAGES = [STAGE_QUERY_UNDERSTANDING, STAGE_STRATEGIC_ADVICE, STAGE_REPORT_GENERATION]
+FINISHED_STATUSES = {"succeeded", "failed", "cancelled"}
+
+
+# Arabic letter forms typed on some keyboards, as their Persian equivalents
+_PERSIAN_LETTERS = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "\u0640": None, "\u200c": " "})
+
+
+def coalescing_key(query: str, language: Optional[str], report_date: Optional[str]) -> str:
+    """Requests with the same key produce the same report and can share one job."""
+    text = unicodedata.normalize("NFKC", query).translate(_PERSIAN_LETTERS).casefold()
+    text = re.sub(r"\s+", " ", text).strip().rstrip("?؟!.。 ")
+    # main_events dates undated reports today, so they match explicitly dated ones
+    report_date = report_date or datetime.now().strftime("%B %d, %Y")
+    return "\x1f".join([text, (language or "").strip().lower(), report_date.strip()])
+
+
+class QueueFullError(Exception):
+    """The job queue is full; the client should retry after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"The report queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class WastedWorkMetrics:
+    """Work spent on reports that were cancelled (e.g. their client disconnected) before they were done."""
+
+    def __init__(self):
+        self.cancelled_runs = 0
+        self.wasted_seconds = 0.0
+        self.provider_calls: Dict[str, int] = {}
+        self.estimated_tokens: Dict[str, float] = {}
+        self.cancelled_at_stage: Dict[str, int] = {}
+
+    def record(self, stage: Optional[str], elapsed: float, usage: RunUsage):
+        spent = usage.snapshot()
+        self.cancelled_runs += 1
+        self.wasted_seconds += elapsed
+        for provider, calls in spent["calls"].items():
+            self.provider_calls[provider] = self.provider_calls.get(provider, 0) + calls
+        for provider, tokens in spent["tokens"].items():
+            self.estimated_tokens[provider] = self.estimated_tokens.get(provider, 0) + tokens
+        stage = stage or "not_started"
+        self.cancelled_at_stage[stage] = self.cancelled_at_stage.get(stage, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "cancelled_runs": self.cancelled_runs,
+            "wasted_seconds": round(self.wasted_seconds, 1),
+            "provider_calls": self.provider_calls,
+            "estimated_tokens": {provider: int(tokens) for provider, tokens in self.estimated_tokens.items()},
+            "cancelled_at_stage": self.cancelled_at_stage
+        }
+
+
+class ReportJob:
+    """One report request, its progress and its events (kept for late subscribers)."""
+
+    def __init__(
+        self,
+        query: str,
+        report_date: Optional[str] = None,
+        language: Optional[str] = None,
+        deadline_seconds: Optional[float] = None,
+        priority: Optional[RunPriority] = None
+    ):
+        self.job_id = str(uuid.uuid4())
+        self.query = query
+        self.report_date = report_date
+        self.language = language
+        self.deadline_seconds = deadline_seconds
+        self.priority = priority or RunPriority()
+        # Requests attached to the job; it is cancelled once they have all let go
+        self.clients = 1
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.completed_stages: List[str] = []
+        self.partial = False
+        self.work_order: Optional[Dict[str, Any]] = None
+        self.report: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[WorkflowEvent] = []
+        self.usage = RunUsage()
+        self._subscribers: set = set()
+        self._done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._events_forwarded = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def publish(self, event: WorkflowEvent):
+        """Record an event, update the progress it reports and pass it to the subscribers."""
+        self.events.append(event)
+        if event.type == "stage_start" and event.stage != STAGE_WORKFLOW:
+            self.stage = event.stage
+        elif event.type == "work_order":
+            self.work_order = event.data
+            # From here on the job's calls are prioritized by the urgency of its work order
+            self.priority.urgency_level = (event.data or {}).get("urgency_level")
+        elif event.type == "stage_end" and event.stage in PIPELINE_STAGES:
+            self.completed_stages.append(event.stage)
+        elif event.type == "stage_end" and event.stage == STAGE_WORKFLOW:
+            self.partial = bool((event.data or {}).get("partial"))
+        elif event.type == "error":
+            self.error = event.data.get("message")
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def finish(self, status: str, report: Optional[str] = None, error: Optional[str] = None):
+        self.status = status
+        self.report = report
+        self.error = error or self.error
+        self.finished_at = time.time()
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+        self._done.set()
+
+    async def subscribe(self) -> AsyncIterator[WorkflowEvent]:
+        """Every event of the job: those already published, then the rest as they happen."""
+        queue: asyncio.Queue = asyncio.Queue()
+        # Snapshot and registration happen without a suspension point in between,
+        # so no event is missed or delivered twice
+        replay = list(self.events)
+        finished = self.finished
+        if not finished:
+            self._subscribers.add(queue)
+        try:
+            for event in replay:
+                yield event
+            if finished:
+                return
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            self._subscribers.discard(queue)
+
+    async def wait(self):
+        """Wait until the job has finished, whatever the outcome."""
+        await self._done.wait()
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "completed_stages": list(self.completed_stages),
+            "percent": round(100 * len(self.completed_stages) / len(PIPELINE_STAGES)),
+            "partial": self.partial
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed_until = self.finished_at or time.time()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "query": self.query,
+            "priority": self.priority.level,
+            "tier": self.priority.tier,
+            "clients": self.clients,
+            "progress": self.progress(),
+            "report_id": self.job_id if self.status == "succeeded" else None,
+            "error": self.error if self.status == "failed" else None,
+            "created_at": self.created_at,
+            "elapsed_seconds": round(elapsed_until - (self.started_at or elapsed_until), 1),
+        }
+
+
+class JobClient:
+    """One request's attachment to a job, which identical requests may share.
+
+    A request can let go of its job from several places (its disconnect
+    watcher, its own cleanup); the client detaches only once, so it never
+    releases the share of another request attached to the same job.
+    """
+
+    def __init__(self, manager: "ReportJobManager", job: ReportJob):
+        self.manager = manager
+        self.job = job
+        self.detached = False
+
+    def release(self, reason: str = "cancelled") -> bool:
+        """Detach from the job (see ReportJobManager.release); later calls do nothing and return False."""
+        if self.detached:
+            return False
+        self.detached = True
+        return self.manager.release(self.job.job_id, reason)
+
+
+class FairJobQueue:
+    """Bounded queue of report jobs, started in weighted fair order across priority levels.
+
+    Stride scheduling: starting a job advances its level's virtual clock by
+    1/weight and the level furthest behind goes next, so while every level has
+    jobs waiting they start in proportion to JOB_PRIORITY_WEIGHTS and no level
+    is shut out. A job queued for JOB_MAX_WAIT_SECONDS is started next regardless.
+    """
+
+    def __init__(self, maxsize: int, weights: Dict[str, float] = JOB_PRIORITY_WEIGHTS):
+        self.maxsize = maxsize
+        self.weights = {level: max(weights.get(level, 1.0), 0.01) for level in PRIORITY_LEVELS}
+        self._jobs: Dict[str, deque] = {level: deque() for level in PRIORITY_LEVELS}
+        self._passes: Dict[str, float] = {level: 0.0 for level in PRIORITY_LEVELS}
+        self._clock = 0.0
+        self._available = asyncio.Semaphore(0)
+
+    def qsize(self) -> int:
+        return sum(len(jobs) for jobs in self._jobs.values())
+
+    def sizes(self) -> Dict[str, int]:
+        return {level: len(jobs) for level, jobs in self._jobs.items()}
+
+    def put_nowait(self, job: "ReportJob"):
+        if self.qsize() >= self.maxsize:
+            raise asyncio.QueueFull
+        level = job.priority.level
+        if not self._jobs[level]:
+            # A level that was idle does not get to catch up on the turns it missed
+            self._passes[level] = max(self._passes[level], self._clock)
+        self._jobs[level].append(job)
+        self._available.release()
+
+    def reprioritize(self, job: "ReportJob", previous_level: str):
+        """Move a queued job whose priority changed to the queue of its new level."""
+        level = job.priority.level
+        if level == previous_level or job not in self._jobs[previous_level]:
+            return
+        self._jobs[previous_level].remove(job)
+        if not self._jobs[level]:
+            self._passes[level] = max(self._passes[level], self._clock)
+        self._jobs[level].append(job)
+
+    async def get(self) -> "ReportJob":
+        await self._available.acquire()
+        active = [level for level in PRIORITY_LEVELS if self._jobs[level]]
+        oldest = min(active, key=lambda level: self._jobs[level][0].created_at)
+        if time.time() - self._jobs[oldest][0].created_at >= JOB_MAX_WAIT_SECONDS:
+            level = oldest
+        else:
+            level = min(active, key=lambda level: (self._passes[level], PRIORITY_LEVELS.index(level)))
+        self._clock = self._passes[level]
+        self._passes[level] += 1 / self.weights[level]
+        return self._jobs[level].popleft()
+
+
+def run_report_job_in_process(
+    job_id: str,
+    query: str,
+    report_date: Optional[str],
+    deadline_seconds: Optional[float],
+    tier: Optional[str],
+    urgency_level: Optional[str],
+    event_queue
+) -> str:
+    """Worker process entry point: run a report and forward its events to the server."""
+    async def run() -> str:
+        priority = RunPriority(tier, urgency_level)
+        track_run_priority(priority)
+        renderer = MarkdownRenderer()
+        chunks = []
+        async for event in main_events(query, report_date, stream_tokens=True, deadline_seconds=deadline_seconds):
+            if event.type == "work_order":
+                priority.urgency_level = (event.data or {}).get("urgency_level")
+            if event.type != "token":
+                chunks.append(renderer.render(event))
+            event_queue.put((job_id, event.to_dict()))
+        return "".join(chunks)
+
+    try:
+        return asyncio.run(run())
+    finally:
+        # Tells the server every event of the job has been sent
+        event_queue.put((job_id, None))
+
+
+class ReportJobManager:
+    """A bounded queue of report jobs and the workers running them."""
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_size: int = JOB_QUEUE_SIZE,
+        use_processes: bool = JOB_WORKER_PROCESSES,
+        on_success: Optional[Callable[[ReportJob], None]] = None
+    ):
+        self.workers = max(int(workers), 1)
+        self.queue_size = max(int(queue_size), 1)
+        self.use_processes = use_processes
+        self.on_success = on_success
+        self.jobs: Dict[str, ReportJob] = {}
+        # Queued or running job of each coalescing key
+        self._inflight: Dict[str, ReportJob] = {}
+        self.coalesced_requests = 0
+        self.wasted_work = WastedWorkMetrics()
+        self._durations: deque = deque(maxlen=20)
+        self._queue: Optional[FairJobQueue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._process_manager = None
+        self._process_events = None
+        self._forward_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the workers (and the worker processes, if enabled)."""
+        if self._queue is not None:
+            return
+        self._queue = FairJobQueue(self.queue_size)
+        if self.use_processes:
+            context = multiprocessing.get_context("spawn")
+            self._process_manager = context.Manager()
+            self._process_events = self._process_manager.Queue()
+            self._process_pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            self._forward_task = asyncio.create_task(self._forward_process_events())
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Started {self.workers} report workers ({'processes' if self.use_processes else 'in-process'}), queue size {self.queue_size}")
+
+    async def stop(self):
+        """Cancel the workers and their jobs, and shut the worker processes down."""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_events.put(None)
+            await asyncio.gather(self._forward_task, return_exceptions=True)
+            self._process_manager.shutdown()
+            self._process_pool = None
+        self._queue = None
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up: one of the running jobs finishing."""
+        average = sum(self._durations) / len(self._durations) if self._durations else DEFAULT_JOB_SECONDS
+        return max(1, math.ceil(average / self.workers))
+
+    async def submit(
+        self,
+        query: str,
+        report_date: Optional[str] = None,
+        language: Optional[str] = None,
+        deadline_seconds: Optional[float] = None,
+        tier: Optional[str] = None,
+        urgency_level: Optional[str] = None
+    ) -> ReportJob:
+        """Queue a report job, or attach to the queued or running job of an identical request.
+
+        Args:
+            tier: Tier of the requesting client (see priority.py)
+            urgency_level: Urgency to schedule the job at until its work order says otherwise
+
+        Raises:
+            QueueFullError: If the queue is full
+        """
+        await self.start()
+        self._prune()
+        key = coalescing_key(query, language, report_date)
+        existing = self._inflight.get(key) if JOB_COALESCING else None
+        if existing is not None and not existing.finished:
+            return self._attach(existing, RunPriority(tier, urgency_level))
+
+        job = ReportJob(query, report_date, language, deadline_seconds, RunPriority(tier, urgency_level))
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(self.retry_after()) from None
+        self.jobs[job.job_id] = job
+        self._inflight[key] = job
+        logger.info(f"Queued {job.priority.level} priority report job {job.job_id} ({self._queue.qsize()}/{self.queue_size} queued)")
+        return job
+
+    def _attach(self, job: ReportJob, priority: RunPriority) -> ReportJob:
+        job.clients += 1
+        self.coalesced_requests += 1
+        # The shared job runs at the priority of the most demanding client attached to it
+        previous_level = job.priority.level
+        if PRIORITY_LEVELS.index(priority.level) < PRIORITY_LEVELS.index(previous_level):
+            job.priority.tier = priority.tier
+            job.priority.urgency_level = job.priority.urgency_level or priority.urgency_level
+            if job.status == "queued":
+                self._queue.reprioritize(job, previous_level)
+        logger.info(f"Attached request to {job.status} report job {job.job_id} ({job.clients} clients)")
+        return job
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        return self.jobs.get(job_id)
+
+    def release(self, job_id: str, reason: str = "cancelled") -> bool:
+        """Detach a client from a job, cancelling the job once no client is left.
+
+        Returns False if the job has already finished or cannot be cancelled.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.clients > 1:
+            job.clients -= 1
+            logger.info(f"Detached a client from report job {job_id} ({reason}); {job.clients} left")
+            return True
+        if self.cancel(job_id, reason):
+            job.clients = 0
+            return True
+        return False
+
+    def cancel(self, job_id: str, reason: str = "cancelled") -> bool:
+        """Cancel a queued or running job; returns False if it cannot be cancelled."""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.status == "queued":
+            # The worker that dequeues it skips it
+            job.finish("cancelled", error=reason)
+            return True
+        if job._task is None:
+            # Running in a worker process, which cannot be interrupted
+            return False
+        logger.info(f"Cancelling report job {job_id}: {reason}")
+        job._task.cancel()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queued_by_priority": self._queue.sizes() if self._queue is not None else {},
+            "coalesced_requests": self.coalesced_requests,
+            "worker_processes": self.use_processes,
+            "jobs": statuses
+        }
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+        for key in [key for key, job in self._inflight.items() if job.finished]:
+            del self._inflight[key]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.finished:
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                if self.use_processes:
+                    await self._run_in_process(job)
+                else:
+                    job._task = asyncio.create_task(self._run_in_loop(job))
+                    # Waiting (rather than awaiting) keeps a cancelled job from cancelling the worker
+                    await asyncio.wait({job._task})
+                    if job._task.cancelled():
+                        self.wasted_work.record(job.stage, time.time() - job.started_at, job.usage)
+                        job.finish("cancelled")
+                    elif job._task.exception() is not None:
+                        job.finish("failed", error=str(job._task.exception()))
+                if job.status == "succeeded":
+                    self._durations.append(job.finished_at - job.started_at)
+                logger.info(f"Report job {job.job_id} {job.status}")
+            except Exception as e:
+                logger.error(f"Report job {job.job_id} failed: {e}")
+                if not job.finished:
+                    job.finish("failed", error=str(e))
+
+    async def _run_in_loop(self, job: ReportJob):
+        # Provider calls made by the job (and its child tasks) are charged to it
+        track_run_usage(job.usage)
+        track_run_priority(job.priority)
+        renderer = MarkdownRenderer()
+        chunks = []
+        async for event in main_events(job.query, job.report_date, stream_tokens=True, deadline_seconds=job.deadline_seconds):
+            # Tokens are for live subscribers only; the report is built from the complete
+            # advice and final_report events, without the raw advice draft
+            if event.type != "token":
+                chunks.append(renderer.render(event))
+            job.publish(event)
+        await self._complete(job, "".join(chunks))
+
+    async def _complete(self, job: ReportJob, report: Optional[str]):
+        """Finish a job that ran to the end.
+
+        A successful job is first handed to on_success (which persists its
+        report) in a thread, so the event loop is not blocked, and before the
+        job is marked finished, so whoever waits for it finds the report stored.
+        """
+        if not job.error and self.on_success is not None:
+            job.report = report
+            try:
+                await asyncio.to_thread(self.on_success, job)
+            except Exception as e:
+                logger.error(f"Report job {job.job_id}: on_success failed: {e}")
+        job.finish("failed" if job.error else "succeeded", report=report)
+
+    async def _run_in_process(self, job: ReportJob):
+        loop = asyncio.get_running_loop()
+        try:
+            report = await loop.run_in_executor(
+                self._process_pool,
+                run_report_job_in_process,
+                job.job_id, job.query, job.report_date, job.deadline_seconds, job.priority.tier, job.priority.urgency_level, self._process_events
+            )
+        except Exception as e:
+            report = None
+            error = str(e)
+        else:
+            error = None
+        # Deliver the events the process sent before it returned
+        try:
+            await asyncio.wait_for(job._events_forwarded.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning(f"Report job {job.job_id}: not every event arrived from its worker process")
+        if error is not None:
+            job.finish("failed", error=error)
+        else:
+            await self._complete(job, report)
+
+    async def _forward_process_events(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self._process_events.get)
+            if item is None:
+                return
+            job_id, event = item
+            job = self.jobs.get(job_id)
+            if job is None or job.finished:
+                continue
+            if event is None:
+                job._events_forwarded.set()
+            else:
+                job.publish(WorkflowEvent(**event))
@@ -0,0 +1,474 @@
+"""
+Persistent store of generated reports.
+
+Reports live in a SQLite file (in WAL mode, so every uvicorn worker can share
+it) instead of process memory:
+- Report bodies are compressed with zstd, or with zlib when the optional
+  ``zstandard`` package is not installed.
+- The most recently read reports are kept decompressed in a bounded
+  in-memory LRU. Every worker has its own, so a cached report is only served
+  after checking that the same version is still stored (another worker may
+  have deleted or replaced it).
+- Listing is paginated with a cursor over indexed columns, so it stays fast
+  however many reports are stored.
+- Reports older than REPORT_RETENTION_DAYS, or beyond the newest
+  REPORT_MAX_COUNT, are deleted.
+- Queries, work orders and report bodies are indexed for full-text search
+  (SQLite FTS5). Text is normalized for Persian before it is indexed or
+  searched: Arabic letter variants, diacritics, zero-width non-joiners and
+  Persian/Arabic digits. The index is contentless: it keeps no copy of the
+  text, so snippets are cut from the decompressed report, and removing a
+  report from the index means decompressing it once more.
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import base64
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+    print("⚠️  zstandard not found. Install it with 'pip install zstandard' for smaller stored reports; using zlib.")
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+REPORT_STORE_DB_PATH = os.getenv(
+    "REPORT_STORE_DB",
+    os.path.join(project_root, "data", "processed", "reports.sqlite")
+)
+# Reports kept decompressed in memory for repeated reads
+REPORT_STORE_CACHE_SIZE = int(os.getenv("REPORT_STORE_CACHE_SIZE", "128"))
+# Reports older than this many days (0 = forever) or beyond this many (0 = unlimited) are deleted
+REPORT_RETENTION_DAYS = float(os.getenv("REPORT_RETENTION_DAYS", "90"))
+REPORT_MAX_COUNT = int(os.getenv("REPORT_MAX_COUNT", "0"))
+# Retention is applied on startup and every this many stored reports
+RETENTION_INTERVAL = 100
+
+MAX_PAGE_SIZE = 200
+
+# Reports have an explicit integer id (never reused) that the search index refers to
+_CREATE_REPORTS_TABLE = """CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id TEXT NOT NULL UNIQUE,
+    query TEXT NOT NULL,
+    language TEXT,
+    client_type TEXT,
+    timestamp TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    work_order TEXT,
+    codec TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL
+)"""
+
+# Relative weight of a search term found in the query, the work order and the report body
+SEARCH_COLUMN_WEIGHTS = (10.0, 4.0, 1.0)
+SNIPPET_TOKENS = 24
+
+# Arabic letters typed on some keyboards as their Persian equivalents, zero-width
+# (non-)joiners as word breaks, and Persian/Arabic digits as ASCII ones
+_SEARCH_CHAR_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "أ": "ا", "إ": "ا", "ٱ": "ا",
+    "\u200c": " ", "\u200d": "", "\u0640": "",
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+})
+_DIACRITICS = re.compile(r"[\u064b-\u065f\u0670]")
+_SEARCH_TERM = re.compile(r"\w+")
+# A word of the original text, including the marks normalization removes from inside it
+_TEXT_WORD = re.compile(r"[\w\u064b-\u065f\u0670\u0640\u200d]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_for_search(text: str) -> str:
+    """Text as it is indexed and searched: Persian letter variants, digits and case unified."""
+    return _DIACRITICS.sub("", text.translate(_SEARCH_CHAR_MAP)).lower()
+
+
+def search_terms(text: str) -> List[str]:
+    """The distinct normalized terms of a free-text search."""
+    return list(dict.fromkeys(_SEARCH_TERM.findall(normalize_for_search(text))))
+
+
+def _is_prefix_term(term: str) -> bool:
+    # Prefix matches catch Persian suffixes (e.g. "منطقه" finds "منطقه‌ای") and plurals
+    return len(term) >= 3
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """An FTS5 query matching any of the terms of a free-text search (by prefix), or None if it has none."""
+    terms = search_terms(text)
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"*' if _is_prefix_term(term) else f'"{term}"' for term in terms)
+
+
+def _fold(term: str) -> str:
+    """A term without Latin diacritics, as the FTS5 tokenizer (remove_diacritics 2) compares them."""
+    return "".join(char for char in unicodedata.normalize("NFKD", term) if not unicodedata.combining(char))
+
+
+def build_snippet(text: str, terms: List[str], size: int = SNIPPET_TOKENS) -> str:
+    """The run of `size` words of the original text with the most search terms, matches in bold."""
+    terms = [_fold(term) for term in terms]
+
+    def matches(word: str) -> bool:
+        word = _fold(normalize_for_search(word))
+        return any(word.startswith(term) if _is_prefix_term(term) else word == term for term in terms)
+
+    words = list(_TEXT_WORD.finditer(text))
+    if not words:
+        return ""
+    hits = [index for index, word in enumerate(words) if matches(word.group())]
+    start = 0
+    if hits:
+        # The window starting at one of the matches that covers the most matches
+        start = max(hits, key=lambda first: (sum(first <= hit < first + size for hit in hits), -first))
+        # Show a little context before the first match when the text allows it
+        start = max(0, min(start - 3, len(words) - size))
+    end = min(start + size, len(words))
+    hit_set = set(hits)
+    parts, position = [], words[start].start() if start > 0 else 0
+    for index in range(start, end):
+        word = words[index]
+        parts.append(text[position:word.start()])
+        parts.append(f"**{word.group()}**" if index in hit_set else word.group())
+        position = word.end()
+    if end == len(words):
+        parts.append(text[position:])
+    snippet = _WHITESPACE.sub(" ", "".join(parts)).strip()
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(words) else "")
+
+
+def compress(text: str) -> Tuple[str, bytes]:
+    """The codec name and compressed bytes of a report body."""
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def decompress(codec: str, body: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Report was stored with zstd; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(body).decode("utf-8")
+    return body.decode("utf-8")
+
+
+def encode_cursor(created_at: float, report_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, report_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Raises ValueError if the cursor is malformed."""
+    try:
+        created_at, report_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(created_at), str(report_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}") from None
+
+
+class ReportStore:
+    """SQLite-backed report store with an LRU of recently read reports."""
+
+    def __init__(self, db_path: str = REPORT_STORE_DB_PATH, cache_size: int = REPORT_STORE_CACHE_SIZE):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        # report_id -> (created_at of the cached version, report)
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.cache_size = max(cache_size, 0)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._stored_since_retention = 0
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._migrate_to_integer_ids()
+            self._conn.execute(_CREATE_REPORTS_TABLE)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS reports_created ON reports (created_at, report_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS reports_language ON reports (language, created_at, report_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS reports_client_type ON reports (client_type, created_at, report_id)")
+            # Search index, keyed by the report's integer id (never reused, unlike an implicit
+            # rowid). It is contentless: a regular FTS5 table would keep a second, uncompressed
+            # copy of every report. Reports are removed from it by _delete_rows.
+            index_sql = self._conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'reports_fts'"
+            ).fetchone()
+            if index_sql is not None and "content=''" not in index_sql[0].replace(" ", ""):
+                # An index from before it was contentless, kept in step by a trigger
+                self._conn.execute("DROP TRIGGER IF EXISTS reports_fts_delete")
+                self._conn.execute("DROP TABLE reports_fts")
+                print("---Report store: rebuilding the search index without a copy of the reports---")
+                index_sql = None
+            self._conn.execute(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+                    query, work_order, report, content = '', tokenize = 'unicode61 remove_diacritics 2'
+                )"""
+            )
+        if index_sql is None:
+            self._index_existing_reports()
+        self.apply_retention()
+
+    def put(self, report: Dict[str, Any]):
+        """Store a report dict (report_id, query, report, timestamp, language, and optionally work_order)."""
+        work_order = report.get("work_order") or {}
+        codec, body = compress(report["report"])
+        work_order_json = json.dumps(work_order, ensure_ascii=False) if work_order else None
+        with self._lock, self._conn:
+            # Deleting first (rather than INSERT OR REPLACE) drops the old search entry too
+            self._delete_rows("report_id = ?", (report["report_id"],))
+            report_row_id = self._conn.execute(
+                """INSERT INTO reports
+                   (report_id, query, language, client_type, timestamp, created_at, work_order, codec, body, size)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    report["report_id"], report["query"], report.get("language"), work_order.get("client_type"),
+                    report.get("timestamp") or datetime.now().isoformat(), time.time(),
+                    work_order_json, codec, body, len(report["report"])
+                )
+            ).lastrowid
+            self._index(report_row_id, report["query"], work_order_json, report["report"])
+            self._cache.pop(report["report_id"], None)
+            self._stored_since_retention += 1
+            apply_retention = self._stored_since_retention >= RETENTION_INTERVAL
+        if apply_retention:
+            self.apply_retention()
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cached = self._cache.get(report_id)
+            if cached is not None:
+                # Only the version check touches the database; the body is not read again
+                row = self._conn.execute("SELECT created_at FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+                if row is not None and row[0] == cached[0]:
+                    self._cache.move_to_end(report_id)
+                    self.cache_hits += 1
+                    return cached[1]
+                del self._cache[report_id]
+                if row is None:
+                    return None
+            self.cache_misses += 1
+            row = self._conn.execute(
+                "SELECT report_id, query, language, timestamp, work_order, codec, body, created_at FROM reports WHERE report_id = ?",
+                (report_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        report = {
+            "report_id": row[0],
+            "query": row[1],
+            "report": decompress(row[5], row[6]),
+            "timestamp": row[3],
+            "language": row[2],
+            "work_order": json.loads(row[4]) if row[4] else None,
+        }
+        if self.cache_size:
+            with self._lock:
+                self._cache[report_id] = (row[7], report)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return report
+
+    def delete(self, report_id: str) -> bool:
+        with self._lock, self._conn:
+            self._cache.pop(report_id, None)
+            return self._delete_rows("report_id = ?", (report_id,)) > 0
+
+    def _delete_rows(self, where: str, params: Tuple = ()) -> int:
+        """Delete the reports matching a WHERE clause, and their search entries; returns how many.
+
+        A contentless index can only forget a row given the exact text it
+        indexed, so each report is decompressed and normalized again.
+        """
+        rows = self._conn.execute(f"SELECT id, query, work_order, codec, body FROM reports WHERE {where}", params).fetchall()
+        for report_row_id, query, work_order_json, codec, body in rows:
+            self._index(report_row_id, query, work_order_json, decompress(codec, body), command="delete")
+        self._conn.executemany("DELETE FROM reports WHERE id = ?", [(row[0],) for row in rows])
+        return len(rows)
+
+    def list(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        language: Optional[str] = None,
+        client_type: Optional[str] = None,
+        with_total: Optional[bool] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """A page of report summaries, newest first.
+
+        Returns the page, the cursor of the next page (None on the last page)
+        and the number of matching reports. Counting scans every matching
+        report, so by default it is only done for the first page (no cursor);
+        with_total=True or False forces it on or off, and the count is None
+        when it is not done.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        limit = min(max(int(limit), 1), MAX_PAGE_SIZE)
+        filters, params = [], []
+        if language:
+            filters.append("language = ?")
+            params.append(language)
+        if client_type:
+            filters.append("client_type = ?")
+            params.append(client_type)
+        count_where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        count_params = list(params)
+        if cursor:
+            created_at, report_id = decode_cursor(cursor)
+            filters.append("(created_at < ? OR (created_at = ? AND report_id < ?))")
+            params.extend([created_at, created_at, report_id])
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT report_id, query, timestamp, language, client_type, created_at FROM reports {where}
+                    ORDER BY created_at DESC, report_id DESC LIMIT ?""",
+                (*params, limit + 1)
+            ).fetchall()
+            total_count = None
+            if with_total or (with_total is None and not cursor):
+                total_count = self._conn.execute(f"SELECT COUNT(*) FROM reports {count_where}", count_params).fetchone()[0]
+        page = [
+            {"report_id": row[0], "query": row[1], "timestamp": row[2], "language": row[3], "client_type": row[4]}
+            for row in rows[:limit]
+        ]
+        next_cursor = encode_cursor(rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+        return page, next_cursor, total_count
+
+    def _migrate_to_integer_ids(self):
+        """Rebuild a reports table keyed by its TEXT report_id with an explicit integer id.
+
+        The search index used to refer to reports by their implicit rowid, which
+        SQLite may change. The index is dropped and rebuilt from the migrated table.
+        """
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(reports)")]
+        if not columns or "id" in columns:
+            return
+        self._conn.execute("DROP TABLE IF EXISTS reports_fts")
+        self._conn.execute("ALTER TABLE reports RENAME TO reports_without_ids")
+        # Dropping the renamed table below drops its old indexes and trigger too
+        self._conn.execute(_CREATE_REPORTS_TABLE)
+        self._conn.execute(
+            """INSERT INTO reports
+               (report_id, query, language, client_type, timestamp, created_at, work_order, codec, body, size)
+               SELECT report_id, query, language, client_type, timestamp, created_at, work_order, codec, body, size
+               FROM reports_without_ids ORDER BY created_at, report_id"""
+        )
+        self._conn.execute("DROP TABLE reports_without_ids")
+        print("---Report store: added integer ids to the reports table---")
+
+    def _index(self, report_row_id: int, query: str, work_order_json: Optional[str], report: str, command: Optional[str] = None):
+        """Add a report to the search index, or with command="delete" remove it."""
+        values = (normalize_for_search(query), normalize_for_search(work_order_json or ""), normalize_for_search(report))
+        if command is None:
+            self._conn.execute("INSERT INTO reports_fts (rowid, query, work_order, report) VALUES (?, ?, ?, ?)", (report_row_id, *values))
+        else:
+            self._conn.execute(
+                "INSERT INTO reports_fts (reports_fts, rowid, query, work_order, report) VALUES (?, ?, ?, ?, ?)",
+                (command, report_row_id, *values)
+            )
+
+    def _index_existing_reports(self):
+        """Add the reports stored before the search index existed to it."""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT id, query, work_order, codec, body FROM reports").fetchall()
+            for report_row_id, query, work_order_json, codec, body in rows:
+                self._index(report_row_id, query, work_order_json, decompress(codec, body))
+        if rows:
+            print(f"---Report store: indexed {len(rows)} existing reports for search---")
+
+    def search(
+        self,
+        text: str,
+        limit: int = 20,
+        language: Optional[str] = None,
+        client_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Reports matching a free-text search, best first, each with a highlighted snippet of its body.
+
+        Matches in the query weigh more than in the work order, and those more
+        than in the report body (SEARCH_COLUMN_WEIGHTS). Snippets keep the
+        report's own spelling and case.
+        """
+        match_query = build_match_query(text)
+        if match_query is None:
+            return []
+        filters, params = ["reports_fts MATCH ?"], [match_query]
+        if language:
+            filters.append("reports.language = ?")
+            params.append(language)
+        if client_type:
+            filters.append("reports.client_type = ?")
+            params.append(client_type)
+        weights = ", ".join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT reports.report_id, reports.query, reports.timestamp, reports.language, reports.client_type,
+                        bm25(reports_fts, {weights}) AS rank, reports.codec, reports.body
+                    FROM reports_fts JOIN reports ON reports.id = reports_fts.rowid
+                    WHERE {" AND ".join(filters)}
+                    ORDER BY rank LIMIT ?""",
+                (*params, min(max(int(limit), 1), MAX_PAGE_SIZE))
+            ).fetchall()
+        terms = search_terms(text)
+        return [
+            {
+                "report_id": row[0],
+                "query": row[1],
+                "timestamp": row[2],
+                "language": row[3],
+                "client_type": row[4],
+                # bm25 is lower for better matches; flip it so higher scores rank first
+                "score": round(-row[5], 3),
+                "snippet": build_snippet(decompress(row[6], row[7]), terms),
+            }
+            for row in rows
+        ]
+
+    def apply_retention(self) -> int:
+        """Delete the reports the retention policy no longer keeps; returns how many."""
+        deleted = 0
+        with self._lock, self._conn:
+            self._stored_since_retention = 0
+            if REPORT_RETENTION_DAYS > 0:
+                deleted += self._delete_rows("created_at < ?", (time.time() - REPORT_RETENTION_DAYS * 86400,))
+            if REPORT_MAX_COUNT > 0:
+                deleted += self._delete_rows(
+                    """report_id IN (
+                        SELECT report_id FROM reports ORDER BY created_at DESC, report_id DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (REPORT_MAX_COUNT,)
+                )
+            if deleted:
+                self._cache.clear()
+        if deleted:
+            print(f"---Report store: deleted {deleted} reports past retention---")
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM reports").fetchone()
+            stored_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM reports").fetchone()[0]
+        return {
+            "reports": count,
+            "report_chars": size,
+            "stored_bytes": stored_bytes,
+            "codec": "zstd" if zstandard is not None else "zlib",
+            "cache_entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
@@ -80,11 +80,22 @@ async def stream_report(query: str, language: str = "English"):
             ) as response:
                 if response.status == 200:
                     print("🌊 Streaming response:")
-                    async for chunk in response.content.iter_chunked(1024):
-                        chunk_str = chunk.decode('utf-8')
-                        if chunk_str.strip():
-                            print(f"📦 Chunk: {chunk_str[:100]}...")
-                    print("✅ Streaming completed")
+                    async for line in response.content:
+                        line = line.decode('utf-8').strip()
+                        if not line.startswith("data: "):
+                            continue
+                        event = json.loads(line[len("data: "):])
+                        if event["type"] == "stage_start":
+                            print(f"\n▶️ {event['stage']} started")
+                        elif event["type"] == "stage_end":
+                            print(f"\n⏱️ {event['stage']} finished in {event['duration']:.1f}s")
+                        elif event["type"] == "work_order":
+                            print(f"📝 Work order: {json.dumps(event['data'], ensure_ascii=False)[:200]}...")
+                        elif event["type"] == "token" and event["stage"] == "report_generation":
+                            print(event["data"], end="", flush=True)
+                        elif event["type"] == "error":
+                            print(f"\n❌ Workflow error: {event['data']['message']}")
+                    print("\n✅ Streaming completed")
                 else:
                     error_data = await response.json()
                     print(f"❌ Failed to stream report: {error_data}")
@@ -43,6 +43,7 @@ export default function Home() {
       }
 
       const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = "";
 
       while (true) {
         const { done, value } = await reader.read();
@@ -50,14 +51,21 @@ export default function Home() {
           break;
         }
 
-        const lines = value.split("\n\n").filter(line => line.length > 0);
-        for (const line of lines) {
-          if (line.startsWith("data:")) {
-            const jsonString = line.substring(6);
+        // A read can end mid-frame; keep the incomplete tail for the next read
+        buffer += value;
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop() ?? "";
+        for (const frame of frames) {
+          if (frame.startsWith("data:")) {
+            const jsonString = frame.substring(6);
             try {
               const data = JSON.parse(jsonString);
-              if (data.type === "chunk") {
-                setReport((prev) => prev + data.content);
+              if (data.type === "token" && data.stage === "report_generation") {
+                setReport((prev) => prev + data.data);
+              } else if (data.type === "final_report") {
+                setReport(data.data);
+              } else if (data.type === "error") {
+                setReport((prev) => prev + `\n\n**خطا:** ${data.data.message}`);
               }
             } catch (e) {
               console.error("Error parsing JSON from stream", e);
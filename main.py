@@ -5,13 +5,19 @@ import asyncio
 import json
 import os
 import sys
-from typing import Dict, Any, Optional, AsyncGenerator
+import time
+from typing import Dict, Any, Optional, AsyncGenerator, AsyncIterator
 from datetime import datetime
 import re
 
 from src.agents.specialists.query_understanding_agent import run_query_understanding_agent
 from src.agents.specialists.strategic_advisor import run_strategic_advisor
-from src.agents.specialists.generate_report_agent import run_generate_report_agent, format_strategic_advice
+from src.agents.specialists.generate_report_agent import run_generate_report_agent, stream_generate_report_agent, format_strategic_advice
+from src.agents.utils.deadline import Deadline
+from src.agents.utils.report_cache import find_cached_report, cache_report
+from src.agents.events import (
+    WorkflowEvent, STAGE_WORKFLOW, STAGE_QUERY_UNDERSTANDING, STAGE_STRATEGIC_ADVICE, STAGE_REPORT_GENERATION
+)
 
 # Ensure all necessary paths are set up
 project_root = os.getcwd()
@@ -79,55 +85,218 @@ def is_persian(text: str) -> bool:
     """Checks if the text contains Persian characters."""
     return bool(re.search('[\u0600-\u06FF]', text))
 
-async def main(user_query: str, report_date: Optional[str] = None) -> AsyncGenerator[str, None]:
+async def stream_task_tokens(token_queue: asyncio.Queue, task: asyncio.Task) -> AsyncIterator[str]:
+    """Yields tokens a running task puts on the queue, until the task finishes.
+
+    The task is cancelled if the consumer stops listening before it is done.
     """
-    Main function to orchestrate the multi-agent workflow, yielding results as they are generated.
+    try:
+        while True:
+            next_token = asyncio.ensure_future(token_queue.get())
+            done, _ = await asyncio.wait({next_token, task}, return_when=asyncio.FIRST_COMPLETED)
+            if next_token in done:
+                yield next_token.result()
+                continue
+            next_token.cancel()
+            break
+        while not token_queue.empty():
+            yield token_queue.get_nowait()
+    finally:
+        if not task.done():
+            task.cancel()
+
+async def main_events(
+    user_query: str,
+    report_date: Optional[str] = None,
+    stream_tokens: bool = False,
+    deadline_seconds: Optional[float] = None
+) -> AsyncIterator[WorkflowEvent]:
     """
-    yield "### Starting Faranic Real Estate Agent Workflow...\n"
-    
-    # 0. Detect Language
+    Orchestrates the multi-agent workflow, yielding typed events as it progresses.
+
+    Every stage is bracketed by stage_start/stage_end events (the latter with its
+    duration), the work order and strategic advice are sent as JSON, and the
+    final report as text. With stream_tokens, the advice and the report are also
+    sent as token events while the LLM writes them.
+
+    The request must be done within deadline_seconds, or by default within the
+    budget of the work order's urgency level. Stages cut their work to meet it;
+    a stage_end lists what its stage cut short under "degraded", and the final
+    workflow stage_end is marked "partial" if anything was.
+
+    A report of an equivalent earlier work order is served from the report
+    cache, or its strategic advice reused (see report_cache.py); the strategic
+    advice stage_start then describes the match under "cache".
+    """
+    workflow_started = time.monotonic()
+    request_started = time.time()
+    stage = STAGE_WORKFLOW
     language = "Persian" if is_persian(user_query) else "English"
-    yield f"\n**Orchestrator:** Language detected: {language}\n"
-
-    # 1. Understand the user's query and create a work order
-    yield f"\n**Orchestrator:** Understanding user query: '{user_query}'\n"
-    work_order = run_query_understanding_agent(user_query, language)
-    work_order_md = format_work_order(work_order, language)
-    yield work_order_md
-
-    # 2. Define the report date
-    if report_date is None:
-        report_date = datetime.now().strftime("%B %d, %Y")
-        yield f"\n**Orchestrator:** Using current date: {report_date}\n"
-    
-    # 3. Run the Strategic Advisor to get comprehensive advice
-    yield "\n---\n### Running Strategic Advisor...\n"
+    yield WorkflowEvent(type="stage_start", stage=STAGE_WORKFLOW, data={"query": user_query, "language": language})
+
     try:
-        strategic_advice = await run_strategic_advisor(work_order, report_date, language)
+        # 1. Understand the user's query and create a work order
+        stage, stage_started = STAGE_QUERY_UNDERSTANDING, time.monotonic()
+        yield WorkflowEvent(type="stage_start", stage=stage, data={"query": user_query, "language": language})
+        # The agent is synchronous (a blocking LLM call, with backoff sleeps on retries); a thread
+        # keeps it from freezing the server's event loop, which also runs report jobs
+        work_order = await asyncio.to_thread(run_query_understanding_agent, user_query, language)
+        yield WorkflowEvent(type="work_order", stage=stage, data=work_order)
+        yield WorkflowEvent(type="stage_end", stage=stage, duration=time.monotonic() - stage_started)
+
+        # The clock started with the request, whether the budget is explicit or set by urgency
+        deadline = Deadline.for_request(deadline_seconds, work_order.get("urgency_level"), started_at=request_started)
+
+        if report_date is None:
+            report_date = datetime.now().strftime("%B %d, %Y")
+        # An equivalent earlier work order may have a report (or at least advice) to reuse
+        cached, work_order_embedding = await find_cached_report(work_order, language, report_date)
+
+        # 2. Run the Strategic Advisor to get comprehensive advice
+        stage, stage_started = STAGE_STRATEGIC_ADVICE, time.monotonic()
+        stage_data = {"report_date": report_date, "seconds_left": deadline.remaining()}
+        if cached is not None:
+            stage_data["cache"] = {key: cached[key] for key in ("kind", "similarity", "entry_id", "created_at")}
+        yield WorkflowEvent(type="stage_start", stage=stage, data=stage_data)
+        if cached is not None:
+            strategic_advice = cached["advice"]
+        elif stream_tokens:
+            token_queue = asyncio.Queue()
+            advisor_task = asyncio.create_task(
+                run_strategic_advisor(work_order, report_date, language, on_token=token_queue.put_nowait, deadline=deadline)
+            )
+            async for token in stream_task_tokens(token_queue, advisor_task):
+                yield WorkflowEvent(type="token", stage=stage, data=token)
+            strategic_advice = await advisor_task
+        else:
+            strategic_advice = await run_strategic_advisor(work_order, report_date, language, deadline=deadline)
 
         if "error" in strategic_advice:
-            error_md = f"**Orchestrator:** Halting workflow due to error from Strategic Advisor: {strategic_advice['error']}"
-            yield error_md
+            yield WorkflowEvent(type="error", stage=stage, data={"message": strategic_advice["error"]})
             return
+        yield WorkflowEvent(type="advice", stage=stage, data=strategic_advice)
+        yield WorkflowEvent(
+            type="stage_end", stage=stage, duration=time.monotonic() - stage_started,
+            data={"degraded": list(deadline.degradations)} if deadline.is_partial else None
+        )
 
-        formatted_advice_for_stream = format_strategic_advice(strategic_advice)
-        advice_md = f"#### ✅ Strategic Advice Received\n{formatted_advice_for_stream}"
-        yield advice_md
+        # 3. Run the Generate Report Agent to create the final output
+        stage, stage_started = STAGE_REPORT_GENERATION, time.monotonic()
+        yield WorkflowEvent(type="stage_start", stage=stage)
+        if cached is not None and cached["kind"] == "hit":
+            final_report = cached["report"]
+        elif stream_tokens:
+            report_tokens = []
+            async for token in stream_generate_report_agent(work_order, strategic_advice, language):
+                report_tokens.append(token)
+                yield WorkflowEvent(type="token", stage=stage, data=token)
+            final_report = "".join(report_tokens)
+        else:
+            final_report = await run_generate_report_agent(work_order, strategic_advice, language)
+        yield WorkflowEvent(type="final_report", stage=stage, data=final_report)
+        yield WorkflowEvent(type="stage_end", stage=stage, duration=time.monotonic() - stage_started)
 
-        # 4. Run the Generate Report Agent to create the final output
-        yield "\n---\n### Generating Final Report...\n"
-        final_report = await run_generate_report_agent(work_order, strategic_advice, language)
-        
-        yield "\n---\n## Final Investment Report\n"
-        yield final_report
+        # Only complete reports are reused
+        if not deadline.is_partial and (cached is None or cached["kind"] != "hit"):
+            await cache_report(work_order, work_order_embedding, language, report_date, strategic_advice, final_report)
 
-        yield "\n\n---\n#### ✅ Faranic Real Estate Agent Workflow Complete ---"
+        yield WorkflowEvent(
+            type="stage_end", stage=STAGE_WORKFLOW, duration=time.monotonic() - workflow_started,
+            data={"partial": deadline.is_partial, "degraded": list(deadline.degradations)}
+        )
     except Exception as e:
-        error_message = f"An unexpected error occurred in the main workflow: {str(e)}"
-        yield f"**Orchestrator Error:** {error_message}\n"
-        # You can also log the full traceback to the terminal for debugging
         import traceback
-        yield f"```python\n{traceback.format_exc()}\n```"
+        yield WorkflowEvent(type="error", stage=stage, data={
+            "message": f"An unexpected error occurred in the main workflow: {str(e)}",
+            "traceback": traceback.format_exc()
+        })
+
+class MarkdownRenderer:
+    """Renders the orchestrator's events as the markdown transcript shown to users.
+
+    Stateful: advice tokens are wrapped in a code block, and a report that was
+    already streamed token by token is not repeated by its final_report event.
+    """
+
+    def __init__(self):
+        self.language = "English"
+        self.streamed_stages = set()
+        self.in_code_block = False
+
+    def render(self, event: WorkflowEvent) -> str:
+        parts = []
+        if self.in_code_block and event.type != "token":
+            # The advice draft is closed once the advisor is done writing it
+            self.in_code_block = False
+            parts.append("\n```\n")
+
+        if event.type == "stage_start" and event.stage == STAGE_WORKFLOW:
+            self.language = event.data["language"]
+            parts.append("### Starting Faranic Real Estate Agent Workflow...\n")
+            parts.append(f"\n**Orchestrator:** Language detected: {self.language}\n")
+        elif event.type == "stage_start" and event.stage == STAGE_QUERY_UNDERSTANDING:
+            parts.append(f"\n**Orchestrator:** Understanding user query: '{event.data['query']}'\n")
+        elif event.type == "work_order":
+            parts.append(format_work_order(event.data, self.language))
+        elif event.type == "stage_start" and event.stage == STAGE_STRATEGIC_ADVICE:
+            parts.append(f"\n**Orchestrator:** Using report date: {event.data['report_date']}\n")
+            cache = event.data.get("cache")
+            if cache is not None:
+                reused = "report" if cache["kind"] == "hit" else "strategic advice"
+                parts.append(f"\n**Orchestrator:** Reusing the {reused} of an equivalent earlier request (similarity {cache['similarity']:.2f})\n")
+            parts.append("\n---\n### Running Strategic Advisor...\n")
+        elif event.type == "token":
+            if event.stage not in self.streamed_stages:
+                self.streamed_stages.add(event.stage)
+                if event.stage == STAGE_STRATEGIC_ADVICE:
+                    # Show the advice draft as it is written; it is formatted once complete
+                    self.in_code_block = True
+                    parts.append("\n```json\n")
+            parts.append(event.data)
+        elif event.type == "advice":
+            parts.append(f"#### ✅ Strategic Advice Received\n{format_strategic_advice(event.data)}")
+        elif event.type == "stage_start" and event.stage == STAGE_REPORT_GENERATION:
+            parts.append("\n---\n### Generating Final Report...\n")
+            parts.append("\n---\n## Final Investment Report\n")
+        elif event.type == "final_report" and event.stage not in self.streamed_stages:
+            parts.append(event.data)
+        elif event.type == "stage_end" and event.stage == STAGE_WORKFLOW:
+            if (event.data or {}).get("partial"):
+                notes = "\n".join(f"- {item['note']}" for item in event.data["degraded"])
+                parts.append(f"\n\n---\n#### ⚠️ Partial Result\nParts of the analysis were cut short to meet the deadline or could not be completed:\n{notes}")
+            parts.append("\n\n---\n#### ✅ Faranic Real Estate Agent Workflow Complete ---")
+        elif event.type == "error":
+            if event.data.get("traceback"):
+                parts.append(f"**Orchestrator Error:** {event.data['message']}\n")
+                parts.append(f"```python\n{event.data['traceback']}\n```")
+            else:
+                parts.append(f"**Orchestrator:** Halting workflow due to error from Strategic Advisor: {event.data['message']}")
+        return "".join(parts)
+
+async def render_markdown(events: AsyncIterator[WorkflowEvent]) -> AsyncIterator[str]:
+    """Yields the markdown rendering of an event stream, skipping events that render to nothing."""
+    renderer = MarkdownRenderer()
+    async for event in events:
+        markdown = renderer.render(event)
+        if markdown:
+            yield markdown
+
+async def main(
+    user_query: str,
+    report_date: Optional[str] = None,
+    stream_tokens: bool = False,
+    deadline_seconds: Optional[float] = None
+) -> AsyncGenerator[str, None]:
+    """
+    Main function to orchestrate the multi-agent workflow, yielding results as markdown as they are generated.
+
+    With stream_tokens, the strategic advice and the final report are yielded
+    token by token while the LLM writes them, instead of in one chunk each.
+    deadline_seconds overrides the time budget set by the work order's urgency.
+    Clients that render incrementally should consume main_events instead.
+    """
+    async for markdown in render_markdown(main_events(user_query, report_date, stream_tokens, deadline_seconds)):
+        yield markdown
 
 
 if __name__ == "__main__":
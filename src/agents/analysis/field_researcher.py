@@ -10,21 +10,31 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union, get_args, get_origin
 import asyncio
 import json
 from datetime import datetime
 import re
+import hashlib
 
 # Import the autonomous deep research agent and its configuration
-from src.agents.utils.web_deep_research.web_graph import get_deep_research_agent
+from src.agents.utils.web_deep_research.web_graph import get_deep_research_agent, get_run_config, get_checkpointer, run_resumable
+from src.agents.utils.web_deep_research.blob_store import release_blob_store
 from src.agents.utils.web_deep_research.configuration import Configuration as WebResearchConfig
 from src.agents.utils.web_deep_research.utils import get_today_str
-from src.agents.prompts import FIELD_RESEARCHER_EXTRACTION_PROMPT, FIELD_RESEARCHER_TREND_SUMMARY_PROMPT
+from src.agents.prompts import (
+    FIELD_RESEARCHER_EXTRACTION_PROMPT,
+    FIELD_RESEARCHER_TREND_SUMMARY_PROMPT,
+    FIELD_RESEARCHER_EXTRACTION_AND_SUMMARY_PROMPT,
+    FIELD_RESEARCHER_REPAIR_PROMPT
+)
 from src.configs.llm_config import get_default_llm
+from src.agents.utils.prompt_serializer import serialize_for_prompt
+from src.agents.utils.deadline import Deadline, MIN_WEB_RESEARCH_SECONDS
 from langchain_core.messages import HumanMessage
 from langchain_core.output_parsers import JsonOutputParser
-from src.agents.analysis.models.field_researcher_models import RealEstateAnalysis
+from pydantic import TypeAdapter, ValidationError
+from src.agents.analysis.models.field_researcher_models import RealEstateAnalysis, FieldResearchResult
 
 
 """
@@ -32,6 +42,12 @@ The Field Researcher Agent performs deep, autonomous web research on a given top
 by leveraging the web_graph agent, built on the LangGraph framework.
 """
 
+# Extract the structured data and the trend summary in one LLM call (set to "false" for the two-call flow)
+FIELD_RESEARCHER_SINGLE_PASS = os.getenv("FIELD_RESEARCHER_SINGLE_PASS", "true").lower() == "true"
+
+# Seconds of a deadline kept back for extracting the data from the research report
+EXTRACTION_RESERVE_SECONDS = float(os.getenv("EXTRACTION_RESERVE_SECONDS", "30"))
+
 def format_date_range(date_str: Optional[str]) -> Optional[str]:
     """Formats a date or date range string into MM/DD/YYYY-MM/DD/YYYY format."""
     if not date_str:
@@ -67,45 +83,146 @@ def format_date_range(date_str: Optional[str]) -> Optional[str]:
             
     return date_str # Return original string if format is not recognized
 
-async def run_field_researcher(topic: str, report_date: Optional[str] = None) -> Dict[str, Any]:
+def make_research_run_id(topic: str, report_date: Optional[str] = None) -> str:
+    """Derives a stable run id from the research inputs, so a retried request resumes its earlier run."""
+    key = f"{topic.strip()}|{report_date or get_today_str()}"
+    return "field-research-" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def _unwrap_optional(annotation):
+    """Optional[X] -> X, leaving any other annotation unchanged."""
+    args = [arg for arg in get_args(annotation) if arg is not type(None)]
+    if get_origin(annotation) is Union and len(args) == 1:
+        return args[0]
+    return annotation
+
+def get_fragment(loc: Tuple, model=FieldResearchResult) -> Tuple[Tuple, Any]:
+    """The smallest repairable fragment containing a validation error, and its type.
+
+    The fragment is the list element holding the error (e.g. one MarketData
+    entry), or the field itself when the error is not inside a list.
     """
-    Runs the field research process.
-    
-    Args:
-        topic: The topic to research.
-        report_date: The date or date range to use for the research.
-        
+    annotation, path = model, []
+    for part in loc:
+        try:
+            if isinstance(part, int):
+                path.append(part)
+                return tuple(path), get_args(annotation)[0]
+            annotation = _unwrap_optional(annotation.model_fields[part].annotation)
+        except (AttributeError, KeyError, IndexError):
+            break
+        path.append(part)
+    return tuple(path), annotation
+
+def _get_path(data: Any, path: Tuple) -> Any:
+    for part in path:
+        try:
+            data = data[part]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data
+
+def _set_path(data: Any, path: Tuple, value: Any):
+    for part in path[:-1]:
+        if isinstance(data, dict) and not isinstance(data.get(part), (dict, list)):
+            data[part] = {}
+        data = data[part]
+    data[path[-1]] = value
+
+async def repair_fragment(llm, data: dict, path: Tuple, annotation: Any, errors: List[str]) -> bool:
+    """Asks the LLM to fix one invalid fragment in place. Returns whether the fix validates."""
+    adapter = TypeAdapter(annotation)
+    repair_prompt = FIELD_RESEARCHER_REPAIR_PROMPT.format(
+        path=".".join(str(part) for part in path),
+        fragment=json.dumps(_get_path(data, path), ensure_ascii=False),
+        errors="\n".join(errors),
+        schema=json.dumps(adapter.json_schema(), ensure_ascii=False)
+    )
+    response = await llm.ainvoke([HumanMessage(content=repair_prompt)])
+    try:
+        fragment = adapter.validate_python(JsonOutputParser().parse(response.content))
+    except Exception as e:
+        print(f"---Field Researcher: Repair of {path} failed. Error: {e}---")
+        return False
+    _set_path(data, path, adapter.dump_python(fragment, mode="json"))
+    return True
+
+async def validate_with_repair(llm, data: Any) -> Tuple[Optional[FieldResearchResult], List[str]]:
+    """Validates extracted data, repairing only the invalid fragments instead of re-running the extraction.
+
+    Each invalid fragment gets one small repair call (run concurrently). List
+    elements that are still invalid afterwards are dropped.
+
     Returns:
-        A dictionary containing the research findings.
+        The validated result (None if it could not be repaired) and the
+        remaining validation errors.
     """
-    print(f"---Running Field Researcher for topic: {topic}---")
-    
-    time_range_for_search = format_date_range(report_date)
-    
-    # 1. Get the deep research agent and its configuration
-    deep_research_agent = get_deep_research_agent()
-    config = WebResearchConfig(time_range=time_range_for_search)
+    if not isinstance(data, dict):
+        return None, ["The extraction did not return a JSON object."]
+
+    try:
+        return FieldResearchResult.model_validate(data), []
+    except ValidationError as e:
+        validation_errors = e.errors()
+
+    # Group the errors by fragment, keeping only the outermost of nested fragments
+    fragments: Dict[Tuple, Tuple[Any, List[str]]] = {}
+    for error in validation_errors:
+        path, annotation = get_fragment(tuple(error["loc"]))
+        fragments.setdefault(path, (annotation, []))[1].append(f"{'.'.join(map(str, error['loc']))}: {error['msg']}")
+    paths = [path for path in fragments if not any(path[:len(other)] == other and path != other for other in fragments)]
+    print(f"---Field Researcher: Repairing {len(paths)} invalid fragments: {[list(path) for path in paths]}---")
+
+    await asyncio.gather(*[repair_fragment(llm, data, path, *fragments[path]) for path in paths])
+
+    try:
+        return FieldResearchResult.model_validate(data), []
+    except ValidationError as e:
+        validation_errors = e.errors()
+
+    # Drop list elements that are still invalid, last index first so earlier indexes stay valid
+    element_paths = {get_fragment(tuple(error["loc"]))[0] for error in validation_errors}
+    for path in sorted((p for p in element_paths if p and isinstance(p[-1], int)), reverse=True):
+        parent = _get_path(data, path[:-1])
+        if isinstance(parent, list) and path[-1] < len(parent):
+            print(f"---Field Researcher: Dropping invalid entry {list(path)}---")
+            del parent[path[-1]]
+
+    try:
+        return FieldResearchResult.model_validate(data), []
+    except ValidationError as e:
+        return None, [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()]
 
-    # 2. Run the deep research to get a report
-    graph_result = await deep_research_agent.ainvoke(
-        {"topic": topic, "report_date": report_date or get_today_str()},
-        config={"configurable": config}
+async def extract_analysis_and_summary(llm, report_content: str) -> Tuple[Dict[str, Any], str]:
+    """Extracts the structured analysis and its trend summary from the report in a single LLM call."""
+    parser = JsonOutputParser(pydantic_object=FieldResearchResult)
+
+    extraction_prompt = FIELD_RESEARCHER_EXTRACTION_AND_SUMMARY_PROMPT.format(
+        content=report_content,
+        format_instructions=parser.get_format_instructions()
     )
-    
-    report_content = graph_result.get("final_report")
-    
-    if not report_content:
-        print("---Field Researcher: Deep research did not produce a report.---")
-        return {
-            "error": "Failed to generate a research report.",
-            "structured_data": {},
-            "summary": ""
-        }
 
-    print("---Field Researcher: Report generated, now extracting data...---")
+    extraction_response = await llm.ainvoke([HumanMessage(content=extraction_prompt)])
 
-    # 3. Use an LLM to extract structured data from the report
-    llm = get_default_llm()
+    try:
+        data = parser.parse(extraction_response.content)
+    except Exception as e:
+        print(f"---Field Researcher: Failed to parse JSON from the extraction step. Error: {e}---")
+        data = None
+
+    result, errors = await validate_with_repair(llm, data)
+    if result is not None:
+        return result.analysis.model_dump(), result.trend_summary
+
+    # Keep whatever was extracted, and say why it is incomplete
+    print(f"---Field Researcher: Structured data still invalid after repair: {errors}---")
+    structured_data_dict = dict(data.get("analysis") or {}) if isinstance(data, dict) and isinstance(data.get("analysis"), dict) else {}
+    structured_data_dict["error"] = "Structured data did not match the schema after repair."
+    structured_data_dict["validation_errors"] = errors
+    summary = data.get("trend_summary", "") if isinstance(data, dict) else ""
+    return structured_data_dict, summary if isinstance(summary, str) else ""
+
+async def extract_then_summarize(llm, report_content: str) -> Tuple[Dict[str, Any], str]:
+    """Extracts the structured analysis, then summarizes it in a second LLM call."""
     parser = JsonOutputParser(pydantic_object=RealEstateAnalysis)
     
     extraction_prompt = FIELD_RESEARCHER_EXTRACTION_PROMPT.format(
@@ -131,18 +248,115 @@ async def run_field_researcher(topic: str, report_date: Optional[str] = None) ->
     elif isinstance(structured_data, dict):
         structured_data_dict = structured_data
 
-    # 4. Use an LLM to generate a final summary
-    summary_prompt = FIELD_RESEARCHER_TREND_SUMMARY_PROMPT.format(numerical_analysis=json.dumps(structured_data_dict, indent=2))
+    # Use an LLM to generate a final summary
+    summary_prompt = FIELD_RESEARCHER_TREND_SUMMARY_PROMPT.format(numerical_analysis=serialize_for_prompt(structured_data_dict, label="numerical analysis"))
     
     summary_response = await llm.ainvoke([HumanMessage(content=summary_prompt)])
     summary = summary_response.content
 
+    return structured_data_dict, summary
+
+def skipped_research_result(reason: str) -> Dict[str, Any]:
+    """Result of a field research cut by the deadline, shaped like a normal result."""
+    return {
+        "structured_data": {},
+        "summary": f"No current web research is available: {reason}. Base the analysis on the knowledge base strategies.",
+        "degraded": True
+    }
+
+async def run_field_researcher(
+    topic: str,
+    report_date: Optional[str] = None,
+    run_id: Optional[str] = None,
+    single_pass: bool = FIELD_RESEARCHER_SINGLE_PASS,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """
+    Runs the field research process.
+    
+    The web research graph is checkpointed under the run id, so if a run fails
+    part-way, calling this again with the same run id resumes from the last
+    completed node or section instead of starting over.
+    
+    Args:
+        topic: The topic to research.
+        report_date: The date or date range to use for the research.
+        run_id: Checkpoint key for the research run. Derived from the topic and
+            report date when not given.
+        single_pass: Extract the structured data and the trend summary in one
+            LLM call (repairing only invalid fragments) instead of two.
+        deadline: Time the research must be done by. The research graph sizes
+            its work to it, and the research is skipped (or stopped) when there
+            is not enough time, leaving the advice to the knowledge base.
+        
+    Returns:
+        A dictionary containing the research findings. Results cut short by the
+        deadline carry "degraded": True.
+    """
+    print(f"---Running Field Researcher for topic: {topic}---")
+    
+    time_range_for_search = format_date_range(report_date)
+    run_id = run_id or make_research_run_id(topic, report_date)
+    deadline = deadline or Deadline()
+    research_deadline = deadline.reserving(EXTRACTION_RESERVE_SECONDS)
+
+    if research_deadline.less_than(MIN_WEB_RESEARCH_SECONDS):
+        deadline.degrade("field_research", "Web research skipped; the advice relies on the knowledge base")
+        return skipped_research_result("there was not enough time left for web research")
+    
+    # 1. Get the deep research agent and its configuration
+    config = WebResearchConfig(time_range=time_range_for_search, deadline_at=research_deadline.expires_at)
+
+    # 2. Run the deep research to get a report, resuming an unfinished run if there is one
+    run_config = get_run_config(config, run_id)
+    try:
+        async with get_checkpointer() as checkpointer:
+            deep_research_agent = get_deep_research_agent(checkpointer)
+            graph_result = await asyncio.wait_for(
+                run_resumable(
+                    deep_research_agent,
+                    {"topic": topic, "report_date": report_date or get_today_str()},
+                    run_config
+                ),
+                timeout=research_deadline.remaining()
+            )
+    except asyncio.TimeoutError:
+        # The checkpoint is kept, so a later request on the same topic resumes the research
+        deadline.degrade("field_research", "Web research stopped at the deadline; the advice relies on the knowledge base")
+        return skipped_research_result("the web research did not finish in time")
+
+    # The run finished, so its stored sources are no longer needed for a resume
+    release_blob_store(run_config)
+
+    for note in graph_result.get("degraded") or []:
+        deadline.degrade("field_research", note)
+    
+    report_content = graph_result.get("final_report")
+    
+    if not report_content:
+        print("---Field Researcher: Deep research did not produce a report.---")
+        return {
+            "error": "Failed to generate a research report.",
+            "structured_data": {},
+            "summary": ""
+        }
+
+    print("---Field Researcher: Report generated, now extracting data...---")
+
+    # 3. Use an LLM to extract structured data and a trend summary from the report
+    llm = get_default_llm()
+    if single_pass:
+        structured_data_dict, summary = await extract_analysis_and_summary(llm, report_content)
+    else:
+        structured_data_dict, summary = await extract_then_summarize(llm, report_content)
+
     print("---Field Researcher: Process complete.---")
     
     return {
         "structured_data": structured_data_dict,
         "summary": summary,
-        "full_report": report_content  # Optionally return the full report
+        "full_report": report_content,  # Optionally return the full report
+        "degraded": bool(graph_result.get("degraded"))
     }
 
 
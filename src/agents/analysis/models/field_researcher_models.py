@@ -37,4 +37,9 @@ class RealEstateAnalysis(BaseModel):
     key_market_data: List[MarketData] = Field(default_factory=list, description="A list of key market data points.")
     property_listings: List[PropertyDetails] = Field(default_factory=list, description="A list of specific property listings found.")
     market_outlook: str = Field(..., description="The overall market outlook, e.g., 'Positive', 'Negative', 'Neutral'.")
-    raw_text_summary: str = Field(..., description="A summary of the raw text that was analyzed to generate this structured data.") 
\ No newline at end of file
+    raw_text_summary: str = Field(..., description="A summary of the raw text that was analyzed to generate this structured data.") 
+
+class FieldResearchResult(BaseModel):
+    """The structured analysis and its trend summary, extracted from a report in one pass."""
+    analysis: RealEstateAnalysis = Field(..., description="The structured real estate analysis extracted from the content.")
+    trend_summary: str = Field(..., description="A brief summary (2-3 sentences) of the key price trends, the market direction (growing/declining/stable) and the most important findings.")
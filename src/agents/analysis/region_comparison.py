@@ -0,0 +1,157 @@
+"""
+Region Comparison - parallel field research for compare_regions work orders.
+
+A comparison of districts or cities is split into one research job per region.
+The jobs run concurrently through run_field_researcher, sharing the process-wide
+search response cache, page summary cache, plan cache and provider budgets, and
+their RealEstateAnalysis results are merged into a side-by-side table.
+"""
+
+import sys
+import os
+
+# Add the project root to the Python path to enable direct script execution
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from typing import Dict, Any, List, Optional, Callable
+import asyncio
+import re
+
+from src.agents.analysis.field_researcher import run_field_researcher
+from src.agents.utils.deadline import Deadline
+
+COMPARE_REGIONS_TASKS = {"compare_regions", "مقایسه مناطق"}
+MAX_COMPARISON_REGIONS = int(os.getenv("MAX_COMPARISON_REGIONS", "4"))
+
+# Separators between regions in a free-text location ("Tehran vs Karaj", "ونک و پاسداران");
+# commas are left alone since they usually separate a city from its country
+_REGION_SEPARATORS = re.compile(r"\s+(?:vs\.?|versus|and|or)\s+|\s+و\s+|\s*[/;|]\s*", re.IGNORECASE)
+
+
+def get_comparison_regions(work_order: Dict[str, Any]) -> List[str]:
+    """The regions a compare_regions work order asks about, at most MAX_COMPARISON_REGIONS."""
+    key_information = work_order.get('key_information') or {}
+    regions = key_information.get('regions') or []
+    if isinstance(regions, str):
+        regions = [regions]
+    if len(regions) < 2:
+        location = key_information.get('location') or (work_order.get('property_specs') or {}).get('location') or ""
+        regions = _REGION_SEPARATORS.split(location) if isinstance(location, str) else []
+
+    unique_regions = []
+    for region in regions:
+        region = str(region).strip(" ,.")
+        if region and region.lower() not in {r.lower() for r in unique_regions}:
+            unique_regions.append(region)
+    return unique_regions[:MAX_COMPARISON_REGIONS]
+
+
+def is_region_comparison(work_order: Dict[str, Any]) -> bool:
+    """Whether a work order compares two or more regions and should be researched per region."""
+    return work_order.get('primary_task') in COMPARE_REGIONS_TASKS and len(get_comparison_regions(work_order)) >= 2
+
+
+def _table_cell(value: Any) -> str:
+    return " ".join(str(value).split()).replace("|", "\\|") if value not in (None, "") else "-"
+
+
+def build_comparison_table(region_data: Dict[str, Dict[str, Any]]) -> str:
+    """Side-by-side markdown table of the structured analyses of several regions.
+
+    Rows are the market outlook, every metric reported for at least one region
+    (the most widely reported first) and the identified trends.
+    """
+    regions = list(region_data)
+    metrics: Dict[str, Dict[str, List[str]]] = {}
+    metric_names: Dict[str, str] = {}
+    for region, data in region_data.items():
+        for item in data.get('key_market_data') or []:
+            name = (item.get('metric_name') or "").strip()
+            if not name or not item.get('value'):
+                continue
+            key = name.lower()
+            metric_names.setdefault(key, name)
+            metrics.setdefault(key, {}).setdefault(region, []).append(str(item['value']))
+
+    rows = [["Market outlook", *[data.get('market_outlook') for data in region_data.values()]]]
+    for key in sorted(metrics, key=lambda k: (-len(metrics[k]), metric_names[k].lower())):
+        # A metric reported several times for one region keeps its first two values
+        rows.append([metric_names[key], *["; ".join(metrics[key].get(region, [])[:2]) for region in regions]])
+    rows.append(["Key trends", *[", ".join(t.get('trend_name', "") for t in data.get('trends') or []) for data in region_data.values()]])
+
+    lines = [
+        "| Metric | " + " | ".join(_table_cell(region) for region in regions) + " |",
+        "|---" * (len(regions) + 1) + "|",
+    ]
+    lines.extend("| " + " | ".join(_table_cell(cell) for cell in row) + " |" for row in rows)
+    return "\n".join(lines)
+
+
+def merge_region_results(region_results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-region field research results into one result of the same shape.
+
+    The structured data holds each region's analysis plus the comparison
+    table, and the summary puts the table ahead of the per-region summaries.
+    """
+    region_data = {region: result.get("structured_data") or {} for region, result in region_results.items()}
+    comparison_table = build_comparison_table(region_data)
+
+    summary_parts = [f"Side-by-side comparison:\n{comparison_table}"]
+    summary_parts.extend(f"## {region}\n{result.get('summary', '')}" for region, result in region_results.items())
+
+    return {
+        "structured_data": {"regions": region_data, "comparison_table": comparison_table},
+        "summary": "\n\n".join(summary_parts),
+        "full_report": "\n\n".join(f"# {region}\n\n{result.get('full_report', '')}" for region, result in region_results.items())
+    }
+
+
+async def run_region_comparison(
+    regions: List[str],
+    make_topic: Callable[[str], str],
+    report_date: Optional[str] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """
+    Researches several regions concurrently and merges the results.
+
+    Args:
+        regions: The regions to compare.
+        make_topic: Builds the research topic for one region.
+        report_date: The date or date range to use for the research.
+        deadline: Time the research of every region must be done by.
+
+    Returns:
+        A dictionary shaped like run_field_researcher's result, with the merged
+        findings. Regions whose research failed are reported under "errors".
+    """
+    print(f"---Region Comparison: researching {len(regions)} regions in parallel: {', '.join(regions)}---")
+
+    results = await asyncio.gather(
+        *[run_field_researcher(make_topic(region), report_date, deadline=deadline) for region in regions],
+        return_exceptions=True
+    )
+
+    region_results, errors = {}, {}
+    for region, result in zip(regions, results):
+        if isinstance(result, BaseException):
+            print(f"---Region Comparison: research for {region} failed. Error: {result}---")
+            errors[region] = str(result)
+        elif result.get("error"):
+            errors[region] = result["error"]
+        else:
+            region_results[region] = result
+
+    merged = merge_region_results(region_results)
+    merged["degraded"] = bool(errors) or any(result.get("degraded") for result in region_results.values())
+    if errors:
+        merged["errors"] = errors
+        # A comparison missing some of its regions is partial: it is flagged to
+        # the client and kept out of the report cache, like a run cut by the deadline
+        if deadline is not None:
+            for region, error in errors.items():
+                deadline.degrade("region_comparison", f"Research for {region} failed ({error}); it is missing from the comparison")
+    print(f"---Region Comparison: merged {len(region_results)}/{len(regions)} regions---")
+    return merged
@@ -4,11 +4,15 @@ Investment Strategy Agent - Provides investment strategies from knowledge base
 
 import sys
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import asyncio
 from src.agents.utils.knowledge_base_deep_research.knowlge_base_graph import get_knowledge_agent
 from src.agents.utils.knowledge_base_deep_research.configuration import Configuration as KnowledgeConfig
 from src.agents.prompts import STRATEGY_EXTRACTION_FACTS_PROMPT, STRATEGY_EXTRACTION_METHODS_PROMPT
+from src.agents.utils.deadline import Deadline
+
+# With less time than this left, each knowledge base query gets a single retrieval (no rewrite loop)
+KNOWLEDGE_BASE_FULL_LOOP_SECONDS = float(os.getenv("KNOWLEDGE_BASE_FULL_LOOP_SECONDS", "90"))
 
 
 """
@@ -17,9 +21,12 @@ investment strategies, market principles, and high-level advice by extracting an
 synthesizing key facts and methods.
 """
 
-async def extract_investment_strategies(work_order: Dict[str, Any]) -> str:
+async def extract_investment_strategies(work_order: Dict[str, Any], deadline: Optional[Deadline] = None) -> str:
     """
     Extracts investment strategies from the knowledge base based on the work order.
+
+    With a deadline, the question rewrite loop is cut to a single retrieval when
+    time is short, and queries still running at the deadline are abandoned.
     """
     client_type = work_order.get("client_type")
     task = work_order.get("primary_task")
@@ -28,39 +35,50 @@ async def extract_investment_strategies(work_order: Dict[str, Any]) -> str:
     if not all([client_type, task, location]):
         return "Could not extract investment strategies due to missing information in the work order."
 
+    deadline = deadline or Deadline()
+
     # Initialize the knowledge agent graph
     knowledge_agent_graph = get_knowledge_agent()
     
     # Create a configuration dictionary
+    max_iterations = 3
+    if deadline.less_than(KNOWLEDGE_BASE_FULL_LOOP_SECONDS):
+        max_iterations = 1
+        deadline.degrade("knowledge_base", "Knowledge base queried without question rewrites")
     config = {
         "configurable": {
             "llm_provider": "openai",
             "model_name": "gpt-4o",
             "temperature": 0.1,
             "retrieval_limit": 5,
-            "max_iterations": 3
+            "max_iterations": max_iterations
         }
     }
 
+    async def ask(query: str, fallback: str) -> str:
+        try:
+            result = await asyncio.wait_for(
+                knowledge_agent_graph.ainvoke({"query": query}, config=config),
+                timeout=deadline.remaining()
+            )
+        except asyncio.TimeoutError:
+            deadline.degrade("knowledge_base", "Knowledge base query stopped at the deadline")
+            return fallback
+        print(result)
+        return result.get("answer", fallback)
+
     # 1. Extract key facts and principles
     facts_prompt = STRATEGY_EXTRACTION_FACTS_PROMPT.format(
         client_type=client_type, task=task, location=location
     )
-    key_facts_result = await knowledge_agent_graph.ainvoke(
-        {"query": facts_prompt}, config=config
-    )
-    print(key_facts_result)
-    key_facts = key_facts_result.get("answer", "No facts found.")
+    key_facts = await ask(facts_prompt, "No facts found.")
 
 
     # 2. Extract specific methods and strategies
     methods_prompt = STRATEGY_EXTRACTION_METHODS_PROMPT.format(
         client_type=client_type, task=task, location=location
     )
-    investment_methods_result = await knowledge_agent_graph.ainvoke(
-        {"query": methods_prompt}, config=config
-    )
-    investment_methods = investment_methods_result.get("answer", "No methods found.")
+    investment_methods = await ask(methods_prompt, "No methods found.")
 
     # 3. Synthesize the advice
     advice = f"""
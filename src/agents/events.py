@@ -0,0 +1,43 @@
+"""
+Typed events emitted by the orchestrator while a report is being produced.
+
+Clients receive these instead of pre-rendered markdown, so they can render
+incrementally (append tokens, show the work order as a form, time each stage)
+without re-parsing the whole stream. Markdown is just one consumer of them.
+
+Event types:
+- stage_start / stage_end: a pipeline stage began / finished (stage_end carries
+  the duration in seconds, and what the stage cut short to meet the request's
+  deadline under data["degraded"]; the workflow's stage_end has data["partial"])
+- work_order: the work order created from the query (JSON)
+- advice: the parsed strategic advice (JSON)
+- token: a text delta streamed by the LLM of the current stage
+- final_report: the complete report text
+- error: the workflow failed; data holds the message (and traceback if any)
+"""
+
+from datetime import datetime
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+EventType = Literal["stage_start", "stage_end", "work_order", "advice", "token", "final_report", "error"]
+
+# Pipeline stages, in order
+STAGE_WORKFLOW = "workflow"
+STAGE_QUERY_UNDERSTANDING = "query_understanding"
+STAGE_STRATEGIC_ADVICE = "strategic_advice"
+STAGE_REPORT_GENERATION = "report_generation"
+
+
+class WorkflowEvent(BaseModel):
+    """One event of the orchestrator's event stream."""
+    type: EventType = Field(..., description="The kind of event.")
+    stage: Optional[str] = Field(None, description="The pipeline stage the event belongs to.")
+    data: Any = Field(None, description="Event payload: JSON for work_order/advice/stage events, text for token/final_report.")
+    duration: Optional[float] = Field(None, description="Seconds the stage took (stage_end only).")
+    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+    def to_dict(self) -> dict:
+        """JSON-ready dict without the fields that do not apply to this event."""
+        return self.model_dump(exclude_none=True)
@@ -25,6 +25,7 @@ Analyze this query and respond with this exact JSON structure (replace values as
     "key_information": {{
         "budget": null,
         "location": null, 
+        "regions": [],
         "timeline": null,
         "property_type": null,
         "specific_requirements": []
@@ -53,6 +54,7 @@ Guidelines:
 - Required agents can be: field_researcher, strategic_advisor, appraiser, futurist, writer_editor
 - Infer client type from context and language used
 - Extract property specifications if mentioned
+- For compare_regions, list every region being compared in key_information.regions
     """.strip()
 )
 
@@ -78,6 +80,7 @@ QUERY_UNDERSTANDING_PROMPT_PERSIAN = PromptTemplate(
     "key_information": {{
         "budget": null,
         "location": null,
+        "regions": [],
         "timeline": null,
         "property_type": null,
         "specific_requirements": []
@@ -106,6 +109,7 @@ QUERY_UNDERSTANDING_PROMPT_PERSIAN = PromptTemplate(
 - ماموران مورد نیاز می‌توانند: پژوهشگر میدانی، مشاور استراتژیک، ارزیاب، آینده‌پژوه، نویسنده و ویراستار باشند
 - نوع مشتری را از زمینه و زبان مورد استفاده استنباط کنید
 - در صورت ذکر شدن، مشخصات ملک را استخراج کنید
+- برای مقایسه مناطق، همه مناطق مورد مقایسه را در key_information.regions فهرست کنید
     """.strip()
 )
 
@@ -142,6 +146,41 @@ Summary:
 """.strip()
 )
 
+FIELD_RESEARCHER_EXTRACTION_AND_SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["content", "format_instructions"],
+    template="""
+You are a real estate data analyst. Your task is to extract structured information from the provided content and summarize the trends it shows.
+
+Content to analyze:
+{content}
+
+Please follow these instructions to format your response:
+{format_instructions}
+
+Ensure your output is a valid JSON object that adheres to the specified schema.
+In "analysis", focus on extracting factual data, trends, and key market indicators.
+In "trend_summary", write a brief summary (2-3 sentences) highlighting the key price trends, the market direction (growing/declining/stable) and the most important findings.
+""".strip()
+)
+
+FIELD_RESEARCHER_REPAIR_PROMPT = PromptTemplate(
+    input_variables=["path", "fragment", "errors", "schema"],
+    template="""
+The following fragment of a JSON document, found at {path}, does not match its schema.
+
+Fragment:
+{fragment}
+
+Validation errors:
+{errors}
+
+Schema of the fragment:
+{schema}
+
+Return ONLY the corrected fragment as JSON, with no other text. Keep every value that is already valid, fix the invalid ones, and use null where a value is unknown and the schema allows it.
+""".strip()
+)
+
 # Strategy Extraction Agent Prompts
 STRATEGY_EXTRACTION_FACTS_PROMPT = PromptTemplate(
     input_variables=["client_type", "task", "location"],
@@ -5,7 +5,7 @@ import sys
 import os
 import asyncio
 import json
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Optional
 
 # Add the project root to the Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
@@ -15,6 +15,7 @@ if project_root not in sys.path:
 from src.configs.llm_config import get_default_llm
 from src.agents.prompts import REPORT_PROMPT_MAPPING, CLIENT_PROMPT_MAP, FINAL_REPORT_PROMPT_STANDARD, CLIENT_PROMPT_MAP_PERSIAN, FINAL_REPORT_PROMPT_STANDARD_PERSIAN
 from langchain_core.messages import HumanMessage
+from src.agents.utils.prompt_serializer import serialize_for_prompt
 
 def format_strategic_advice(advice: Dict[str, Any]) -> str:
     """Formats the structured strategic advice into a readable markdown string."""
@@ -41,15 +42,10 @@ def format_strategic_advice(advice: Dict[str, Any]) -> str:
         
     return "\n\n".join(markdown_sections)
 
-async def run_generate_report_agent(work_order: Dict[str, Any], strategic_advice: Dict[str, Any], language: str = "English") -> str:
-    """
-    The Generate Report Agent synthesizes findings from all other agents
-    into a comprehensive and well-structured final report.
-    """
-    print("---Running Generate Report Agent---")
-    
-    llm = get_default_llm()
-    
+REPORT_GENERATION_FAILED_MESSAGE = "## Report Generation Failed\n\nWe were unable to generate the report because the strategic analysis returned no actionable advice. Please try refining your query."
+
+def build_report_messages(work_order: Dict[str, Any], strategic_advice: Dict[str, Any], language: str = "English") -> Optional[List[HumanMessage]]:
+    """Builds the report prompt, or returns None when the advice has nothing to report on."""
     # Determine the sophistication level based on client type
     client_type = work_order.get("client_type", "unknown")
     sophistication_level = REPORT_PROMPT_MAPPING.get(client_type, "standard")
@@ -67,18 +63,31 @@ async def run_generate_report_agent(work_order: Dict[str, Any], strategic_advice
     # Format the structured advice into a readable string
     formatted_advice = format_strategic_advice(strategic_advice)
     
-    # If there's no advice to format, return a message instead of an empty report
+    # If there's no advice to format, there is nothing to write a report from
     if not formatted_advice.strip():
         print("Warning: No strategic advice was formatted. Returning an error report.")
-        return "## Report Generation Failed\n\nWe were unable to generate the report because the strategic analysis returned no actionable advice. Please try refining your query."
+        return None
 
     # Format the prompt with the work order and formatted strategic advice
     prompt = final_report_prompt.format(
-        work_order=json.dumps(work_order, indent=2),
+        work_order=serialize_for_prompt(work_order, token_budget=1500, label="work order"),
         strategic_advice=formatted_advice
     )
     
-    messages = [HumanMessage(content=prompt)]
+    return [HumanMessage(content=prompt)]
+
+async def run_generate_report_agent(work_order: Dict[str, Any], strategic_advice: Dict[str, Any], language: str = "English") -> str:
+    """
+    The Generate Report Agent synthesizes findings from all other agents
+    into a comprehensive and well-structured final report.
+    """
+    print("---Running Generate Report Agent---")
+    
+    llm = get_default_llm()
+
+    messages = build_report_messages(work_order, strategic_advice, language)
+    if messages is None:
+        return REPORT_GENERATION_FAILED_MESSAGE
     
     # Invoke the LLM to generate the report
     llm_response = await llm.ainvoke(messages)
@@ -89,6 +98,26 @@ async def run_generate_report_agent(work_order: Dict[str, Any], strategic_advice
     print("---Generate Report Agent Finished---")
     return report
 
+async def stream_generate_report_agent(work_order: Dict[str, Any], strategic_advice: Dict[str, Any], language: str = "English") -> AsyncIterator[str]:
+    """
+    Streaming counterpart of run_generate_report_agent, yielding the report
+    token by token as the LLM writes it.
+    """
+    print("---Running Generate Report Agent (streaming)---")
+
+    llm = get_default_llm()
+
+    messages = build_report_messages(work_order, strategic_advice, language)
+    if messages is None:
+        yield REPORT_GENERATION_FAILED_MESSAGE
+        return
+
+    async for chunk in llm.astream(messages):
+        if chunk.content:
+            yield chunk.content
+
+    print("---Generate Report Agent Finished---")
+
 if __name__ == '__main__':
     async def main():
         # Mock data for testing
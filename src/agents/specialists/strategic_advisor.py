@@ -6,7 +6,7 @@ import sys
 import os
 import asyncio
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
 from datetime import datetime
 
 # Add the project root to the Python path
@@ -18,11 +18,20 @@ from src.configs.llm_config import get_default_llm
 from src.agents.prompts import CHIEF_STRATEGIST_ADVICE_PROMPT, CHIEF_STRATEGIST_ADVICE_PROMPT_PERSIAN
 from src.agents.specialists.models.strategic_advisor_models import StrategicAdvice
 from src.agents.analysis.field_researcher import run_field_researcher
+from src.agents.analysis.region_comparison import is_region_comparison, get_comparison_regions, run_region_comparison
 from src.agents.analysis.strategy_extraction_from_knowledge_base import extract_investment_strategies
+from src.agents.utils.prompt_serializer import serialize_for_prompt
+from src.agents.utils.deadline import Deadline, SYNTHESIS_RESERVE_SECONDS, KNOWLEDGE_BASE_RESERVE_SECONDS
 from langchain_core.messages import HumanMessage
 from langchain_core.output_parsers import JsonOutputParser
 
-async def run_strategic_advisor(work_order: Dict[str, Any], report_date: Optional[str] = None, language: str = "English") -> Dict[str, Any]:
+async def run_strategic_advisor(
+    work_order: Dict[str, Any],
+    report_date: Optional[str] = None,
+    language: str = "English",
+    on_token: Optional[Callable[[str], None]] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
     """
     Runs the strategic advisor agent, which orchestrates field research and knowledge base
     extraction to generate comprehensive investment advice.
@@ -31,11 +40,17 @@ async def run_strategic_advisor(work_order: Dict[str, Any], report_date: Optiona
         work_order: The client's work order with their profile and request.
         report_date: The date to be used for all research and reporting. Defaults to current date if None.
         language: The language to use for the advice prompt. Defaults to "English".
+        on_token: Optional callback receiving the advice tokens as the LLM streams them.
+        deadline: Time the whole request must be done by. Research and knowledge
+            base extraction are sized to leave time for the synthesis and the
+            report; whatever they cut short is recorded on the deadline.
 
     Returns:
         A dictionary containing the strategic advice.
     """
     print("---Running Strategic Advisor---")
+    deadline = deadline or Deadline()
+    research_deadline = deadline.reserving(SYNTHESIS_RESERVE_SECONDS + KNOWLEDGE_BASE_RESERVE_SECONDS)
 
     llm = get_default_llm()
     parser = JsonOutputParser(pydantic_object=StrategicAdvice)
@@ -48,20 +63,27 @@ async def run_strategic_advisor(work_order: Dict[str, Any], report_date: Optiona
     property_specs = work_order.get('property_specs', {})
     property_details = ", ".join([f"{key.replace('_', ' ')}: {value}" for key, value in property_specs.items() if value])
 
-    research_topic = (
-        f"Real estate investment strategy for a {work_order.get('client_type')} in "
-        f"{work_order.get('key_information', {}).get('location')} focusing on {work_order.get('primary_task')}. "
-        f"Property details: {property_details}"
-    )
-    research_findings = await run_field_researcher(research_topic, report_date)
+    def make_research_topic(location):
+        return (
+            f"Real estate investment strategy for a {work_order.get('client_type')} in "
+            f"{location} focusing on {work_order.get('primary_task')}. "
+            f"Property details: {property_details}"
+        )
+
+    if is_region_comparison(work_order):
+        # Research each region separately and in parallel, then compare side by side
+        research_findings = await run_region_comparison(get_comparison_regions(work_order), make_research_topic, report_date, deadline=research_deadline)
+    else:
+        research_topic = make_research_topic(work_order.get('key_information', {}).get('location'))
+        research_findings = await run_field_researcher(research_topic, report_date, deadline=research_deadline)
     print(f"---Strategic Advisor: Research findings received: {research_findings}---")
 
     # 2. Extract strategies from the internal knowledge base
-    knowledge_base_strategies = await extract_investment_strategies(work_order)
+    knowledge_base_strategies = await extract_investment_strategies(work_order, deadline=deadline.reserving(SYNTHESIS_RESERVE_SECONDS))
     print(f"---Strategic Advisor: Knowledge base strategies received: {knowledge_base_strategies}---")
 
     # 3. Prepare the inputs for the final synthesis prompt
-    client_profile = json.dumps(work_order, indent=2)
+    client_profile = serialize_for_prompt(work_order, token_budget=1500, label="client profile")
     market_analysis_summary = research_findings.get("summary", "No summary available.")
     
     # Ensure structured_data is always a dictionary before dumping
@@ -74,8 +96,8 @@ async def run_strategic_advisor(work_order: Dict[str, Any], report_date: Optiona
             # If it's not a Pydantic model and not a dict, default to empty dict
             structured_data_to_dump = {}
 
-    key_market_data = json.dumps(structured_data_to_dump, indent=2)
-    print(f"---Strategic Advisor: Key market data (JSON dumped structured_data): {key_market_data}---")
+    key_market_data = serialize_for_prompt(structured_data_to_dump, token_budget=4000, label="key market data")
+    print(f"---Strategic Advisor: Key market data (serialized structured_data): {key_market_data}---")
 
     # 4. Generate comprehensive advice using the synthesis prompt
     if language == "Persian":
@@ -92,15 +114,25 @@ async def run_strategic_advisor(work_order: Dict[str, Any], report_date: Optiona
     )
     print(f"---Strategic Advisor: Generated advice prompt (first 500 chars): {advice_prompt[:500]}---")
 
-    advice_response = await llm.ainvoke([HumanMessage(content=advice_prompt)])
-    print(f"---Strategic Advisor: LLM advice response received. Content (first 500 chars): {advice_response.content[:500]}---")
+    if on_token is None:
+        advice_response = await llm.ainvoke([HumanMessage(content=advice_prompt)])
+        advice_content = advice_response.content
+    else:
+        # Stream the advice so callers can show it while it is being written
+        advice_chunks = []
+        async for chunk in llm.astream([HumanMessage(content=advice_prompt)]):
+            if chunk.content:
+                advice_chunks.append(chunk.content)
+                on_token(chunk.content)
+        advice_content = "".join(advice_chunks)
+    print(f"---Strategic Advisor: LLM advice response received. Content (first 500 chars): {advice_content[:500]}---")
     
     try:
-        strategic_advice = parser.parse(advice_response.content)
+        strategic_advice = parser.parse(advice_content)
         print(f"---Strategic Advisor: Successfully parsed strategic advice.---")
     except Exception as e:
         print(f"---Strategic Advisor: Failed to parse JSON from advice response. Error: {e}---")
-        print(f"---Strategic Advisor: Unparsable content: {advice_response.content}---")
+        print(f"---Strategic Advisor: Unparsable content: {advice_content}---")
         strategic_advice = {"error": "Failed to generate valid JSON advice.", "exception": str(e)}
 
     print("---Strategic Advisor Finished---")
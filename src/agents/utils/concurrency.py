@@ -0,0 +1,167 @@
+"""
+Process-wide concurrency budgets for scarce provider capacity.
+
+Every report running in this process shares the same LLM and search budgets,
+so concurrent reports queue for a slot instead of flooding OpenRouter and the
+search providers with requests that end in 429 retries. Waiting calls are
+served by the priority of the report they belong to.
+"""
+
+import os
+import time
+import asyncio
+import itertools
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from src.agents.utils.priority import PRIORITY_LEVELS, current_priority
+
+# Share of a budget that low priority calls may hold at once, so higher priority
+# calls always find free slots quickly
+LOW_PRIORITY_BUDGET_SHARE = float(os.getenv("LOW_PRIORITY_BUDGET_SHARE", "0.5"))
+# A call waiting longer than this is served next whatever its priority
+BUDGET_MAX_WAIT_SECONDS = float(os.getenv("BUDGET_MAX_WAIT_SECONDS", "30"))
+
+
+class _SlotWaiter:
+    def __init__(self, priority: str, future: asyncio.Future, order: int):
+        self.priority = priority
+        self.future = future
+        self.order = order
+        self.since = time.monotonic()
+
+
+class _PrioritySlots:
+    """The slots of a budget on one event loop, granted to waiters by priority."""
+
+    def __init__(self, limit: int, low_priority_limit: int):
+        self.limit = limit
+        self.low_priority_limit = low_priority_limit
+        self.in_use = 0
+        self.low_priority_in_use = 0
+        self.waiters: List[_SlotWaiter] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: str):
+        waiter = _SlotWaiter(priority, asyncio.get_running_loop().create_future(), next(self._order))
+        self.waiters.append(waiter)
+        self._grant()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # Granted just before the cancellation arrived: hand the slot on
+                self.release(priority)
+            raise
+
+    def release(self, priority: str):
+        self.in_use -= 1
+        if priority == "low":
+            self.low_priority_in_use -= 1
+        self._grant()
+
+    def _grant(self):
+        while self.waiters and self.in_use < self.limit:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.waiters.remove(waiter)
+            if waiter.future.done():
+                # Cancelled in the same loop iteration, before it could leave the queue itself
+                continue
+            self.in_use += 1
+            if waiter.priority == "low":
+                self.low_priority_in_use += 1
+            waiter.future.set_result(None)
+
+    def _next_waiter(self) -> Optional[_SlotWaiter]:
+        now = time.monotonic()
+        best, best_key = None, None
+        for waiter in self.waiters:
+            starved = now - waiter.since >= BUDGET_MAX_WAIT_SECONDS
+            if waiter.priority == "low" and not starved and self.low_priority_in_use >= self.low_priority_limit:
+                continue
+            # Starved waiters first, then by priority, then first come first served
+            key = (not starved, PRIORITY_LEVELS.index(waiter.priority), waiter.order)
+            if best_key is None or key < best_key:
+                best, best_key = waiter, key
+        return best
+
+
+class ConcurrencyBudget:
+    """A named cap on concurrent in-flight calls, shared by the whole process.
+
+    Free slots go to the highest priority waiting call (see priority.py), low
+    priority calls may only hold part of the budget, and a call that has waited
+    BUDGET_MAX_WAIT_SECONDS is served next regardless, so none starves.
+    """
+
+    def __init__(self, name: str, limit: int, low_priority_share: float = LOW_PRIORITY_BUDGET_SHARE):
+        self.name = name
+        self.limit = max(int(limit), 1)
+        self.low_priority_limit = min(max(int(self.limit * low_priority_share), 1), self.limit)
+        # asyncio primitives are bound to a single event loop, so keep one per loop
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _PrioritySlots]" = weakref.WeakKeyDictionary()
+
+    def _get_slots(self) -> _PrioritySlots:
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = _PrioritySlots(self.limit, self.low_priority_limit)
+            self._slots[loop] = slots
+        return slots
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """Wait for a free slot and hold it for the duration of the block.
+
+        Args:
+            priority: Priority level of the call (defaults to the current run's)
+        """
+        priority = priority or current_priority()
+        slots = self._get_slots()
+        await slots.acquire(priority)
+        try:
+            yield
+        finally:
+            slots.release(priority)
+
+
+# Shared budgets, sized from the environment
+LLM_BUDGET = ConcurrencyBudget("llm", int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+SEARCH_BUDGET = ConcurrencyBudget("search", int(os.getenv("SEARCH_MAX_CONCURRENCY", "8")))
+
+
+def llm_slot():
+    """Hold one slot of the process-wide LLM concurrency budget."""
+    return LLM_BUDGET.slot()
+
+
+def search_slot():
+    """Hold one slot of the process-wide search concurrency budget."""
+    return SEARCH_BUDGET.slot()
+
+
+# Number of callers awaiting each shared in-flight future
+_shared_waiters: Dict[asyncio.Future, int] = {}
+
+
+async def await_shared(future: asyncio.Future):
+    """Await a future shared by concurrent callers (e.g. a coalesced search or summary).
+
+    Cancelling one caller does not cancel the work the others are waiting for,
+    but once every caller has been cancelled the shared future is cancelled
+    too, instead of running on for nobody.
+    """
+    _shared_waiters[future] = _shared_waiters.get(future, 0) + 1
+    try:
+        return await asyncio.shield(future)
+    finally:
+        _shared_waiters[future] -= 1
+        if not _shared_waiters[future]:
+            del _shared_waiters[future]
+            if not future.done():
+                future.cancel()
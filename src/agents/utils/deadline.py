@@ -0,0 +1,114 @@
+"""
+End-to-end deadlines for report requests.
+
+A request gets one time budget, set explicitly by the caller or derived from the
+work order's urgency level. Every stage sizes its work to what is left of it:
+web research plans without searching, generates fewer queries and skips
+reflection rounds as time runs short, the knowledge base loop gets fewer
+rewrite iterations, and web research is skipped altogether (knowledge base
+only) when there is no time for it. Whatever was cut short is recorded on the
+deadline so the result can be marked as partial.
+
+Budgets per urgency level can be overridden with ``REPORT_DEADLINE_<LEVEL>``
+(seconds, 0 for no limit), e.g. ``REPORT_DEADLINE_NORMAL=1200``.
+"""
+
+import os
+import time
+from typing import Dict, List, Optional
+
+# Default end-to-end budget per urgency level, in seconds (None = no limit)
+_DEFAULT_URGENCY_DEADLINES: Dict[str, Optional[float]] = {
+    "urgent": 240,
+    "high": 420,
+    "normal": 900,
+    "low": None,
+}
+
+# Urgency levels as the Persian query understanding prompt writes them
+_URGENCY_ALIASES = {
+    "فوری": "urgent", "خیلی فوری": "urgent",
+    "بالا": "high", "زیاد": "high",
+    "عادی": "normal", "متوسط": "normal",
+    "کم": "low", "پایین": "low",
+}
+
+# Seconds kept back for the advice synthesis and report writing after research
+SYNTHESIS_RESERVE_SECONDS = float(os.getenv("SYNTHESIS_RESERVE_SECONDS", "120"))
+# Seconds kept back for the knowledge base extraction that follows web research
+KNOWLEDGE_BASE_RESERVE_SECONDS = float(os.getenv("KNOWLEDGE_BASE_RESERVE_SECONDS", "60"))
+# Web research is skipped when less than this is left for it
+MIN_WEB_RESEARCH_SECONDS = float(os.getenv("MIN_WEB_RESEARCH_SECONDS", "90"))
+
+
+def normalize_urgency(urgency_level: Optional[str]) -> str:
+    """A work order urgency level as one of urgent/high/normal/low (unknown levels count as normal)."""
+    level = (urgency_level or "normal").strip().lower()
+    level = _URGENCY_ALIASES.get(level, level)
+    return level if level in _DEFAULT_URGENCY_DEADLINES else "normal"
+
+
+def get_urgency_deadline(urgency_level: Optional[str]) -> Optional[float]:
+    """The default budget in seconds of a work order urgency level."""
+    level = normalize_urgency(urgency_level)
+    override = os.getenv(f"REPORT_DEADLINE_{level.upper()}")
+    if override not in (None, ""):
+        return float(override) or None
+    return _DEFAULT_URGENCY_DEADLINES[level]
+
+
+class Deadline:
+    """Wall-clock time a request must be done by, shared by every stage working on it."""
+
+    def __init__(self, expires_at: Optional[float] = None, degradations: Optional[List[Dict[str, str]]] = None):
+        self.expires_at = expires_at
+        # Shared with the deadlines derived by reserving(), so every stage logs to one place
+        self.degradations = degradations if degradations is not None else []
+
+    @classmethod
+    def for_request(
+        cls,
+        seconds: Optional[float] = None,
+        urgency_level: Optional[str] = None,
+        started_at: Optional[float] = None
+    ) -> "Deadline":
+        """Deadline of a request: ``seconds`` if given, otherwise the budget of its urgency level.
+
+        Args:
+            seconds: Explicit budget set by the caller (0 or less for no limit)
+            urgency_level: The work order's urgency level
+            started_at: Wall-clock time the request started (defaults to now)
+        """
+        if seconds is None:
+            seconds = get_urgency_deadline(urgency_level)
+        if not seconds or seconds <= 0:
+            return cls()
+        return cls((started_at or time.time()) + seconds)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when there is no limit."""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.time(), 0.0)
+
+    def less_than(self, seconds: float) -> bool:
+        """Whether less than ``seconds`` are left (never true without a limit)."""
+        remaining = self.remaining()
+        return remaining is not None and remaining < seconds
+
+    def reserving(self, seconds: float) -> "Deadline":
+        """Deadline of a stage that must leave ``seconds`` for the stages after it."""
+        if self.expires_at is None:
+            return self
+        return Deadline(self.expires_at - seconds, self.degradations)
+
+    def degrade(self, stage: str, note: str):
+        """Record that a stage cut its work short to meet the deadline."""
+        self.degradations.append({"stage": stage, "note": note})
+        remaining = self.remaining()
+        print(f"---Deadline: {stage}: {note} ({remaining:.0f}s left)---" if remaining is not None else f"---Deadline: {stage}: {note}---")
+
+    @property
+    def is_partial(self) -> bool:
+        """Whether any stage was cut short."""
+        return bool(self.degradations)
@@ -0,0 +1,67 @@
+"""
+Scheduling priority of report runs.
+
+A run's priority comes from its client's tier (set by the API key it was
+requested with) and is raised or lowered one level by the urgency of its work
+order. It decides the order in which queued report jobs are started and which
+waiting calls get the scarce LLM and search concurrency slots first.
+
+Priority levels are "high", "normal" and "low". Tiers map to them as
+premium -> high, standard -> normal and batch -> low; an urgent or high urgency
+work order moves its run up a level, a low urgency one moves it down.
+"""
+
+import os
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from src.agents.utils.deadline import normalize_urgency
+
+# Priority levels, most urgent first
+PRIORITY_LEVELS = ["high", "normal", "low"]
+
+# Base priority level of each client tier
+TIER_PRIORITIES: Dict[str, str] = {
+    "premium": "high",
+    "standard": "normal",
+    "batch": "low",
+}
+DEFAULT_CLIENT_TIER = os.getenv("DEFAULT_CLIENT_TIER", "standard")
+
+# Levels a work order's urgency moves its run up (positive) or down
+_URGENCY_ADJUSTMENTS = {"urgent": 1, "high": 1, "normal": 0, "low": -1}
+
+
+def get_priority(tier: Optional[str] = None, urgency_level: Optional[str] = None) -> str:
+    """The priority level of a run for a client tier and work order urgency level."""
+    tier = (tier or DEFAULT_CLIENT_TIER).strip().lower()
+    base = TIER_PRIORITIES.get(tier, TIER_PRIORITIES.get(DEFAULT_CLIENT_TIER, "normal"))
+    rank = PRIORITY_LEVELS.index(base) - _URGENCY_ADJUSTMENTS[normalize_urgency(urgency_level)]
+    return PRIORITY_LEVELS[min(max(rank, 0), len(PRIORITY_LEVELS) - 1)]
+
+
+class RunPriority:
+    """Priority of one orchestrator run; its urgency is filled in once the work order exists."""
+
+    def __init__(self, tier: Optional[str] = None, urgency_level: Optional[str] = None):
+        self.tier = tier or DEFAULT_CLIENT_TIER
+        self.urgency_level = urgency_level
+
+    @property
+    def level(self) -> str:
+        return get_priority(self.tier, self.urgency_level)
+
+
+# Priority of the run the current task works for; tasks created by the run inherit it
+_run_priority: ContextVar[Optional[RunPriority]] = ContextVar("run_priority", default=None)
+
+
+def track_run_priority(priority: RunPriority):
+    """Schedule every provider call made from the current task (and the tasks it creates) at ``priority``."""
+    _run_priority.set(priority)
+
+
+def current_priority() -> str:
+    """Priority level of the current run ("normal" outside of one)."""
+    priority = _run_priority.get()
+    return priority.level if priority is not None else "normal"
@@ -0,0 +1,158 @@
+"""
+Compact, token-budgeted serialization of structured data into prompts.
+
+Work orders, market data and advice used to go into prompts as pretty-printed
+JSON: null-filled keys, deep indentation and Persian text escaped to \\uXXXX
+sequences. serialize_for_prompt renders the same data as compact indented
+"key: value" lines instead. Empty fields are dropped, lists of records (such
+as key_market_data) become pipe-separated tables, and the result is truncated
+deterministically to a token budget.
+"""
+
+import os
+import re
+import json
+from typing import Any, Optional
+
+from src.agents.utils.rate_limiter import estimate_tokens
+
+# Default token budget of one serialized structure
+PROMPT_DATA_TOKEN_BUDGET = int(os.getenv("PROMPT_DATA_TOKEN_BUDGET", "4000"))
+
+# Truncation steps, applied in order until the text fits the budget
+_STRING_LIMITS = (2000, 800, 300)
+_LIST_LIMITS = (20, 10, 5, 3)
+
+
+def prune_empty(value: Any) -> Any:
+    """Recursively drop None, empty strings and empty containers (0 and False are kept)."""
+    if isinstance(value, dict):
+        pruned = {key: prune_empty(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        pruned = [prune_empty(item) for item in value]
+        return [item for item in pruned if item not in (None, "", [], {})]
+    if hasattr(value, "model_dump"):
+        return prune_empty(value.model_dump())
+    return value
+
+
+def _limit(value: Any, max_string: Optional[int], max_items: Optional[int]) -> Any:
+    """Cut strings and lists to the given sizes, marking what was cut."""
+    if isinstance(value, dict):
+        return {key: _limit(item, max_string, max_items) for key, item in value.items()}
+    if isinstance(value, list):
+        items = [_limit(item, max_string, max_items) for item in value[:max_items]]
+        if max_items is not None and len(value) > max_items:
+            items.append(f"... {len(value) - max_items} more")
+        return items
+    if isinstance(value, str) and max_string is not None and len(value) > max_string:
+        return value[:max_string] + "..."
+    return value
+
+
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def _scalar(value: Any) -> str:
+    """A value as text. Runs of spaces and tabs are collapsed; line breaks (paragraphs, lists in the text) are kept."""
+    if isinstance(value, str):
+        lines = (_SPACES.sub(" ", line).strip() for line in value.strip().splitlines())
+        return _BLANK_LINES.sub("\n\n", "\n".join(lines))
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return str(value)
+
+
+def _cell(value: Any) -> str:
+    """A table cell, kept on its row's line."""
+    return " ".join(_scalar(value).split()).replace("|", "/")
+
+
+def _continue(text: str, pad: str) -> str:
+    """Indent the continuation lines of a multiline value under its first line."""
+    first, *rest = text.split("\n")
+    return "\n".join([first, *(pad + "  " + line if line else "" for line in rest)])
+
+
+def _is_table(items: list) -> bool:
+    """Lists of two or more flat records are rendered as tables."""
+    return len(items) >= 2 and all(
+        isinstance(item, dict) and not any(isinstance(v, dict) for v in item.values()) for item in items
+    )
+
+
+def _render(value: Any, indent: int = 0) -> list[str]:
+    pad = " " * indent
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            if isinstance(item, dict):
+                lines.append(f"{pad}{key}:")
+                lines.extend(_render(item, indent + 2))
+            elif isinstance(item, list) and any(isinstance(i, dict) for i in item):
+                lines.append(f"{pad}{key}:")
+                lines.extend(_render(item, indent + 2))
+            elif isinstance(item, list):
+                lines.append(f"{pad}{key}: " + _continue("; ".join(_scalar(i) for i in item), pad))
+            else:
+                lines.append(f"{pad}{key}: {_continue(_scalar(item), pad)}")
+        return lines
+    if isinstance(value, list):
+        records = [item for item in value if isinstance(item, dict)]
+        if _is_table(records):
+            columns = list(dict.fromkeys(key for record in records for key in record))
+            lines = [pad + " | ".join(columns)]
+            lines.extend(
+                pad + " | ".join(_cell(record.get(column, "")) for column in columns)
+                for record in records
+            )
+            # Markers such as "... 3 more" left by truncation
+            lines.extend(pad + _scalar(item) for item in value if not isinstance(item, dict))
+            return lines
+        lines = []
+        for item in value:
+            if isinstance(item, dict):
+                # One record per "- " block, its fields indented below the dash
+                item_lines = _render(item, indent + 2)
+                lines.append(f"{pad}- {item_lines[0].lstrip()}" if item_lines else f"{pad}-")
+                lines.extend(item_lines[1:])
+            else:
+                lines.append(f"{pad}- {_continue(_scalar(item), pad)}")
+        return lines
+    return [pad + _continue(_scalar(value), pad)]
+
+
+def serialize_for_prompt(data: Any, token_budget: Optional[int] = PROMPT_DATA_TOKEN_BUDGET, label: str = "data") -> str:
+    """Render structured data compactly for a prompt, within a token budget.
+
+    Args:
+        data: Dict, list, Pydantic model or scalar to render
+        token_budget: Approximate maximum tokens of the output (None for no limit)
+        label: Name of the structure, used in the size log line
+
+    Returns:
+        str: The compact rendering. Long strings and lists are cut first; if the
+        text still does not fit, it is cut at the budget.
+    """
+    pruned = prune_empty(data)
+    text = "\n".join(_render(pruned))
+
+    if token_budget is not None and estimate_tokens(text) > token_budget:
+        for max_string in _STRING_LIMITS:
+            for max_items in (None, *_LIST_LIMITS):
+                text = "\n".join(_render(_limit(pruned, max_string, max_items)))
+                if estimate_tokens(text) <= token_budget:
+                    break
+            else:
+                continue
+            break
+        if estimate_tokens(text) > token_budget:
+            text = text[:token_budget * 4] + "\n... [truncated]"
+
+    if hasattr(data, "model_dump"):
+        data = data.model_dump()
+    before = estimate_tokens(json.dumps(data, indent=2, default=str))
+    print(f"---Prompt Serializer: {label} {before} -> {estimate_tokens(text)} tokens---")
+    return text
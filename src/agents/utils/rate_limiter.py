@@ -0,0 +1,365 @@
+"""
+Process-wide rate limiting, retry and circuit breaking for LLM and search providers.
+
+Every provider gets a ProviderLimiter with token buckets for requests per minute
+and tokens per minute, a retry policy with exponential backoff and jitter for
+transient errors (429s, 5xx, timeouts, dropped connections) and a circuit
+breaker that fails fast while the provider is down.
+
+Limits are read from the environment, e.g. ``TAVILY_RPM=100`` or
+``OPENAI_TPM=200000``; a missing or zero limit means "unlimited".
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class ProviderUnavailableError(RuntimeError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``capacity`` per minute.
+
+    Callers reserve tokens up front and get back how long to wait before using
+    them, so the same bucket serves sync and async code.
+    """
+
+    def __init__(self, capacity: float):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take ``amount`` tokens and return the number of seconds to wait."""
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class CircuitBreaker:
+    """Opens after consecutive provider failures and lets one probe through after a cooldown."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider right now."""
+        return self.admit() is not None
+
+    def admit(self) -> Optional[str]:
+        """Admit a call: "call" while closed, "probe" for the one half-open probe, None to fail fast.
+
+        Whoever is admitted as the probe must end it with record_success,
+        record_failure or release_probe, or no call is let through again.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return "call"
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probe_in_flight:
+                return None
+            self._probe_in_flight = True
+            return "probe"
+
+    def release_probe(self):
+        """End a probe that was abandoned (e.g. cancelled) before the provider answered.
+
+        Nothing was learnt about the provider, so the breaker stays half-open
+        and the next call becomes the probe.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+_RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+_RETRYABLE_ERROR_NAMES = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "ServiceUnavailableError", "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded",
+    "TimeoutException", "ConnectError", "ReadError", "RemoteProtocolError",
+    "ClientConnectionError", "ServerDisconnectedError", "ClientOSError",
+}
+
+
+def get_status_code(error: BaseException) -> Optional[int]:
+    """Best-effort HTTP status code of a provider error."""
+    for attr in ("status_code", "status", "code", "http_status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    for attr in ("status_code", "status"):
+        value = getattr(response, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether an error is transient and worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = get_status_code(error)
+    if status is not None:
+        return status in _RETRYABLE_STATUS_CODES
+    if any(cls.__name__ in _RETRYABLE_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header on the error's response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.getenv(name)
+    try:
+        return float(value) if value not in (None, "") else default
+    except ValueError:
+        return default
+
+
+class RunUsage:
+    """Provider calls and estimated prompt tokens spent on behalf of one orchestrator run."""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.tokens: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, tokens: float = 0):
+        with self._lock:
+            self.calls[provider] = self.calls.get(provider, 0) + 1
+            self.tokens[provider] = self.tokens.get(provider, 0) + tokens
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {"calls": dict(self.calls), "tokens": dict(self.tokens)}
+
+
+# Usage of the run the current task works for; tasks created by the run inherit it
+_run_usage: ContextVar[Optional[RunUsage]] = ContextVar("run_usage", default=None)
+
+
+def track_run_usage(usage: RunUsage):
+    """Charge every provider call made from the current task (and the tasks it creates) to ``usage``."""
+    _run_usage.set(usage)
+
+
+class ProviderLimiter:
+    """Rate limits, retries and circuit breaking for a single provider."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    @classmethod
+    def from_env(cls, name: str) -> "ProviderLimiter":
+        """Build a limiter from ``<NAME>_RPM``, ``<NAME>_TPM``, ``<NAME>_MAX_RETRIES`` and friends."""
+        prefix = name.upper().replace("-", "_")
+        defaults = DEFAULT_LIMITS.get(name, {})
+        return cls(
+            name,
+            requests_per_minute=_env_number(f"{prefix}_RPM", defaults.get("rpm", 0)),
+            tokens_per_minute=_env_number(f"{prefix}_TPM", defaults.get("tpm", 0)),
+            max_retries=int(_env_number(f"{prefix}_MAX_RETRIES", _env_number("PROVIDER_MAX_RETRIES", 4))),
+            base_delay=_env_number("PROVIDER_RETRY_BASE_DELAY", 1.0),
+            max_delay=_env_number("PROVIDER_RETRY_MAX_DELAY", 30.0),
+            failure_threshold=int(_env_number("PROVIDER_BREAKER_THRESHOLD", 5)),
+            reset_timeout=_env_number("PROVIDER_BREAKER_RESET", 30.0),
+        )
+
+    def _reserve(self, tokens: float) -> float:
+        # Every attempt is charged to the run it is made for
+        usage = _run_usage.get()
+        if usage is not None:
+            usage.record(self.name, tokens)
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and tokens > 0:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        return wait
+
+    def _check_breaker(self) -> bool:
+        """Fail fast while the breaker is open; returns whether this call is the half-open probe."""
+        admission = self.breaker.admit()
+        if admission is None:
+            raise ProviderUnavailableError(f"Provider '{self.name}' is unavailable (circuit open), failing fast")
+        return admission == "probe"
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _handle_failure(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Record a failure and return the delay before retrying, or None to give up."""
+        if not is_retryable_error(error):
+            # The provider answered; a bad request says nothing about its health
+            self.breaker.record_success()
+            return None
+        if get_status_code(error) == 429 or "rate limit" in str(error).lower():
+            # Throttled, not down: back off without tripping the breaker
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt, error)
+        print(f"---Rate Limiter: {self.name} call failed ({type(error).__name__}: {error}), retrying in {delay:.1f}s "
+              f"(attempt {attempt + 1}/{self.max_retries})---")
+        return delay
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        tokens: float = 0,
+        slot: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """Await ``fn()`` under the provider's limits, retrying transient failures.
+
+        Args:
+            fn: Zero-argument callable returning a fresh awaitable for each attempt
+            tokens: Estimated tokens the call consumes, charged to the TPM bucket
+            slot: Optional factory for an async context manager held only while
+                the call is in flight (e.g. a concurrency budget slot)
+        """
+        attempt = 0
+        while True:
+            probe = self._check_breaker()
+            try:
+                wait = self._reserve(tokens)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                async with (slot() if slot else nullcontext()):
+                    result = await fn()
+            except asyncio.CancelledError:
+                # A lost hedge, a client disconnect or a deadline: the probe never finished
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            except Exception as e:
+                delay = self._handle_failure(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def call(self, fn: Callable[[], Any], tokens: float = 0) -> Any:
+        """Blocking counterpart of ``acall`` for synchronous clients."""
+        attempt = 0
+        while True:
+            probe = self._check_breaker()
+            try:
+                wait = self._reserve(tokens)
+                if wait > 0:
+                    time.sleep(wait)
+                result = fn()
+            except Exception as e:
+                delay = self._handle_failure(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            return result
+
+
+# Defaults used when no <NAME>_RPM / <NAME>_TPM is set, matching the providers' documented quotas
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    "exa": {"rpm": 240},  # 5 requests per second, with headroom
+    "googlesearch": {"rpm": 300},
+}
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(name: str) -> ProviderLimiter:
+    """Return the process-wide limiter for a provider, creating it on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = ProviderLimiter.from_env(name)
+            _limiters[name] = limiter
+        return limiter
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count using the 4-characters-per-token rule of thumb."""
+    return len(text) // 4 if text else 0
@@ -0,0 +1,280 @@
+"""
+Semantic cache of finished reports, keyed on work order similarity.
+
+Queries worded differently often produce equivalent work orders: the same
+client type, task, location, property type and timeline. Each complete report
+is stored in a local SQLite file with its strategic advice and an embedding of
+its normalized work order. A new work order is looked up among the stored ones
+that match it field by field and are fresh enough:
+
+- a "hit" (similarity >= REPORT_CACHE_HIT_THRESHOLD, same language and report
+  date, younger than REPORT_CACHE_TTL_HOURS) is served as is;
+- a "warm" match (similarity >= REPORT_CACHE_WARM_THRESHOLD, same language and
+  report date, younger than REPORT_CACHE_WARM_TTL_HOURS) reuses the strategic
+  advice, so only the report is written anew.
+
+Partial reports (cut short by a deadline, or a region comparison missing some
+of its regions) are never stored, and work orders that constrain nothing (such
+as the fallback of a failed query understanding) are neither looked up nor
+stored: unrelated queries would all look alike.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.agents.utils.web_deep_research.dedup import normalize_text
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+
+REPORT_CACHE_DB_PATH = os.getenv(
+    "REPORT_CACHE_DB",
+    os.path.join(project_root, "data", "processed", "report_cache.sqlite")
+)
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE", "true").lower() == "true"
+# Cosine similarity of the work order embeddings needed to serve a stored report / reuse its advice
+REPORT_CACHE_HIT_THRESHOLD = float(os.getenv("REPORT_CACHE_HIT_THRESHOLD", "0.95"))
+REPORT_CACHE_WARM_THRESHOLD = float(os.getenv("REPORT_CACHE_WARM_THRESHOLD", "0.88"))
+# How old a stored report may be to be served / to have its advice reused
+REPORT_CACHE_TTL_HOURS = float(os.getenv("REPORT_CACHE_TTL_HOURS", "24"))
+REPORT_CACHE_WARM_TTL_HOURS = float(os.getenv("REPORT_CACHE_WARM_TTL_HOURS", "72"))
+
+# Work order fields that must match exactly (after normalization) for any reuse
+CONSTRAINT_FIELDS = ("client_type", "primary_task", "location", "property_type", "timeline")
+# Normalized field values that say nothing about the request
+_UNINFORMATIVE_VALUES = {"", "unknown"}
+
+
+def _work_order_field(work_order: Dict[str, Any], field: str) -> Any:
+    """A field of a work order, wherever the query understanding agent put it."""
+    for section in (work_order, work_order.get("key_information") or {}, work_order.get("property_specs") or {}):
+        if isinstance(section, dict) and section.get(field) not in (None, "", []):
+            return section[field]
+    return None
+
+
+def _normalize(value: Any) -> str:
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return " ".join(normalize_text(str(value))) if value is not None else ""
+
+
+def work_order_constraints(work_order: Dict[str, Any]) -> Dict[str, str]:
+    """The normalized constraint fields of a work order."""
+    return {field: _normalize(_work_order_field(work_order, field)) for field in CONSTRAINT_FIELDS}
+
+
+def work_order_text(work_order: Dict[str, Any]) -> str:
+    """The text a work order is embedded as: its processed query and key information.
+
+    A fallback work order (query understanding failed) only carries the raw
+    user query under "key_info", which is used instead.
+    """
+    key_information = work_order.get("key_information") or {}
+    details = {key: value for key, value in key_information.items() if value not in (None, "", [])}
+    raw_query = (work_order.get("key_info") or {}).get("query")
+    parts = [
+        _normalize(work_order.get("processed_query") or key_information.get("query") or raw_query or ""),
+        _normalize(details),
+        _normalize(work_order.get("secondary_tasks") or []),
+    ]
+    return "\n".join(part for part in parts if part)
+
+
+def is_cacheable(work_order: Dict[str, Any]) -> bool:
+    """Whether a work order says enough about the request to be compared with others.
+
+    Work orders with no informative constraint field, or nothing to embed,
+    would match every other such work order.
+    """
+    constraints = work_order_constraints(work_order)
+    if all(value in _UNINFORMATIVE_VALUES for value in constraints.values()):
+        return False
+    return bool(work_order_text(work_order))
+
+
+class ReportCache:
+    """Persistent store of complete reports, looked up by work order similarity."""
+
+    def __init__(self, db_path: str = REPORT_CACHE_DB_PATH, embeddings=None):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._embeddings = embeddings
+        self.hits = 0
+        self.warm_hits = 0
+        self.misses = 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS reports (
+                    entry_id TEXT PRIMARY KEY,
+                    {", ".join(f"{field} TEXT NOT NULL" for field in CONSTRAINT_FIELDS)},
+                    language TEXT NOT NULL,
+                    report_date TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    work_order TEXT NOT NULL,
+                    advice TEXT NOT NULL,
+                    report TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS reports_constraints ON reports ({', '.join(CONSTRAINT_FIELDS)}, created_at)"
+            )
+
+    def embed(self, work_order: Dict[str, Any]) -> np.ndarray:
+        """Unit-length embedding of a work order."""
+        if self._embeddings is None:
+            from src.configs.embeddings_config import get_default_embeddings
+            self._embeddings = get_default_embeddings()
+        vector = np.asarray(self._embeddings.embed_query(work_order_text(work_order)), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(
+        self,
+        work_order: Dict[str, Any],
+        embedding: np.ndarray,
+        language: str,
+        report_date: str
+    ) -> Optional[Dict[str, Any]]:
+        """The most similar fresh report of an equivalent work order, if it is similar enough.
+
+        Returns a dict with "kind" ("hit" or "warm"), "similarity", "entry_id",
+        "created_at", "advice" and, for hits, "report".
+        """
+        constraints = work_order_constraints(work_order)
+        cutoff = time.time() - max(REPORT_CACHE_TTL_HOURS, REPORT_CACHE_WARM_TTL_HOURS) * 3600
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT entry_id, language, report_date, embedding, advice, report, created_at FROM reports
+                    WHERE {" AND ".join(f"{field} = ?" for field in CONSTRAINT_FIELDS)} AND created_at >= ?""",
+                (*constraints.values(), cutoff)
+            ).fetchall()
+        if not rows:
+            self.misses += 1
+            return None
+
+        similarities = np.stack([np.frombuffer(row[3], dtype=np.float32) for row in rows]) @ embedding
+        now = time.time()
+        best = None
+        for row, similarity in zip(rows, similarities.tolist()):
+            entry_id, row_language, row_report_date, _, advice, report, created_at = row
+            age_hours = (now - created_at) / 3600
+            if (similarity >= REPORT_CACHE_HIT_THRESHOLD and age_hours <= REPORT_CACHE_TTL_HOURS
+                    and row_language == language and row_report_date == report_date.strip()):
+                kind = "hit"
+            elif (similarity >= REPORT_CACHE_WARM_THRESHOLD and age_hours <= REPORT_CACHE_WARM_TTL_HOURS
+                    and row_language == language and row_report_date == report_date.strip()):
+                kind = "warm"
+            else:
+                continue
+            # Hits first, then the most similar
+            if best is None or (kind == "hit", similarity) > (best["kind"] == "hit", best["similarity"]):
+                best = {
+                    "kind": kind,
+                    "similarity": round(similarity, 4),
+                    "entry_id": entry_id,
+                    "created_at": created_at,
+                    "advice": json.loads(advice),
+                    "report": report if kind == "hit" else None,
+                }
+        if best is None:
+            self.misses += 1
+        elif best["kind"] == "hit":
+            self.hits += 1
+        else:
+            self.warm_hits += 1
+        return best
+
+    def store(
+        self,
+        work_order: Dict[str, Any],
+        embedding: np.ndarray,
+        language: str,
+        report_date: str,
+        advice: Dict[str, Any],
+        report: str
+    ):
+        constraints = work_order_constraints(work_order)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"""INSERT INTO reports (entry_id, {", ".join(CONSTRAINT_FIELDS)}, language, report_date,
+                    embedding, work_order, advice, report, created_at)
+                    VALUES ({", ".join("?" * (len(CONSTRAINT_FIELDS) + 8))})""",
+                (
+                    str(uuid.uuid4()), *constraints.values(), language, report_date.strip(),
+                    embedding.astype(np.float32).tobytes(), json.dumps(work_order, ensure_ascii=False),
+                    json.dumps(advice, ensure_ascii=False), report, time.time()
+                )
+            )
+            # Entries too old to be reused in any way
+            self._conn.execute(
+                "DELETE FROM reports WHERE created_at < ?",
+                (time.time() - max(REPORT_CACHE_TTL_HOURS, REPORT_CACHE_WARM_TTL_HOURS) * 3600,)
+            )
+
+
+_report_cache: Optional[ReportCache] = None
+_report_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """Return the process-wide report cache, creating it on first use."""
+    global _report_cache
+    with _report_cache_lock:
+        if _report_cache is None:
+            _report_cache = ReportCache()
+        return _report_cache
+
+
+async def find_cached_report(
+    work_order: Dict[str, Any],
+    language: str,
+    report_date: str
+) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+    """Look a work order up in the report cache.
+
+    Returns the match (or None) and the work order's embedding, to store the
+    report under once it is written (None if the report must not be stored).
+    The cache is an optimization only: if it is disabled or fails, the report
+    is simply produced from scratch.
+    """
+    if not REPORT_CACHE_ENABLED:
+        return None, None
+    if not is_cacheable(work_order):
+        print("---Report cache: work order too vague to compare, skipping the cache---")
+        return None, None
+    try:
+        cache = get_report_cache()
+        embedding = await asyncio.to_thread(cache.embed, work_order)
+        match = await asyncio.to_thread(cache.lookup, work_order, embedding, language, report_date)
+    except Exception as e:
+        print(f"---Report cache: lookup failed, producing the report from scratch: {e}---")
+        return None, None
+    if match is not None:
+        print(f"---Report cache: {match['kind']} (similarity {match['similarity']:.3f})---")
+    return match, embedding
+
+
+async def cache_report(
+    work_order: Dict[str, Any],
+    embedding: Optional[np.ndarray],
+    language: str,
+    report_date: str,
+    advice: Dict[str, Any],
+    report: str
+):
+    """Store a complete report for later equivalent work orders."""
+    if embedding is None:
+        return
+    try:
+        await asyncio.to_thread(get_report_cache().store, work_order, embedding, language, report_date, advice, report)
+    except Exception as e:
+        print(f"---Report cache: could not store the report: {e}---")
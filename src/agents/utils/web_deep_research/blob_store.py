@@ -0,0 +1,157 @@
+"""
+Run-scoped store for the large text payloads of the web research graph.
+
+Formatted search sources and the researched sections are hundreds of KB per
+report. Instead of copying them through every node, Send() payload and
+checkpoint, the graph state carries short content ids ("blob:<sha256>") and the
+nodes that need the text dereference them here.
+
+Blobs are kept in memory up to a byte limit and spilled to disk beyond it.
+Checkpointed runs write every blob through to disk, so a resumed run can still
+dereference the ids stored in its checkpoint.
+"""
+
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../'))
+
+BLOB_DIR = os.getenv(
+    "WEB_RESEARCH_BLOB_DIR",
+    os.path.join(project_root, "data", "processed", "web_research_blobs")
+)
+BLOB_MEMORY_BYTES = int(float(os.getenv("WEB_RESEARCH_BLOB_MEMORY_MB", "64")) * 1024 * 1024)
+
+BLOB_PREFIX = "blob:"
+DEFAULT_SCOPE = "default"
+
+
+def is_blob_ref(value) -> bool:
+    """Whether a state value is a blob content id rather than inline text."""
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX)
+
+
+class BlobStore:
+    """Content-addressed text store, in memory with spill to a per-run directory."""
+
+    def __init__(self, spill_dir: str, max_memory_bytes: int = BLOB_MEMORY_BYTES, write_through: bool = False):
+        self.spill_dir = spill_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.write_through = write_through
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.spill_dir, f"{digest}.txt")
+
+    def _write(self, digest: str, text: str):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def put(self, text: str) -> str:
+        """Store a text and return its content id."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return BLOB_PREFIX + digest
+            if self.write_through:
+                self._write(digest, text)
+            self._memory[digest] = text
+            self._memory_bytes += len(text)
+            # Spill the least recently used blobs once over the memory limit
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                old_digest, old_text = self._memory.popitem(last=False)
+                self._memory_bytes -= len(old_text)
+                self._write(old_digest, old_text)
+        return BLOB_PREFIX + digest
+
+    def get(self, blob_id: str) -> str:
+        """Return the text of a content id.
+
+        Raises:
+            KeyError: If the blob is neither in memory nor on disk
+        """
+        digest = blob_id[len(BLOB_PREFIX):]
+        with self._lock:
+            text = self._memory.get(digest)
+            if text is not None:
+                self._memory.move_to_end(digest)
+                return text
+        try:
+            with open(self._path(digest), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(f"Unknown blob {blob_id}") from None
+
+    def clear(self):
+        """Drop every blob of the run, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+_stores: Dict[str, BlobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_blob_scope(config: Optional[RunnableConfig]) -> tuple[str, bool]:
+    """The blob scope of a run and whether it is checkpointed (and so must persist its blobs)."""
+    configurable = (config or {}).get("configurable") or {}
+    thread_id = configurable.get("thread_id")
+    if thread_id:
+        return str(thread_id), True
+    return str(configurable.get("blob_scope") or DEFAULT_SCOPE), False
+
+
+def get_blob_store(config: Optional[RunnableConfig]) -> BlobStore:
+    """Return the blob store of the run a node belongs to, creating it on first use."""
+    scope, persistent = get_blob_scope(config)
+    with _stores_lock:
+        store = _stores.get(scope)
+        if store is None:
+            safe_scope = "".join(c if c.isalnum() or c in "-_" else "_" for c in scope)
+            store = BlobStore(os.path.join(BLOB_DIR, safe_scope), write_through=persistent)
+            _stores[scope] = store
+        return store
+
+
+def release_blob_store(config: Optional[RunnableConfig]):
+    """Free the blobs of a finished run."""
+    scope, _ = get_blob_scope(config)
+    with _stores_lock:
+        store = _stores.pop(scope, None)
+    if store is None:
+        # A resumed run in a new process may only have its blobs on disk
+        store = get_blob_store(config)
+        with _stores_lock:
+            _stores.pop(scope, None)
+    store.clear()
+
+
+def store_text(config: Optional[RunnableConfig], text: str) -> str:
+    """Put a payload in the run's blob store and return the content id to keep in state."""
+    return get_blob_store(config).put(text)
+
+
+def load_text(config: Optional[RunnableConfig], value: Optional[str]) -> str:
+    """Dereference a state value that is either a content id or (for older checkpoints) inline text."""
+    if not value:
+        return ""
+    if is_blob_ref(value):
+        return get_blob_store(config).get(value)
+    return value
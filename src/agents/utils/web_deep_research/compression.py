@@ -0,0 +1,145 @@
+"""
+Local extractive compression of formatted search sources, without any LLM call.
+
+Sources are split into sentences (Persian punctuation aware), every sentence is
+scored against the section description with a vectorized TF-IDF cosine, and
+only the best sentences are kept up to a token budget. Kept sentences stay
+grouped under their original source title and URL, so the writer can still
+cite them.
+"""
+
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+from src.agents.utils.web_deep_research.dedup import normalize_text
+
+# "--- SOURCE 1: title ---\nURL: ..." blocks produced by tavily_search
+_TAVILY_SOURCE = re.compile(r"--- SOURCE \d+: (?P<title>.*?) ---\nURL: (?P<url>\S+)\n(?P<body>.*?)(?=\n-{80}\n|\Z)", re.DOTALL)
+# "Source: title\n---\nURL: ..." blocks produced by deduplicate_and_format_sources
+_FORMATTED_SOURCE = re.compile(r"Source: (?P<title>.*?)\n-{80}\nURL: (?P<url>\S+)\n(?P<body>.*?)(?=\n={80}|\Z)", re.DOTALL)
+_BODY_LABELS = re.compile(r"^(SUMMARY:|FULL CONTENT:|===|Most relevant content from source:|Full source content limited to \d+ tokens:)\s*", re.MULTILINE)
+
+# Sentence ends: Latin and Persian full stops, question marks (including ؟), ! and ؛, or a blank line
+_SENTENCE_END = re.compile(r"(?<=[.!?؟؛۔])\s+|\n\s*\n|\n(?=[-*•#])")
+_HAS_NUMBER = re.compile(r"\d")
+
+MIN_SENTENCE_WORDS = 5
+
+
+def parse_sources(source_str: str) -> List[Tuple[str, str, str]]:
+    """Split a formatted source string into (title, url, text) tuples."""
+    matches = list(_TAVILY_SOURCE.finditer(source_str)) or list(_FORMATTED_SOURCE.finditer(source_str))
+    return [
+        (m.group("title").strip(), m.group("url").strip(), _BODY_LABELS.sub("", m.group("body")).strip())
+        for m in matches
+    ]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, dropping fragments too short to carry information."""
+    sentences = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = " ".join(sentence.split())
+        if len(sentence.split()) >= MIN_SENTENCE_WORDS:
+            sentences.append(sentence)
+    return sentences
+
+
+def score_sentences(sentences: List[str], query: str) -> np.ndarray:
+    """TF-IDF cosine similarity of every sentence to the query, computed in one vectorized pass.
+
+    Sentences carrying numbers get a small boost, since figures and dates are
+    what the section writer most often needs.
+    """
+    vocabulary = {}
+    sentence_ids, term_ids = [], []
+    for index, sentence in enumerate(sentences):
+        for word in normalize_text(sentence):
+            sentence_ids.append(index)
+            term_ids.append(vocabulary.setdefault(word, len(vocabulary)))
+    query_terms = [vocabulary[word] for word in set(normalize_text(query)) if word in vocabulary]
+    if not query_terms:
+        return np.zeros(len(sentences))
+
+    sentence_ids = np.asarray(sentence_ids)
+    term_ids = np.asarray(term_ids)
+
+    # Term frequencies as (sentence, term) pairs with counts
+    pairs, tf = np.unique(np.stack([sentence_ids, term_ids]), axis=1, return_counts=True)
+    document_frequency = np.bincount(pairs[1], minlength=len(vocabulary))
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1.0
+
+    weights = tf * idf[pairs[1]]
+    norms = np.sqrt(np.bincount(pairs[0], weights=weights ** 2, minlength=len(sentences)))
+
+    query_weights = np.zeros(len(vocabulary))
+    query_weights[query_terms] = idf[query_terms]
+    dot = np.bincount(pairs[0], weights=weights * query_weights[pairs[1]], minlength=len(sentences))
+    scores = dot / (norms * np.linalg.norm(query_weights) + 1e-12)
+
+    has_number = np.fromiter((bool(_HAS_NUMBER.search(s)) for s in sentences), dtype=bool, count=len(sentences))
+    return scores * np.where(has_number, 1.2, 1.0)
+
+
+def compress_sources(source_str: str, query: str, token_budget: int = 6000) -> str:
+    """Keep only the sentences most relevant to the query, up to a token budget.
+
+    Args:
+        source_str: Formatted source string from select_and_execute_search
+        query: Text the sentences are scored against (section name and description)
+        token_budget: Approximate number of tokens to keep, at 4 characters per token
+
+    Returns:
+        str: Compressed source string with sentences grouped by source, or the
+        original string if it already fits or cannot be parsed
+    """
+    char_budget = token_budget * 4
+    if len(source_str) <= char_budget:
+        return source_str
+
+    sources = parse_sources(source_str)
+    if not sources:
+        return source_str
+
+    sentences, owners, seen = [], [], set()
+    for source_index, (_, _, text) in enumerate(sources):
+        for sentence in split_sentences(text):
+            # Repeated boilerplate only needs to be considered once
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            sentences.append(sentence)
+            owners.append(source_index)
+    if not sentences:
+        return source_str
+
+    scores = score_sentences(sentences, query)
+
+    # Greedily take the best sentences until the budget is spent
+    kept, used = set(), 0
+    for index in np.argsort(-scores, kind="stable"):
+        length = len(sentences[index]) + 1
+        if used + length > char_budget:
+            continue
+        kept.add(int(index))
+        used += length
+
+    # Re-assemble in the original order, grouped under each source's attribution
+    excerpts_by_source = [[] for _ in sources]
+    for index in sorted(kept):
+        excerpts_by_source[owners[index]].append(sentences[index])
+
+    formatted_text = "Content from sources (most relevant excerpts):\n"
+    for (title, url, _), excerpts in zip(sources, excerpts_by_source):
+        if not excerpts:
+            continue
+        formatted_text += f"{'='*80}\n"
+        formatted_text += f"Source: {title}\n"
+        formatted_text += f"URL: {url}\n===\n"
+        formatted_text += " ".join(excerpts) + "\n"
+        formatted_text += f"{'='*80}\n\n"
+
+    print(f"---Source compression: {len(source_str)} -> {len(formatted_text)} characters---")
+    return formatted_text.strip()
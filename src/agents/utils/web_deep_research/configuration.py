@@ -1,4 +1,5 @@
 import os
+import time
 from enum import Enum
 from dataclasses import dataclass, fields, field, asdict
 from typing import Any, Optional, Dict, Literal
@@ -31,19 +32,51 @@ class Configuration:
     report_structure: str = DEFAULT_REPORT_STRUCTURE # Defaults to the default report structure
     search_api: SearchAPI = SearchAPI.TAVILY # Default to TAVILY
     search_api_config: Optional[Dict[str, Any]] = None
+    # Secondary search APIs for hedged requests, e.g. ["exa", "googlesearch"]; None disables hedging
+    search_api_fallbacks: Optional[list[str]] = None
+    hedge_latency_percentile: float = 0.9 # Primary latency percentile after which a hedged request is sent
     time_range: Optional[str] = None # Add time_range for date-filtered searches
     process_search_results: Literal["summarize", "split_and_rerank"] | None = None
+    near_duplicate_threshold: Optional[float] = 0.7 # Similarity above which syndicated copies are dropped (None disables)
+    # Progressive search: start writing once enough sources arrived; late results feed the reflection round
+    # (or a rewrite of the section if it passes without one)
+    progressive_search: bool = False
+    progressive_min_source_tokens: int = 8000 # Approximate source tokens that are enough to start writing
+    progressive_search_deadline: float = 20.0 # Seconds after which writing starts with whatever has arrived
+    # Local extractive compression of sources before section writing (no LLM involved)
+    compress_sources: bool = False
+    compression_token_budget: int = 6000 # Approximate tokens of source excerpts kept per section
     # Summarization model for summarizing search results
     # will be used if summarize_search_results is True
     summarization_model_provider: str = "openai"
-    summarization_model: str = "gpt-4o-mini"
+    summarization_model: str = "gpt-4o-mini" # Keep this a small, cheap model
+    summarization_chunk_chars: int = 12_000 # Pages longer than this are summarized chunk by chunk (map-reduce)
+    # Characters of each page considered for summarization; raise it to summarize long pages in full
+    # (they are then summarized chunk by chunk, at a higher token cost)
+    summarization_max_chars: int = 30_000
     # Whether to include search results string in the agent output state
     # This is used for evaluation purposes only
     include_source_str: bool = False
     
     # Graph-specific configuration
     number_of_queries: int = 2 # Number of search queries to generate per iteration
+    # "template" plans from the report structure alone, skipping the pre-planning query writing and web search
+    planning_mode: Literal["search", "template"] = "search"
+    plan_cache: bool = True # Reuse plans of earlier runs with the same topic and report structure
+    plan_cache_ttl_hours: float = 168 # Age after which a cached plan is regenerated
     max_search_depth: int = 2 # Maximum number of reflection + search iterations
+    # Adaptive reflection: sections that clear these cheap checks pass without an LLM grading call
+    reflection_heuristics: bool = True # Whether to apply the heuristic checks before grading
+    reflection_min_words: int = 120 # Minimum section length in words
+    reflection_min_citations: int = 2 # Minimum number of distinct cited sources
+    reflection_min_term_coverage: float = 0.6 # Fraction of section description terms the content must mention
+    reflection_llm_budget: Optional[int] = None # Maximum grading LLM calls per report (None = unlimited)
+    max_concurrent_sections: int = 3 # Maximum number of section subgraphs running at once
+    # End-to-end deadline of the request the run belongs to; stages cut their work as it gets close
+    deadline_at: Optional[float] = None # Wall-clock time (epoch seconds) to finish by; None for no limit
+    deadline_template_planning_seconds: float = 300 # Plan from the template (no search) when less time is left
+    deadline_single_query_seconds: float = 180 # Generate one search query per round when less time is left
+    deadline_skip_reflection_seconds: float = 120 # Finalize sections without grading when less time is left
     planner_provider: str = "openai"  # Defaults to Anthropic as provider
     planner_model: str = "gpt-4o-mini" # Defaults to claude-3-7-sonnet-latest
     planner_model_kwargs: Optional[Dict[str, Any]] = None # kwargs for planner_model
@@ -79,6 +112,17 @@ class Configuration:
         }
         return cls(**values)
 
+    def time_left(self) -> Optional[float]:
+        """Seconds left before the deadline, or None when the run has none."""
+        if self.deadline_at is None:
+            return None
+        return float(self.deadline_at) - time.time()
+
+    def deadline_within(self, seconds: float) -> bool:
+        """Whether the deadline is less than ``seconds`` away."""
+        time_left = self.time_left()
+        return time_left is not None and time_left < float(seconds)
+
     def copy(self):
         """Return a deep copy of this configuration."""
         return copy.deepcopy(self)
@@ -0,0 +1,106 @@
+"""
+Content-level near-duplicate detection for search results.
+
+Iranian real-estate news is heavily syndicated, so the same article often comes
+back from several mirror sites under different URLs. Results are shingled into
+word 5-grams, summarized with MinHash signatures and bucketed with an LSH index;
+candidate pairs whose estimated Jaccard similarity clears the threshold are
+treated as copies, and only the highest-scoring copy is kept.
+"""
+
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 16 bands of 4 rows: pairs above ~0.5 Jaccard become candidates
+SHINGLE_SIZE = 5
+MAX_CHARS_PER_DOCUMENT = 20_000
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240321)
+_PERM_A = _rng.integers(1, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+# Arabic code points commonly mixed into Persian text, diacritics and zero-width joiners
+_CHAR_MAP = str.maketrans({"\u064a": "\u06cc", "\u0649": "\u06cc", "\u0643": "\u06a9", "\u0629": "\u0647", "\u200c": " ", "\u200d": ""})
+_DIACRITICS = re.compile(r"[\u064b-\u065f\u0670]")
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> List[str]:
+    """Lowercase, unify Persian/Arabic letter variants and split into words."""
+    text = _DIACRITICS.sub("", text[:MAX_CHARS_PER_DOCUMENT].translate(_CHAR_MAP).lower())
+    return _WORD.findall(text)
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of the word shingles of a text, or None if it is too short to compare."""
+    words = normalize_text(text)
+    if len(words) < SHINGLE_SIZE * 2:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) & _PRIME for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p for every permutation and shingle, then the minimum per permutation
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME
+    return permuted.min(axis=1)
+
+
+def remove_near_duplicates(results: List[dict], threshold: float = 0.7) -> List[dict]:
+    """Drop search results whose content is a near-copy of another result.
+
+    Args:
+        results: Search results in the shared dict shape (title, url, content, score, raw_content)
+        threshold: Estimated Jaccard similarity above which two results are copies
+
+    Returns:
+        List[dict]: The results with only the highest-scoring copy of each
+        near-duplicate group, in their original order
+    """
+    if len(results) < 2:
+        return results
+
+    signatures = [minhash_signature(r.get("raw_content") or r.get("content") or "") for r in results]
+
+    # LSH: results sharing any band bucket become candidate pairs
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    buckets: Dict[tuple, List[int]] = {}
+    for index, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        for band in range(LSH_BANDS):
+            key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+            buckets.setdefault(key, []).append(index)
+
+    parent = list(range(len(results)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for members in buckets.values():
+        for i_pos, i in enumerate(members):
+            for j in members[i_pos + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if float(np.mean(signatures[i] == signatures[j])) >= threshold:
+                    parent[find(j)] = find(i)
+
+    # Keep the highest-scoring member of each group (earliest on ties)
+    best: Dict[int, int] = {}
+    for index, result in enumerate(results):
+        root = find(index)
+        if root not in best or (result.get("score") or 0.0) > (results[best[root]].get("score") or 0.0):
+            best[root] = index
+
+    kept = set(best.values())
+    removed = len(results) - len(kept)
+    if removed:
+        print(f"---Near-duplicate filter: dropped {removed} of {len(results)} sources---")
+    return [result for index, result in enumerate(results) if index in kept]
@@ -0,0 +1,88 @@
+"""
+Cache of report plans for recurring research topics.
+
+Planning a report takes three serial round trips (query generation, a web
+search and the planner call) before any section work can start. Requests like
+"investment strategy for an investor in Tehran" recur with the same report
+structure, so their plans are stored in a local SQLite file keyed by the
+canonicalized topic and report structure and reused until they expire.
+"""
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import List, Optional
+
+from src.agents.utils.web_deep_research.state import Section, Sections
+from src.agents.utils.web_deep_research.dedup import normalize_text
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../'))
+
+PLAN_CACHE_DB_PATH = os.getenv(
+    "WEB_PLAN_CACHE_DB",
+    os.path.join(project_root, "data", "processed", "web_plans.sqlite")
+)
+
+
+def make_plan_key(topic: str, report_structure: str, planning_mode: str) -> str:
+    """Cache key of a plan: case, whitespace and Persian/Arabic letter variants do not matter."""
+    canonical_topic = " ".join(normalize_text(topic))
+    canonical_structure = " ".join(normalize_text(report_structure))
+    key = f"{planning_mode}|{canonical_topic}|{canonical_structure}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """Persistent store of report plans keyed by canonical topic and report structure."""
+
+    def __init__(self, db_path: str = PLAN_CACHE_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS plans (
+                    plan_key TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    sections TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+
+    def get(self, plan_key: str, ttl_hours: float) -> Optional[List[Section]]:
+        """Return the cached plan if it is younger than ``ttl_hours``."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sections, created_at FROM plans WHERE plan_key = ?", (plan_key,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > ttl_hours * 3600:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return Sections.model_validate_json(row[0]).sections
+
+    def set(self, plan_key: str, topic: str, sections: List[Section]):
+        # Plans are stored without any section content written later in the run
+        blank_sections = [section.model_copy(update={"content": ""}) for section in sections]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans (plan_key, topic, sections, created_at) VALUES (?, ?, ?, ?)",
+                (plan_key, topic, Sections(sections=blank_sections).model_dump_json(), time.time())
+            )
+
+
+_plan_cache: Optional[PlanCache] = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache:
+    """Return the process-wide plan cache, creating it on first use."""
+    global _plan_cache
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            _plan_cache = PlanCache()
+        return _plan_cache
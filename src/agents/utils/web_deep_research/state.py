@@ -1,4 +1,4 @@
-from typing import Annotated, List, TypedDict, Literal
+from typing import Annotated, List, Optional, TypedDict, Literal
 from pydantic import BaseModel, Field
 import operator
 
@@ -43,6 +43,7 @@ class ReportStateInput(TypedDict):
     
 class ReportStateOutput(TypedDict):
     final_report: str # Final report
+    degraded: list[str] # Work cut short to meet the deadline
     # for evaluation purposes only
     # this is included only if configurable.include_source_str is True
     source_str: str # String of formatted source content from web search
@@ -52,24 +53,30 @@ class ReportState(TypedDict):
     report_date: str
     sections: list[Section] # List of report sections 
     completed_sections: Annotated[list, operator.add] # Send() API key
-    report_sections_from_research: str # String of any completed sections from research to write final sections
+    report_sections_from_research: str # Blob id of the completed sections from research, to write final sections
     final_report: str # Final report
+    degraded: Annotated[list[str], operator.add] # Work cut short to meet the deadline
     # for evaluation purposes only
-    # this is included only if configurable.include_source_str is True
-    source_str: Annotated[str, operator.add] # String of formatted source content from web search
+    # these are included only if configurable.include_source_str is True
+    source_refs: Annotated[list[str], operator.add] # Blob ids of every section's formatted sources
+    source_str: str # String of formatted source content from web search
 
 class SectionState(TypedDict):
     topic: str # Report topic
     section: Section # Report section  
     search_iterations: int # Number of search iterations done
     search_queries: list[SearchQuery] # List of search queries
-    source_str: str # String of formatted source content from web search
+    source_str: str # Blob id of the formatted source content from web search
+    pending_search_id: Optional[str] # Id of searches still running from the last progressive search round
     feedback: Feedback # Feedback on the section
-    report_sections_from_research: str # String of any completed sections from research to write final sections
+    reflection_budget: Optional[int] # Grading LLM calls left for this section (None = unlimited)
+    degraded: list[str] # Work on this section cut short to meet the deadline
+    report_sections_from_research: str # Blob id of the completed sections from research, to write final sections
     completed_sections: list[Section] # Final key we duplicate in outer state for Send() API
 
 class SectionOutputState(TypedDict):
     completed_sections: list[Section] # Final key we duplicate in outer state for Send() API
+    degraded: list[str] # Work on this section cut short to meet the deadline
     # for evaluation purposes only
     # this is included only if configurable.include_source_str is True
-    source_str: str # String of formatted source content from web search
+    source_refs: list[str] # Blob ids of the section's formatted sources
@@ -0,0 +1,168 @@
+"""
+Cached, concurrency-limited webpage summarization for the "summarize" search results mode.
+
+Summaries are stored in a local SQLite file keyed by (URL, content hash, model),
+so a page that shows up again in a later report is not summarized twice. Long
+pages are split into chunks that are summarized in parallel and then combined
+(map-reduce).
+"""
+
+import os
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.configs.llm_config import get_llm, LLM_PROVIDERS
+from src.agents.utils.concurrency import ConcurrencyBudget, llm_slot, await_shared
+from src.agents.utils.rate_limiter import get_provider_limiter, estimate_tokens
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../'))
+
+SUMMARY_CACHE_DB_PATH = os.getenv(
+    "WEB_SUMMARY_CACHE_DB",
+    os.path.join(project_root, "data", "processed", "web_summaries.sqlite")
+)
+
+# Pages are summarized a few at a time so one report cannot monopolize the LLM budget
+SUMMARIZATION_BUDGET = ConcurrencyBudget("summarization", int(os.getenv("SUMMARIZATION_MAX_CONCURRENCY", "4")))
+
+SUMMARIZE_SYSTEM_PROMPT = "You are an expert at summarizing web content. Provide a concise summary of the given text, focusing on the key points and main ideas. Do not include personal opinions or interpretations. Just summarize the facts from the content."
+COMBINE_SYSTEM_PROMPT = "You are an expert at summarizing web content. The following are summaries of consecutive parts of one webpage. Combine them into a single concise summary of the whole page, keeping the key facts, figures and dates. Do not add information that is not in the summaries."
+
+
+async def summarize_webpage(model: BaseChatModel, content: str, system_prompt: str = SUMMARIZE_SYSTEM_PROMPT) -> str:
+    """Summarize the content of a webpage."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("user", "{content}")
+    ])
+    chain = prompt | model | StrOutputParser()
+    return await chain.ainvoke({"content": content})
+
+
+class SummaryCache:
+    """Persistent store of page summaries keyed by (URL, content hash, model)."""
+
+    def __init__(self, db_path: str = SUMMARY_CACHE_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS summaries (
+                    url TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (url, content_hash, model)
+                )"""
+            )
+
+    def get(self, url: str, content_hash: str, model: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE url = ? AND content_hash = ? AND model = ?",
+                (url, content_hash, model)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, url: str, content_hash: str, model: str, summary: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (url, content_hash, model, summary) VALUES (?, ?, ?, ?)",
+                (url, content_hash, model, summary)
+            )
+
+
+class WebpageSummarizer:
+    """Summarizes webpages with caching, bounded concurrency and map-reduce for long pages."""
+
+    def __init__(self, provider: str, model: str, cache: SummaryCache, chunk_chars: int = 12_000):
+        self.model_id = f"{provider}:{model}"
+        self.cache = cache
+        self.chunk_chars = chunk_chars
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+        if provider in LLM_PROVIDERS and model in LLM_PROVIDERS[provider]["models"]:
+            # Project models already go through the shared rate limiter and LLM budget
+            self.model = get_llm(provider=provider, model=model, temperature=0)
+            self._rate_limited = True
+        else:
+            extra_kwargs = {"betas": ["extended-cache-ttl-2025-04-11"]} if provider == "anthropic" else {}
+            self.model = init_chat_model(model=model, model_provider=provider, **extra_kwargs)
+            self._rate_limited = False
+
+    async def _call_model(self, content: str, system_prompt: str = SUMMARIZE_SYSTEM_PROMPT) -> str:
+        async with SUMMARIZATION_BUDGET.slot():
+            if self._rate_limited:
+                return await summarize_webpage(self.model, content, system_prompt)
+            limiter = get_provider_limiter("summarization")
+            return await limiter.acall(
+                lambda: summarize_webpage(self.model, content, system_prompt),
+                tokens=estimate_tokens(content),
+                slot=llm_slot
+            )
+
+    async def _summarize_uncached(self, content: str) -> str:
+        if len(content) <= self.chunk_chars:
+            return await self._call_model(content)
+
+        # Map: summarize the chunks in parallel, then reduce into one summary
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_chars,
+            chunk_overlap=200,
+            separators=["\n\n", "\n", ". ", "؟ ", "! ", "؛ ", "، ", " ", ""]
+        )
+        chunks = splitter.split_text(content)
+        chunk_summaries = await asyncio.gather(*[self._call_model(chunk) for chunk in chunks])
+        combined = "\n\n".join(f"Part {i}:\n{summary}" for i, summary in enumerate(chunk_summaries, 1))
+        return await self._call_model(combined, COMBINE_SYSTEM_PROMPT)
+
+    async def summarize(self, url: str, content: str) -> str:
+        """Return the summary of a page, from the cache when this exact content was seen before."""
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        cached = await asyncio.to_thread(self.cache.get, url, content_hash, self.model_id)
+        if cached is not None:
+            return cached
+
+        # Concurrent requests for the same page share one summarization
+        key = (url, content_hash)
+        if key in self._in_flight:
+            return await await_shared(self._in_flight[key])
+
+        future = asyncio.ensure_future(self._summarize_uncached(content))
+        self._in_flight[key] = future
+        try:
+            summary = await await_shared(future)
+        finally:
+            self._in_flight.pop(key, None)
+        await asyncio.to_thread(self.cache.set, url, content_hash, self.model_id, summary)
+        return summary
+
+
+_summary_cache: Optional[SummaryCache] = None
+_summarizers: Dict[Tuple[str, str, int], WebpageSummarizer] = {}
+_summarizers_lock = threading.Lock()
+
+
+def get_webpage_summarizer(provider: str, model: str, chunk_chars: int = 12_000) -> WebpageSummarizer:
+    """Return the process-wide summarizer for a model, creating it (and the cache) on first use."""
+    global _summary_cache
+    with _summarizers_lock:
+        if _summary_cache is None:
+            _summary_cache = SummaryCache()
+        key = (provider, model, chunk_chars)
+        summarizer = _summarizers.get(key)
+        if summarizer is None:
+            summarizer = WebpageSummarizer(provider, model, _summary_cache, chunk_chars)
+            _summarizers[key] = summarizer
+        return summarizer
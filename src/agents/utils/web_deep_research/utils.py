@@ -9,10 +9,14 @@ import hashlib
 import aiohttp
 import httpx
 import time
+import re
+import uuid
 from typing import List, Optional, Dict, Any, Union, Literal, Annotated, cast
 from urllib.parse import unquote
-from collections import defaultdict
-import itertools
+from collections import defaultdict, deque, OrderedDict
+from functools import lru_cache
+
+import numpy as np
 
 from exa_py import Exa
 from tavily import AsyncTavilyClient
@@ -20,21 +24,24 @@ from bs4 import BeautifulSoup
 from markdownify import markdownify
 from pydantic import BaseModel
 from langchain.chat_models import init_chat_model
-from langchain.embeddings import init_embeddings
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_anthropic import ChatAnthropic
 from langchain_core.language_models import BaseChatModel
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import InjectedToolArg
-from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_core.tools import tool
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langsmith import traceable
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 
+from src.agents.utils.concurrency import search_slot, await_shared
+from src.agents.utils.rate_limiter import get_provider_limiter, estimate_tokens
+from src.configs.embeddings_config import get_default_embeddings
 from src.agents.utils.web_deep_research.configuration import Configuration
+from src.agents.utils.web_deep_research.summarization import get_webpage_summarizer, summarize_webpage
+from src.agents.utils.web_deep_research.dedup import remove_near_duplicates
 from src.agents.utils.web_deep_research.state import Section
 
 
@@ -82,7 +89,8 @@ def deduplicate_and_format_sources(
     search_response,
     max_tokens_per_source=5000,
     include_raw_content=True,
-    deduplication_strategy: Literal["keep_first", "keep_last"] = "keep_first"
+    deduplication_strategy: Literal["keep_first", "keep_last"] = "keep_first",
+    near_duplicate_threshold: Optional[float] = 0.7
 ):
     """
     Takes a list of search responses and formats them into a readable string.
@@ -100,6 +108,8 @@ def deduplicate_and_format_sources(
         max_tokens_per_source: int
         include_raw_content: bool
         deduplication_strategy: Whether to keep the first or last search result for each unique URL
+        near_duplicate_threshold: Content similarity above which sources from different URLs
+            are treated as copies and only the highest-scoring one is kept (None disables)
     Returns:
         str: Formatted string with deduplicated sources
     """
@@ -119,9 +129,14 @@ def deduplicate_and_format_sources(
     else:
         raise ValueError(f"Invalid deduplication strategy: {deduplication_strategy}")
 
+    # Deduplicate syndicated copies of the same content
+    sources = list(unique_sources.values())
+    if near_duplicate_threshold is not None:
+        sources = remove_near_duplicates(sources, near_duplicate_threshold)
+
     # Format output
     formatted_text = "Content from sources:\n"
-    for i, source in enumerate(unique_sources.values(), 1):
+    for i, source in enumerate(sources, 1):
         formatted_text += f"{'='*80}\n"  # Clear section separator
         formatted_text += f"Source: {source['title']}\n"
         formatted_text += f"{'-'*80}\n"  # Subsection separator
@@ -161,14 +176,87 @@ Content:
 """
     return formatted_str
 
-async def summarize_webpage(model: BaseChatModel, content: str) -> str:
-    """Summarize the content of a webpage."""
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are an expert at summarizing web content. Provide a concise summary of the given text, focusing on the key points and main ideas. Do not include personal opinions or interpretations. Just summarize the facts from the content."),
-        ("user", "{content}")
-    ])
-    chain = prompt | model | StrOutputParser()
-    return await chain.ainvoke({"content": content})
+_HEURISTIC_STOPWORDS = {
+    "about", "across", "also", "among", "analysis", "and", "based", "between", "brief", "concepts",
+    "cover", "covered", "covering", "describe", "discuss", "each", "focus", "from", "have", "including",
+    "into", "main", "more", "overview", "provide", "section", "should", "such", "that", "their",
+    "these", "this", "those", "topic", "topics", "what", "which", "with", "will", "within",
+}
+
+def section_passes_heuristics(
+    section: Section,
+    min_words: int = 120,
+    min_citations: int = 2,
+    min_term_coverage: float = 0.6
+) -> bool:
+    """
+    Cheap checks that decide whether a written section is obviously complete.
+
+    A section passes when it is long enough, cites enough distinct sources and
+    mentions enough of the terms from its description. Sections that fail are
+    left to the LLM grader.
+
+    Args:
+        section: The written section
+        min_words: Minimum number of words in the section body (sources list excluded)
+        min_citations: Minimum number of distinct citation numbers or source URLs
+        min_term_coverage: Fraction of description terms that must appear in the content
+
+    Returns:
+        bool: True if the section clears every check
+    """
+    content = section.content or ""
+    body = re.split(r"^#{2,3}\s*Sources\s*$", content, maxsplit=1, flags=re.MULTILINE | re.IGNORECASE)[0]
+
+    if len(body.split()) < min_words:
+        return False
+
+    citations = set(re.findall(r"\[(\d+)\]", content)) | set(re.findall(r"https?://[^\s)\]]+", content))
+    if len(citations) < min_citations:
+        return False
+
+    terms = {
+        term for term in re.findall(r"\w+", section.description.lower())
+        if len(term) > 3 and term not in _HEURISTIC_STOPWORDS and not term.isdigit()
+    }
+    if terms:
+        body_lower = body.lower()
+        coverage = sum(1 for term in terms if term in body_lower) / len(terms)
+        if coverage < min_term_coverage:
+            return False
+
+    return True
+
+# Raw search responses shared by every report running in this process, so that
+# concurrent research jobs (e.g. the regions of a comparison) asking the same
+# query within a few minutes only pay for it once
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+SEARCH_CACHE_MAX_ENTRIES = 512
+_search_response_cache: "OrderedDict[tuple, tuple[float, dict]]" = OrderedDict()
+_search_in_flight: Dict[tuple, asyncio.Future] = {}
+
+async def cached_search_call(key: tuple, fn) -> dict:
+    """Return a cached search response for ``key``, or await ``fn()`` once for all concurrent callers."""
+    cached = _search_response_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < SEARCH_CACHE_TTL:
+        _search_response_cache.move_to_end(key)
+        return cached[1]
+
+    if key in _search_in_flight:
+        return await await_shared(_search_in_flight[key])
+
+    future = asyncio.ensure_future(fn())
+    _search_in_flight[key] = future
+    try:
+        response = await await_shared(future)
+    finally:
+        _search_in_flight.pop(key, None)
+
+    _search_response_cache[key] = (time.monotonic(), response)
+    _search_response_cache.move_to_end(key)
+    while len(_search_response_cache) > SEARCH_CACHE_MAX_ENTRIES:
+        _search_response_cache.popitem(last=False)
+    return response
 
 @traceable
 async def tavily_search_async(search_queries, max_results: int = 5, topic: Literal["general", "news", "finance"] = "general", time_range: Optional[str] = None, include_raw_content: bool = True):
@@ -202,17 +290,25 @@ async def tavily_search_async(search_queries, max_results: int = 5, topic: Liter
                 }
     """
     tavily_async_client = AsyncTavilyClient()
-    search_tasks = []
-    for query in search_queries:
-            search_tasks.append(
-                tavily_async_client.search(
+    limiter = get_provider_limiter("tavily")
+
+    async def search_single_query(query):
+        # Rate limited, retried and sharing the process-wide search budget with every other running report
+        return await cached_search_call(
+            ("tavily", query, max_results, include_raw_content, topic, time_range),
+            lambda: limiter.acall(
+                lambda: tavily_async_client.search(
                     query,
                     max_results=max_results,
                     include_raw_content=include_raw_content,
                     topic=topic,
                     time_range=time_range
-                )
+                ),
+                slot=search_slot
             )
+        )
+
+    search_tasks = [search_single_query(query) for query in search_queries]
 
     # Execute all searches concurrently
     search_docs = await asyncio.gather(*search_tasks)
@@ -261,6 +357,7 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
     
     # Initialize Exa client (API key should be configured in your .env file)
     exa = Exa(api_key = f"{os.getenv('EXA_API_KEY')}")
+    limiter = get_provider_limiter("exa")
     
     # Define the function to process a single query
     async def process_query(query):
@@ -288,7 +385,7 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
                 
             return exa.search_and_contents(query, **kwargs)
         
-        response = await loop.run_in_executor(None, exa_search_fn)
+        response = await limiter.acall(lambda: loop.run_in_executor(None, exa_search_fn), slot=search_slot)
         
         # Format the response to match the expected output structure
         formatted_results = []
@@ -391,14 +488,10 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
             "results": formatted_results
         }
     
-    # Process all queries sequentially with delay to respect rate limit
+    # Process all queries sequentially; pacing and 429 retries are handled by the exa limiter (EXA_RPM)
     search_docs = []
-    for i, query in enumerate(search_queries):
+    for query in search_queries:
         try:
-            # Add delay between requests (0.25s = 4 requests per second, well within the 5/s limit)
-            if i > 0:  # Don't delay the first request
-                await asyncio.sleep(0.25)
-            
             result = await process_query(query)
             search_docs.append(result)
         except Exception as e:
@@ -413,11 +506,6 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
                 "results": [],
                 "error": str(e)
             })
-            
-            # Add additional delay if we hit a rate limit error
-            if "429" in str(e):
-                print("Rate limit exceeded. Adding additional delay...")
-                await asyncio.sleep(1.0)  # Add a longer delay if we hit a rate limit
     
     return search_docs
 
@@ -460,9 +548,10 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
     
     # Use a semaphore to limit concurrent requests
     semaphore = asyncio.Semaphore(5 if use_api else 2)
+    limiter = get_provider_limiter("googlesearch")
     
     async def search_single_query(query):
-        async with semaphore:
+        async with semaphore, search_slot():
             results = []
             
             # API-based search
@@ -482,28 +571,29 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                     }
                     print(f"Requesting {num} results for '{query}' from Google API...")
 
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
-                            if response.status != 200:
-                                error_text = await response.text()
-                                print(f"API error: {response.status}, {error_text}")
-                                break
-                                
-                            data = await response.json()
-                            
-                            # Process search results
-                            for item in data.get('items', []):
-                                result = {
-                                    "title": item.get('title', ''),
-                                    "url": item.get('link', ''),
-                                    "content": item.get('snippet', ''),
-                                    "score": None,
-                                    "raw_content": item.get('snippet', '')
-                                }
-                                results.append(result)
-                    
-                    # Respect API quota with a small delay
-                    await asyncio.sleep(0.2)
+                    async def fetch_page():
+                        async with aiohttp.ClientSession() as session:
+                            async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
+                                response.raise_for_status()
+                                return await response.json()
+
+                    # API quota is respected by the googlesearch limiter (GOOGLESEARCH_RPM)
+                    try:
+                        data = await limiter.acall(fetch_page)
+                    except Exception as e:
+                        print(f"API error: {str(e)}")
+                        break
+
+                    # Process search results
+                    for item in data.get('items', []):
+                        result = {
+                            "title": item.get('title', ''),
+                            "url": item.get('link', ''),
+                            "content": item.get('snippet', ''),
+                            "score": None,
+                            "raw_content": item.get('snippet', '')
+                        }
+                        results.append(result)
                     
                     # If we didn't get a full page of results, no need to request more
                     if not data.get('items') or len(data.get('items', [])) < num:
@@ -781,12 +871,16 @@ def perplexity_search(search_queries):
             ]
         }
         
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()  # Raise exception for bad status codes
+        def post_query():
+            response = requests.post(
+                "https://api.perplexity.ai/chat/completions",
+                headers=headers,
+                json=payload
+            )
+            response.raise_for_status()  # Raise exception for bad status codes
+            return response
+
+        response = get_provider_limiter("perplexity").call(post_query)
         
         # Parse the response
         data = response.json()
@@ -872,22 +966,25 @@ async def tavily_search(
         return None
 
     configurable = Configuration.from_runnable_config(config)
+
+    # Deduplicate syndicated copies of the same content
+    if configurable.near_duplicate_threshold is not None:
+        unique_results = {
+            result['url']: result
+            for result in remove_near_duplicates(list(unique_results.values()), configurable.near_duplicate_threshold)
+        }
     max_char_to_include = 30_000
     # TODO: share this behavior across all search implementations / tools
     if configurable.process_search_results == "summarize":
-        if configurable.summarization_model_provider == "anthropic":
-            extra_kwargs = {"betas": ["extended-cache-ttl-2025-04-11"]}
-        else:
-            extra_kwargs = {}
-
-        summarization_model = init_chat_model(
-            model=configurable.summarization_model,
-            model_provider=configurable.summarization_model_provider,
-            **extra_kwargs
+        # Cached by (URL, content hash, model), concurrency-limited, map-reduce for long pages
+        summarizer = get_webpage_summarizer(
+            configurable.summarization_model_provider,
+            configurable.summarization_model,
+            chunk_chars=configurable.summarization_chunk_chars
         )
         summarization_tasks = [
-            noop() if not result.get("raw_content") else summarize_webpage(summarization_model, result['raw_content'][:max_char_to_include])
-            for result in unique_results.values()
+            noop() if not result.get("raw_content") else summarizer.summarize(url, result['raw_content'][:configurable.summarization_max_chars])
+            for url, result in unique_results.items()
         ]
         summaries = await asyncio.gather(*summarization_tasks)
         unique_results = {
@@ -895,12 +992,11 @@ async def tavily_search(
             for url, result, summary in zip(unique_results.keys(), unique_results.values(), summaries)
         }
     elif configurable.process_search_results == "split_and_rerank":
-        embeddings = init_embeddings("openai:text-embedding-3-small")
-        results_by_query = itertools.groupby(unique_results.values(), key=lambda x: x['query'])
-        all_retrieved_docs = []
-        for query, query_results in results_by_query:
-            retrieved_docs = split_and_rerank_search_results(embeddings, query, query_results)
-            all_retrieved_docs.extend(retrieved_docs)
+        all_retrieved_docs = await split_and_rerank_search_results(
+            get_rerank_embeddings(),
+            list(queries),
+            list(unique_results.values())
+        )
 
         stitched_docs = stitch_documents_by_url(all_retrieved_docs)
         unique_results = {
@@ -923,7 +1019,16 @@ async def tavily_search(
         return "No valid search results found. Please try different search queries or use a different search API."
 
 
-async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict, time_range: Optional[str] = None) -> str:
+async def select_and_execute_search(
+    search_api: str,
+    query_list: list[str],
+    params_to_pass: dict,
+    time_range: Optional[str] = None,
+    fallback_apis: Optional[List[str]] = None,
+    search_api_config: Optional[Dict[str, Any]] = None,
+    hedge_percentile: float = 0.9,
+    near_duplicate_threshold: Optional[float] = 0.7
+) -> str:
     """Select and execute the appropriate search API.
     
     Args:
@@ -931,6 +1036,11 @@ async def select_and_execute_search(search_api: str, query_list: list[str], para
         query_list: List of search queries to execute
         params_to_pass: Parameters to pass to the search API
         time_range: Time range for the search
+        fallback_apis: Secondary search APIs. When set, the search is hedged:
+            a secondary provider is queried if the primary is slow or fails
+        search_api_config: Full search API config, filtered per provider when hedging
+        hedge_percentile: Latency percentile of the primary after which to hedge
+        near_duplicate_threshold: Content similarity above which sources are treated as copies (None disables)
         
     Returns:
         Formatted string containing search results
@@ -938,6 +1048,16 @@ async def select_and_execute_search(search_api: str, query_list: list[str], para
     Raises:
         ValueError: If an unsupported search API is specified
     """
+    if fallback_apis:
+        search_results = await hedged_search(
+            [search_api, *[api for api in fallback_apis if api != search_api]],
+            query_list,
+            search_api_config=search_api_config,
+            time_range=time_range,
+            hedge_percentile=hedge_percentile
+        )
+        return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000, deduplication_strategy="keep_first", near_duplicate_threshold=near_duplicate_threshold)
+
     if time_range:
         params_to_pass["time_range"] = time_range
 
@@ -954,7 +1074,308 @@ async def select_and_execute_search(search_api: str, query_list: list[str], para
     else:
         raise ValueError(f"Unsupported search API: {search_api}")
 
-    return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000, deduplication_strategy="keep_first")
+    return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000, deduplication_strategy="keep_first", near_duplicate_threshold=near_duplicate_threshold)
+
+
+# Recent end-to-end latencies per search provider, used to pick the hedge delay
+_search_latencies: defaultdict[str, deque] = defaultdict(lambda: deque(maxlen=100))
+HEDGE_DEFAULT_DELAY = float(os.getenv("SEARCH_HEDGE_DEFAULT_DELAY", "5.0"))
+HEDGE_MIN_SAMPLES = 5
+# How long the winner of a hedged search waits for the other providers still running, to fuse them in
+HEDGE_FUSION_GRACE = float(os.getenv("SEARCH_HEDGE_FUSION_GRACE", "0.25"))
+
+def get_hedge_delay(search_api: str, percentile: float = 0.9) -> float:
+    """Seconds to wait for a provider before hedging, from its recent latency percentile."""
+    samples = sorted(_search_latencies[search_api])
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    index = min(int(percentile * len(samples)), len(samples) - 1)
+    return min(max(samples[index], 0.5), 30.0)
+
+def normalize_search_response(response: dict, query: str) -> dict:
+    """Normalize a provider response to the shared query/results dict shape."""
+    results = []
+    for result in response.get('results') or []:
+        if not result.get('url'):
+            continue
+        results.append({
+            "title": result.get('title') or result['url'],
+            "url": result['url'],
+            "content": result.get('content') or "",
+            "score": float(result.get('score') or 0.0),
+            "raw_content": result.get('raw_content')
+        })
+    return {
+        "query": response.get('query', query),
+        "follow_up_questions": None,
+        "answer": None,
+        "images": response.get('images') or [],
+        "results": results
+    }
+
+def fuse_search_responses(provider_responses: List[List[dict]]) -> List[dict]:
+    """Fuse per-query responses from several providers, merging results by URL.
+
+    For each URL the highest-scoring copy is kept, and missing raw content is
+    filled in from the other copies.
+    """
+    fused: Dict[str, Dict[str, dict]] = {}
+    for responses in provider_responses:
+        for response in responses:
+            query_results = fused.setdefault(response['query'], {})
+            for result in response['results']:
+                existing = query_results.get(result['url'])
+                if existing is None:
+                    query_results[result['url']] = dict(result)
+                    continue
+                if result['score'] > existing['score']:
+                    result = {**result, "raw_content": result['raw_content'] or existing['raw_content']}
+                    query_results[result['url']] = result
+                elif not existing['raw_content']:
+                    existing['raw_content'] = result['raw_content']
+
+    return [
+        {"query": query, "follow_up_questions": None, "answer": None, "images": [], "results": list(results.values())}
+        for query, results in fused.items()
+    ]
+
+async def execute_provider_search(
+    search_api: str,
+    query_list: list[str],
+    search_api_config: Optional[Dict[str, Any]] = None,
+    time_range: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None
+) -> List[dict]:
+    """Run one provider and return its normalized raw responses, recording its latency.
+
+    ``params`` are the provider's search parameters; by default they are
+    filtered from ``search_api_config``. A ``time_range`` argument overrides
+    the configured one.
+
+    A call cancelled because it lost a hedge race is recorded too, with the time
+    it had taken so far as a lower bound; otherwise only the fast calls would be
+    sampled and the hedge delay would keep shrinking.
+
+    Raises:
+        RuntimeError: If the provider returned no results for any query
+    """
+    params = dict(get_search_params(search_api, search_api_config) if params is None else params)
+    configured_time_range = params.pop("time_range", None)
+    time_range = time_range or configured_time_range
+    start = time.monotonic()
+    try:
+        if search_api == "tavily":
+            search_results = await tavily_search_async(query_list, time_range=time_range, **params)
+        elif search_api == "perplexity":
+            search_results = await asyncio.to_thread(perplexity_search, query_list)
+        elif search_api == "exa":
+            search_results = await exa_search(query_list, **params)
+        elif search_api == "googlesearch":
+            search_results = await google_search_async(query_list, **params)
+        else:
+            raise ValueError(f"Unsupported search API: {search_api}")
+    except asyncio.CancelledError:
+        _search_latencies[search_api].append(time.monotonic() - start)
+        raise
+    _search_latencies[search_api].append(time.monotonic() - start)
+
+    responses = [normalize_search_response(response, query) for response, query in zip(search_results, query_list)]
+    if not any(response['results'] for response in responses):
+        raise RuntimeError(f"{search_api} returned no results")
+    return responses
+
+async def hedged_search(
+    search_apis: List[str],
+    query_list: list[str],
+    search_api_config: Optional[Dict[str, Any]] = None,
+    time_range: Optional[str] = None,
+    hedge_percentile: float = 0.9
+) -> List[dict]:
+    """Search with the first provider, hedging to the next ones when it is slow or fails.
+
+    The primary request starts immediately. If it has not answered within its
+    recent latency percentile, or fails, the next provider is started as well.
+    The first provider to answer wins; responses from the providers that finish
+    within HEDGE_FUSION_GRACE seconds after it are fused in by URL, and the rest
+    are cancelled.
+
+    Args:
+        search_apis: Providers in order of preference
+        query_list: List of search queries to execute
+        search_api_config: Full search API config, filtered per provider
+        time_range: Time range for providers that support it
+        hedge_percentile: Latency percentile of the running provider after which to hedge
+
+    Returns:
+        List of fused per-query responses in the shared result dict shape
+    """
+    pending: Dict[asyncio.Task, str] = {}
+    remaining = list(search_apis)
+    errors = []
+
+    def start_next():
+        search_api = remaining.pop(0)
+        task = asyncio.create_task(execute_provider_search(search_api, query_list, search_api_config, time_range))
+        pending[task] = search_api
+        return search_api
+
+    try:
+        current = start_next()
+        while pending:
+            timeout = get_hedge_delay(current, hedge_percentile) if remaining else None
+            done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # The running provider is slower than usual: hedge with the next one
+                current = start_next()
+                print(f"---Hedged Search: no answer within {timeout:.1f}s, also querying {current}---")
+                continue
+
+            winners = []
+            for task in done:
+                search_api = pending.pop(task)
+                if task.exception() is None:
+                    winners.append(task.result())
+                else:
+                    errors.append(f"{search_api}: {task.exception()}")
+                    print(f"---Hedged Search: {search_api} failed ({task.exception()})---")
+
+            if winners:
+                # Providers finishing just after the winner are still worth fusing in
+                if pending:
+                    late, _ = await asyncio.wait(pending.keys(), timeout=HEDGE_FUSION_GRACE)
+                    for task in late:
+                        search_api = pending.pop(task)
+                        if task.exception() is None:
+                            winners.append(task.result())
+                        else:
+                            errors.append(f"{search_api}: {task.exception()}")
+                return fuse_search_responses(winners)
+
+            # Every finished provider failed: fail over immediately
+            if remaining:
+                current = start_next()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    raise RuntimeError(f"All search providers failed: {'; '.join(errors)}")
+
+
+# Searches still running after their section started writing, keyed by pending id.
+# Their results are picked up by the section's next (reflection) search round.
+_pending_searches: Dict[str, set[asyncio.Task]] = {}
+
+def count_source_tokens(responses: List[dict], max_tokens_per_source: int = 4000) -> int:
+    """Approximate tokens of distinct source content in search responses, as the writer would see it."""
+    seen, total = set(), 0
+    for response in responses:
+        for result in response['results']:
+            if result['url'] in seen:
+                continue
+            seen.add(result['url'])
+            total += min(estimate_tokens(result.get('raw_content') or result.get('content') or ""), max_tokens_per_source)
+    return total
+
+async def progressive_search(
+    search_api: str,
+    query_list: list[str],
+    params_to_pass: Optional[Dict[str, Any]] = None,
+    search_api_config: Optional[Dict[str, Any]] = None,
+    time_range: Optional[str] = None,
+    fallback_apis: Optional[List[str]] = None,
+    hedge_percentile: float = 0.9,
+    min_source_tokens: int = 8000,
+    deadline: float = 20.0,
+    scope: Optional[str] = None
+) -> tuple[List[dict], Optional[str]]:
+    """Search every query concurrently and return as soon as there is enough to write with.
+
+    Each query runs as its own request, and responses are consumed in the order
+    they arrive. The search returns once the sources collected so far reach
+    ``min_source_tokens`` or ``deadline`` seconds have passed (whichever comes
+    first, but never before the first response). Queries still running are left
+    to finish in the background under a pending id, to be collected with
+    ``collect_pending_search``. The id is prefixed with ``scope`` (the research
+    run), so that a cancelled run can drop its late queries with
+    ``discard_run_searches``. Like ``select_and_execute_search``, the primary
+    provider is called with ``params_to_pass`` and hedged providers with their
+    own parameters from ``search_api_config``.
+
+    Returns:
+        Tuple of the normalized responses received in time and the pending id
+        of the late queries (None if every query finished)
+    """
+    search_apis = [search_api, *[api for api in fallback_apis or [] if api != search_api]]
+
+    async def search_one(query: str) -> List[dict]:
+        if len(search_apis) > 1:
+            return await hedged_search(search_apis, [query], search_api_config, time_range, hedge_percentile)
+        return await execute_provider_search(search_api, [query], search_api_config, time_range, params=params_to_pass)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    pending = {asyncio.create_task(search_one(query)) for query in query_list}
+    responses: List[dict] = []
+
+    try:
+        while pending:
+            remaining = deadline - (loop.time() - started)
+            if responses and (remaining <= 0 or count_source_tokens(responses) >= min_source_tokens):
+                break
+            # Before the first response there is nothing to write with, so keep waiting past the deadline
+            done, pending = await asyncio.wait(pending, timeout=max(remaining, 0) if responses else None, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    responses.extend(task.result())
+                else:
+                    print(f"---Progressive Search: query failed ({task.exception()})---")
+    except asyncio.CancelledError:
+        for task in pending:
+            task.cancel()
+        raise
+
+    if not pending:
+        return responses, None
+
+    pending_id = f"{scope}:{uuid.uuid4().hex}" if scope else uuid.uuid4().hex
+    _pending_searches[pending_id] = pending
+    print(f"---Progressive Search: writing with {len(query_list) - len(pending)}/{len(query_list)} queries "
+          f"after {loop.time() - started:.1f}s, {len(pending)} still running---")
+    return responses, pending_id
+
+async def collect_pending_search(pending_id: Optional[str], timeout: float = 10.0) -> List[dict]:
+    """Responses of the late queries left running by ``progressive_search``.
+
+    Waits at most ``timeout`` seconds for queries that are still running and
+    cancels whatever has not finished by then.
+    """
+    tasks = _pending_searches.pop(pending_id, None) if pending_id else None
+    if not tasks:
+        return []
+    done, still_running = await asyncio.wait(tasks, timeout=timeout)
+    if still_running:
+        print(f"---Progressive Search: {len(still_running)} late queries still running after {timeout:.1f}s, dropping them---")
+        for task in still_running:
+            task.cancel()
+    responses = [response for task in done if not task.cancelled() and task.exception() is None for response in task.result()]
+    if responses:
+        print(f"---Progressive Search: collected {len(responses)} late responses---")
+    return responses
+
+def discard_pending_search(pending_id: Optional[str]):
+    """Cancel late queries whose results are no longer needed."""
+    tasks = _pending_searches.pop(pending_id, None) if pending_id else None
+    for task in tasks or ():
+        task.cancel()
+
+def discard_run_searches(scope: str):
+    """Cancel the late queries of every section of a research run, e.g. when the run is cancelled."""
+    pending_ids = [pending_id for pending_id in _pending_searches if pending_id.startswith(f"{scope}:")]
+    for pending_id in pending_ids:
+        discard_pending_search(pending_id)
+    if pending_ids:
+        print(f"---Progressive Search: cancelled late queries of {len(pending_ids)} sections of run {scope}---")
 
 
 class Summary(BaseModel):
@@ -962,7 +1383,78 @@ class Summary(BaseModel):
     key_excerpts: list[str]
 
 
-def split_and_rerank_search_results(embeddings: Embeddings, query: str, search_results: list[dict], max_chunks: int = 5):
+@lru_cache(maxsize=1)
+def get_rerank_embeddings() -> Embeddings:
+    """Embeddings client used for reranking, created once per process."""
+    return get_default_embeddings()
+
+
+def mmr_select(chunk_vectors: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float = 0.5) -> list[int]:
+    """Maximal marginal relevance selection over unit-normalized chunk vectors.
+
+    Args:
+        chunk_vectors: Normalized chunk embeddings, one row per chunk
+        relevance: Cosine similarity of every chunk to the query
+        k: Number of chunks to select
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        Indices of the selected chunks, in selection order
+    """
+    k = min(k, len(relevance))
+    if k == 0:
+        return []
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of each chunk to anything already selected
+    max_similarity = chunk_vectors @ chunk_vectors[selected[0]]
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[selected] = -np.inf
+        next_index = int(np.argmax(scores))
+        selected.append(next_index)
+        max_similarity = np.maximum(max_similarity, chunk_vectors @ chunk_vectors[next_index])
+    return selected
+
+
+# Most inputs sent in one embeddings request; larger batches are split to stay under the provider's limit
+RERANK_EMBEDDING_BATCH_SIZE = int(os.getenv("RERANK_EMBEDDING_BATCH_SIZE", "256"))
+
+async def embed_in_batches(embeddings: Embeddings, texts: list[str], batch_size: int = RERANK_EMBEDDING_BATCH_SIZE) -> np.ndarray:
+    """Embed texts in requests of at most batch_size inputs, returning unit-normalized rows."""
+    batch_size = max(batch_size, 1)
+    batches = await asyncio.gather(*[
+        embeddings.aembed_documents(texts[start:start + batch_size])
+        for start in range(0, len(texts), batch_size)
+    ])
+    vectors = np.asarray([vector for batch in batches for vector in batch], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    return vectors
+
+async def split_and_rerank_search_results(
+    embeddings: Embeddings,
+    queries: list[str],
+    search_results: list[dict],
+    max_chunks: int = 5,
+    lambda_mult: float = 0.5
+) -> list[Document]:
+    """Split search results into chunks and pick the most relevant, diverse chunks for each query.
+
+    All chunks and queries are embedded together (in as few requests as the
+    provider's per-request input limit allows). Each query is scored only
+    against the chunks of its own results, and MMR picks up to max_chunks of
+    them.
+
+    Args:
+        embeddings: Embeddings client
+        queries: Search queries to rerank for
+        search_results: Search results with title, url, content, optional raw_content
+            and the query that found them (results without one count for every query)
+        max_chunks: Number of chunks to keep per query
+        lambda_mult: MMR trade-off between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        list[Document]: Selected chunks with url and title metadata
+    """
     # split webpage content into chunks
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1500, chunk_overlap=200, add_start_index=True
@@ -970,18 +1462,31 @@ def split_and_rerank_search_results(embeddings: Embeddings, query: str, search_r
     documents = [
         Document(
             page_content=result.get('raw_content') or result['content'],
-            metadata={"url": result['url'], "title": result['title']}
+            metadata={"url": result['url'], "title": result['title'], "query": result.get('query')}
         )
         for result in search_results
     ]
     all_splits = text_splitter.split_documents(documents)
+    if not all_splits or not queries:
+        return []
 
-    # index chunks
-    vector_store = InMemoryVectorStore(embeddings)
-    vector_store.add_documents(documents=all_splits)
+    vectors = await embed_in_batches(embeddings, queries + [doc.page_content for doc in all_splits])
+    query_vectors, chunk_vectors = vectors[:len(queries)], vectors[len(queries):]
+    chunk_queries = np.asarray([doc.metadata.get('query') for doc in all_splits], dtype=object)
 
-    # retrieve relevant chunks
-    retrieved_docs = vector_store.similarity_search(query, k=max_chunks)
+    retrieved_docs = []
+    seen = set()
+    for query_index, query in enumerate(queries):
+        # Only the chunks of the query's own results compete for its slots
+        candidates = np.flatnonzero((chunk_queries == query) | (chunk_queries == None))  # noqa: E711
+        if len(candidates) == 0:
+            continue
+        relevance = chunk_vectors[candidates] @ query_vectors[query_index]
+        for position in mmr_select(chunk_vectors[candidates], relevance, max_chunks, lambda_mult):
+            chunk_index = int(candidates[position])
+            if chunk_index not in seen:
+                seen.add(chunk_index)
+                retrieved_docs.append(all_splits[chunk_index])
     return retrieved_docs
 
 
@@ -1,6 +1,8 @@
-from typing import Literal
+from typing import Literal, Optional
+from contextlib import asynccontextmanager
 import asyncio
 import os
+import uuid
 import sys
 import json
 from dotenv import load_dotenv
@@ -44,14 +46,23 @@ from src.agents.utils.web_deep_research.prompts import (
     section_writer_inputs
 )
 from src.agents.utils.web_deep_research.configuration import Configuration
+from src.agents.utils.web_deep_research.compression import compress_sources
+from src.agents.utils.web_deep_research.blob_store import store_text, load_text, release_blob_store, get_blob_scope
+from src.agents.utils.web_deep_research.plan_cache import get_plan_cache, make_plan_key
 from src.agents.utils.web_deep_research.utils import (
     format_sections, 
     get_config_value, 
     get_search_params, 
     select_and_execute_search,
+    deduplicate_and_format_sources,
+    progressive_search,
+    collect_pending_search,
+    discard_pending_search,
+    discard_run_searches,
     get_today_str,
     save_final_report,
-    save_graph_output
+    save_graph_output,
+    section_passes_heuristics
 )
 
 ## Nodes -- 
@@ -60,9 +71,11 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     
     This node:
     1. Gets configuration for the report structure and search parameters
-    2. Generates search queries to gather context for planning
-    3. Performs web searches using those queries
-    4. Uses an LLM to generate a structured plan with sections
+    2. Returns a cached plan for the same topic and structure if there is one
+    3. Generates search queries to gather context for planning (skipped in template
+       mode, or when the deadline is close)
+    4. Performs web searches using those queries (skipped likewise)
+    5. Uses an LLM to generate a structured plan with sections
     
     Args:
         state: Current graph state containing the report topic
@@ -94,27 +107,58 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     if isinstance(report_structure, dict):
         report_structure = str(report_structure)
 
-    # Set writer model (model used for query writing)
-    writer_model = get_default_llm()
-    structured_llm = writer_model.with_structured_output(Queries)
-
-    # Format system instructions
-    system_instructions_query = report_planner_query_writer_instructions.format(
-        topic=topic,
-        report_organization=report_structure,
-        number_of_queries=number_of_queries,
-        today=state.get("report_date", get_today_str())
-    )
-
-    # Generate queries  
-    results = await structured_llm.ainvoke([SystemMessage(content=system_instructions_query),
-                                     HumanMessage(content="Generate search queries that will help with planning the sections of the report.")])
-
-    # Web search
-    query_list = [query.search_query for query in results.queries]
-
-    # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass, time_range=time_range)
+    # Close to the deadline, skip the pre-planning search round trips
+    planning_mode = configurable.planning_mode
+    degraded = []
+    if planning_mode == "search" and configurable.deadline_within(configurable.deadline_template_planning_seconds):
+        planning_mode = "template"
+        degraded.append("Report planned from the template without a web search")
+        print(f"---Deadline: {configurable.time_left():.0f}s left, planning '{topic}' from the template---")
+
+    # Reuse the plan of an earlier run on the same topic and structure (plans under revision are always regenerated)
+    plan_cache = get_plan_cache() if configurable.plan_cache and not feedback else None
+    plan_key = make_plan_key(topic, report_structure, planning_mode)
+    if plan_cache is not None:
+        cached_sections = await asyncio.to_thread(plan_cache.get, plan_key, float(configurable.plan_cache_ttl_hours))
+        if cached_sections is not None:
+            print(f"---Plan cache hit for '{topic}' ({plan_cache.hits} hits, {plan_cache.misses} misses)---")
+            return {"sections": cached_sections}
+        print(f"---Plan cache miss for '{topic}' ({plan_cache.hits} hits, {plan_cache.misses} misses)---")
+
+    if planning_mode == "template":
+        # Plan from the report structure alone, without the query-writing and search round trips
+        source_str = "No web context was gathered for planning. Plan the sections from the report organization and the topic."
+    else:
+        # Set writer model (model used for query writing)
+        writer_model = get_default_llm()
+        structured_llm = writer_model.with_structured_output(Queries)
+
+        # Format system instructions
+        system_instructions_query = report_planner_query_writer_instructions.format(
+            topic=topic,
+            report_organization=report_structure,
+            number_of_queries=number_of_queries,
+            today=state.get("report_date", get_today_str())
+        )
+
+        # Generate queries  
+        results = await structured_llm.ainvoke([SystemMessage(content=system_instructions_query),
+                                         HumanMessage(content="Generate search queries that will help with planning the sections of the report.")])
+
+        # Web search
+        query_list = [query.search_query for query in results.queries]
+
+        # Search the web with parameters
+        source_str = await select_and_execute_search(
+            search_api,
+            query_list,
+            params_to_pass,
+            time_range=time_range,
+            fallback_apis=[get_config_value(api) for api in configurable.search_api_fallbacks or []],
+            search_api_config=search_api_config,
+            hedge_percentile=configurable.hedge_latency_percentile,
+            near_duplicate_threshold=configurable.near_duplicate_threshold
+        )
 
     # Format system instructions
     system_instructions_sections = report_planner_instructions.format(topic=topic, report_organization=report_structure, context=source_str, feedback=feedback)
@@ -140,18 +184,52 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     # Get sections
     sections = report_sections.sections
 
-    return {"sections": sections}
+    if plan_cache is not None:
+        await asyncio.to_thread(plan_cache.set, plan_key, topic, sections)
 
-def route_after_planning(state: ReportState) -> Command:
+    return {"sections": sections, "degraded": degraded}
+
+def estimate_section_work(section) -> int:
+    """Rough estimate of how much research a section needs, used to order the fan-out."""
+    return len(section.description.split())
+
+def get_run_config(configurable: Configuration, run_id: Optional[str] = None) -> dict:
+    """Build the RunnableConfig for a web research run.
+
+    LangGraph's max_concurrency caps the number of tasks running in one step,
+    which bounds how many section subgraphs are in flight at once. The run id
+    is used as the checkpoint thread id so a failed run can be resumed; runs
+    without one still get their own blob scope for large payloads.
+    """
+    if run_id is None:
+        run_configurable = {**dict(configurable.items()), "blob_scope": uuid.uuid4().hex}
+    else:
+        run_configurable = {**dict(configurable.items()), "thread_id": run_id}
+    return {"configurable": run_configurable, "max_concurrency": configurable.max_concurrent_sections}
+
+def route_after_planning(state: ReportState, config: RunnableConfig) -> Command:
     """Routes to either section writing or gathering based on whether research is needed."""
     sections = state['sections']
     topic = state["topic"]
     research_sections = [s for s in sections if s.research]
     if research_sections:
+        # Start the longest work first so it is not left running alone at the end
+        # while the section concurrency cap holds back the shorter sections
+        research_sections = sorted(research_sections, key=estimate_section_work, reverse=True)
+
+        # Split the per-report grading budget across the research sections
+        configurable = Configuration.from_runnable_config(config)
+        budget = configurable.reflection_llm_budget
+        if budget is None:
+            section_budgets = [None] * len(research_sections)
+        else:
+            share, remainder = divmod(max(int(budget), 0), len(research_sections))
+            section_budgets = [share + (1 if i < remainder else 0) for i in range(len(research_sections))]
+
         # Kick off section writing for sections that need research
         return Command(goto=[
-            Send("build_section_with_web_research", {"topic": topic, "section": s, "search_iterations": 0, "report_date": state.get("report_date")}) 
-            for s in research_sections 
+            Send("build_section_with_web_research", {"topic": topic, "section": s, "search_iterations": 0, "report_date": state.get("report_date"), "reflection_budget": b, "degraded": []}) 
+            for s, b in zip(research_sections, section_budgets)
         ])
     else:
         # If no research is needed, go straight to gathering
@@ -179,6 +257,13 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
     configurable = Configuration.from_runnable_config(config)
     number_of_queries = configurable.number_of_queries
 
+    # Close to the deadline, one query keeps the search round short
+    update = {}
+    if number_of_queries > 1 and configurable.deadline_within(configurable.deadline_single_query_seconds):
+        number_of_queries = 1
+        update["degraded"] = state.get("degraded", []) + [f"Section '{section.name}' researched with a single search query"]
+        print(f"---Deadline: {configurable.time_left():.0f}s left, one search query for '{section.name}'---")
+
     # Generate queries 
     writer_model = get_default_llm()
     structured_llm = writer_model.with_structured_output(Queries)
@@ -193,7 +278,7 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
     queries = await structured_llm.ainvoke([SystemMessage(content=system_instructions),
                                      HumanMessage(content="Generate search queries on the provided topic.")])
 
-    return {"search_queries": queries.queries}
+    return {"search_queries": queries.queries, **update}
 
 async def search_web(state: SectionState, config: RunnableConfig):
     """Execute web searches for the section queries.
@@ -224,10 +309,47 @@ async def search_web(state: SectionState, config: RunnableConfig):
     # Web search
     query_list = [query.search_query for query in search_queries]
 
+    if configurable.progressive_search:
+        # Start writing once enough sources are in; results arriving later are
+        # collected by this section's next search round, or by
+        # fold_late_results if the section passes without one
+        late_responses, (responses, pending_search_id) = await asyncio.gather(
+            collect_pending_search(state.get("pending_search_id"), timeout=configurable.progressive_search_deadline),
+            progressive_search(
+                search_api,
+                query_list,
+                params_to_pass,
+                search_api_config=search_api_config,
+                time_range=time_range,
+                fallback_apis=[get_config_value(api) for api in configurable.search_api_fallbacks or []],
+                hedge_percentile=configurable.hedge_latency_percentile,
+                min_source_tokens=configurable.progressive_min_source_tokens,
+                deadline=configurable.progressive_search_deadline,
+                scope=get_blob_scope(config)[0]
+            )
+        )
+        source_str = deduplicate_and_format_sources(
+            late_responses + responses,
+            max_tokens_per_source=4000,
+            deduplication_strategy="keep_first",
+            near_duplicate_threshold=configurable.near_duplicate_threshold
+        )
+        return {"source_str": store_text(config, source_str), "pending_search_id": pending_search_id, "search_iterations": state["search_iterations"] + 1}
+
     # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass, time_range=time_range)
+    source_str = await select_and_execute_search(
+        search_api,
+        query_list,
+        params_to_pass,
+        time_range=time_range,
+        fallback_apis=[get_config_value(api) for api in configurable.search_api_fallbacks or []],
+        search_api_config=search_api_config,
+        hedge_percentile=configurable.hedge_latency_percentile,
+        near_duplicate_threshold=configurable.near_duplicate_threshold
+    )
 
-    return {"source_str": source_str, "search_iterations": state["search_iterations"] + 1}
+    # Sources are kept in the run's blob store; the state only carries their id
+    return {"source_str": store_text(config, source_str), "search_iterations": state["search_iterations"] + 1}
 
 async def write_section(state: SectionState, config: RunnableConfig):
     """Write a section of the report.
@@ -246,9 +368,18 @@ async def write_section(state: SectionState, config: RunnableConfig):
     # Get state 
     topic = state["topic"]
     section = state["section"]
-    source_str = state["source_str"]
+    source_str = load_text(config, state["source_str"])
     report_date = state.get("report_date", get_today_str())
 
+    # Optionally keep only the source sentences most relevant to this section
+    configurable = Configuration.from_runnable_config(config)
+    if configurable.compress_sources:
+        source_str = compress_sources(
+            source_str,
+            f"{section.name} {section.description}",
+            token_budget=configurable.compression_token_budget
+        )
+
     # Format system instructions
     section_writer_inputs_formatted = section_writer_inputs.format(topic=topic, 
                                                                    section_name=section.name, 
@@ -269,14 +400,47 @@ async def write_section(state: SectionState, config: RunnableConfig):
     return {"section": section}
 
 async def reflection(state: SectionState, config: RunnableConfig):
-    """Reflect on the written section and decide if more research is needed."""
+    """Reflect on the written section and decide if more research is needed.
+
+    The grader LLM is only called when its verdict can change the outcome: it is
+    skipped once no further search iterations are allowed, when the section
+    clears the cheap heuristic checks, when the deadline is close, or when the
+    grading budget is spent.
+    """
     # Get state 
     topic = state["topic"]
     section = state["section"]
+    budget = state.get("reflection_budget")
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
 
+    # evaluate_section finalizes regardless of the grade at max depth
+    if state["search_iterations"] >= configurable.max_search_depth:
+        print(f"---Reflection: max search depth reached for '{section.name}', skipping grading---")
+        return {"feedback": Feedback(grade="pass", follow_up_queries=[]), "search_queries": []}
+
+    if configurable.reflection_heuristics and section_passes_heuristics(
+        section,
+        min_words=configurable.reflection_min_words,
+        min_citations=configurable.reflection_min_citations,
+        min_term_coverage=configurable.reflection_min_term_coverage
+    ):
+        print(f"---Reflection: '{section.name}' passed heuristic checks, skipping grading---")
+        return {"feedback": Feedback(grade="pass", follow_up_queries=[]), "search_queries": []}
+
+    if configurable.deadline_within(configurable.deadline_skip_reflection_seconds):
+        print(f"---Reflection: {configurable.time_left():.0f}s to the deadline, finalizing '{section.name}' without grading---")
+        return {
+            "feedback": Feedback(grade="pass", follow_up_queries=[]),
+            "search_queries": [],
+            "degraded": state.get("degraded", []) + [f"Section '{section.name}' finalized without a reflection round"]
+        }
+
+    if budget is not None and budget <= 0:
+        print(f"---Reflection: grading budget exhausted for '{section.name}', skipping grading---")
+        return {"feedback": Feedback(grade="pass", follow_up_queries=[]), "search_queries": []}
+
     # Grade prompt 
     section_grader_message = ("Grade the report and consider follow-up questions for missing information. "
                               "If the grade is 'pass', return empty strings for all follow-up queries. "
@@ -294,23 +458,65 @@ async def reflection(state: SectionState, config: RunnableConfig):
     feedback = await reflection_model.ainvoke([SystemMessage(content=section_grader_instructions_formatted),
                                         HumanMessage(content=section_grader_message)])
     
-    return {"feedback": feedback, "search_queries": feedback.follow_up_queries}
+    update = {"feedback": feedback, "search_queries": feedback.follow_up_queries}
+    if budget is not None:
+        update["reflection_budget"] = budget - 1
+    return update
 
-def evaluate_section(state: SectionState, config: RunnableConfig) -> Literal["finalize_section", "search_web"]:
+def evaluate_section(state: SectionState, config: RunnableConfig) -> Literal["fold_late_results", "finalize_section", "search_web"]:
     """Evaluate the feedback and decide the next step."""
     configurable = Configuration.from_runnable_config(config)
     if state["feedback"].grade == "pass" or state["search_iterations"] >= configurable.max_search_depth:
-        return "finalize_section"
+        # Progressive search results that arrived after writing started still have to be used
+        return "fold_late_results" if state.get("pending_search_id") else "finalize_section"
     else:
         return "search_web"
 
+async def fold_late_results(state: SectionState, config: RunnableConfig):
+    """Rewrite a passing section with the progressive search results that arrived after it was written.
+
+    Without a further search round nothing else would collect them. Close to
+    the deadline only the queries that already finished are used.
+    """
+    section = state["section"]
+    configurable = Configuration.from_runnable_config(config)
+
+    timeout = configurable.progressive_search_deadline
+    if configurable.deadline_within(configurable.deadline_skip_reflection_seconds):
+        timeout = 0
+    late_responses = await collect_pending_search(state.get("pending_search_id"), timeout=timeout)
+
+    # Only sources the section was not written from
+    source_str = load_text(config, state["source_str"])
+    late_responses = [
+        {**response, "results": [r for r in response["results"] if f"URL: {r['url']}\n" not in source_str]}
+        for response in late_responses
+    ]
+    if not any(response["results"] for response in late_responses):
+        return {"pending_search_id": None}
+
+    print(f"---Progressive Search: rewriting '{section.name}' with late results---")
+    late_source_str = deduplicate_and_format_sources(
+        late_responses,
+        max_tokens_per_source=4000,
+        deduplication_strategy="keep_first",
+        near_duplicate_threshold=configurable.near_duplicate_threshold
+    )
+    source_id = store_text(config, f"{source_str}\n\n{late_source_str}")
+    update = await write_section({**state, "source_str": source_id}, config)
+    return {**update, "source_str": source_id, "pending_search_id": None}
+
 def finalize_section(state: SectionState, config: RunnableConfig) -> dict:
     """Finalize the section and prepare for output."""
     configurable = Configuration.from_runnable_config(config)
     section = state["section"]
-    update = {"completed_sections": [section]}
+
+    # The section is done, so late progressive search results are no longer needed
+    discard_pending_search(state.get("pending_search_id"))
+
+    update = {"completed_sections": [section], "degraded": state.get("degraded", [])}
     if configurable.include_source_str:
-        update["source_str"] = state["source_str"]
+        update["source_refs"] = [state["source_str"]]
     return update
     
 async def write_final_sections(state: SectionState, config: RunnableConfig):
@@ -333,7 +539,7 @@ async def write_final_sections(state: SectionState, config: RunnableConfig):
     # Get state 
     topic = state["topic"]
     section = state["section"]
-    completed_report_sections = state["report_sections_from_research"]
+    completed_report_sections = load_text(config, state["report_sections_from_research"])
     
     # Format system instructions
     system_instructions = final_section_writer_instructions.format(topic=topic, section_name=section.name, section_topic=section.description, context=completed_report_sections)
@@ -350,7 +556,7 @@ async def write_final_sections(state: SectionState, config: RunnableConfig):
     # Write the updated section to completed sections
     return {"completed_sections": [section]}
 
-def gather_completed_sections(state: ReportState):
+def gather_completed_sections(state: ReportState, config: RunnableConfig):
     """Format completed sections as context for writing final sections.
     
     This node takes all completed research sections and formats them into
@@ -358,9 +564,10 @@ def gather_completed_sections(state: ReportState):
     
     Args:
         state: Current state with completed sections
+        config: Run configuration, used to find the run's blob store
         
     Returns:
-        Dict with formatted sections as context
+        Dict with the blob id of the formatted sections
     """
 
     # List of completed sections
@@ -369,7 +576,7 @@ def gather_completed_sections(state: ReportState):
     # Format completed section to str to use as context for final sections
     completed_report_sections = format_sections(completed_sections)
 
-    return {"report_sections_from_research": completed_report_sections}
+    return {"report_sections_from_research": store_text(config, completed_report_sections)}
 
 def compile_final_report(state: ReportState, config: RunnableConfig):
     """Compile all sections into the final report.
@@ -401,7 +608,8 @@ def compile_final_report(state: ReportState, config: RunnableConfig):
     all_sections = "\n\n".join([s.content for s in sections])
 
     if configurable.include_source_str:
-        return {"final_report": all_sections, "source_str": state["source_str"]}
+        source_str = "".join(load_text(config, ref) for ref in state.get("source_refs", []))
+        return {"final_report": all_sections, "source_str": source_str}
     else:
         return {"final_report": all_sections}
 
@@ -433,6 +641,7 @@ section_builder.add_node("generate_queries", generate_queries)
 section_builder.add_node("search_web", search_web)
 section_builder.add_node("write_section", write_section)
 section_builder.add_node("reflection", reflection)
+section_builder.add_node("fold_late_results", fold_late_results)
 section_builder.add_node("finalize_section", finalize_section)
 
 # Add edges
@@ -441,6 +650,7 @@ section_builder.add_edge("generate_queries", "search_web")
 section_builder.add_edge("search_web", "write_section")
 section_builder.add_edge("write_section", "reflection")
 section_builder.add_conditional_edges("reflection", evaluate_section)
+section_builder.add_edge("fold_late_results", "finalize_section")
 section_builder.add_edge("finalize_section", END)
 
 # Outer graph for initial report plan compiling results from each section -- 
@@ -464,9 +674,100 @@ builder.add_edge("compile_final_report", END)
 
 _graph = builder.compile() 
 
-def get_deep_research_agent():
-    """Returns the compiled deep research agent."""
-    return _graph
+# Local checkpoint store used to resume failed runs
+CHECKPOINT_DB_PATH = os.getenv(
+    "WEB_RESEARCH_CHECKPOINT_DB",
+    os.path.join(project_root, "data", "processed", "web_research_checkpoints.sqlite")
+)
+_memory_checkpointer = MemorySaver()
+
+def get_deep_research_agent(checkpointer=None):
+    """Returns the compiled deep research agent, optionally compiled with a checkpointer."""
+    if checkpointer is None:
+        return _graph
+    return builder.compile(checkpointer=checkpointer)
+
+@asynccontextmanager
+async def get_checkpointer(db_path: Optional[str] = None):
+    """Yields a SQLite checkpointer for resumable runs.
+
+    Falls back to a process-local in-memory checkpointer when
+    langgraph-checkpoint-sqlite is not installed, in which case runs can only
+    be resumed within the same process.
+    """
+    try:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        print("⚠️  langgraph-checkpoint-sqlite not found. Install it with 'pip install langgraph-checkpoint-sqlite' to resume runs across restarts.")
+        yield _memory_checkpointer
+        return
+
+    db_path = db_path or CHECKPOINT_DB_PATH
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(db_path) as checkpointer:
+        yield checkpointer
+
+# Checkpoint threads being run by this process; an identical concurrent request gets another one
+_active_threads: set[str] = set()
+# Finished runs of the same inputs that are skipped before falling back to a random thread id
+MAX_THREAD_ATTEMPTS = 20
+
+async def claim_thread(agent, config: dict):
+    """Pick the checkpoint thread of a run and mark it active; returns its state snapshot.
+
+    The run id's thread is used if it holds an unfinished run (to resume it)
+    or nothing yet. A finished thread must not be invoked again, as the
+    reducer channels (completed sections, degradation notes, source refs)
+    would add the new run's values to the old ones, so the next attempt
+    suffix is tried instead, as is any thread another run is using.
+    ``config`` is updated in place with the chosen thread id.
+    """
+    base_id = config["configurable"]["thread_id"]
+    candidates = [base_id] + [f"{base_id}-{attempt}" for attempt in range(1, MAX_THREAD_ATTEMPTS)]
+    for thread_id in candidates:
+        if thread_id in _active_threads:
+            continue
+        # Claimed before the state is read, so a concurrent request skips it
+        _active_threads.add(thread_id)
+        config["configurable"]["thread_id"] = thread_id
+        try:
+            snapshot = await agent.aget_state(config)
+        except BaseException:
+            _active_threads.discard(thread_id)
+            raise
+        if snapshot is None or snapshot.next or not snapshot.values:
+            return snapshot
+        _active_threads.discard(thread_id)
+    thread_id = f"{base_id}-{uuid.uuid4().hex[:8]}"
+    _active_threads.add(thread_id)
+    config["configurable"]["thread_id"] = thread_id
+    return None
+
+async def run_resumable(agent, graph_input: dict, config: dict) -> dict:
+    """Invoke a checkpointed agent, resuming the thread if an earlier run did not finish.
+
+    Work completed by the earlier run (finished nodes and section subgraphs) is
+    loaded from the checkpoint instead of being redone. A run whose earlier
+    attempt finished starts afresh on a new thread (see claim_thread), and
+    ``config`` is left pointing at the thread that was used.
+
+    If the run is cancelled (e.g. its client went away), the searches its
+    sections left running in the background are cancelled with it; the
+    checkpoint is kept, so a later identical request still resumes.
+    """
+    snapshot = await claim_thread(agent, config)
+    thread_id = config["configurable"]["thread_id"]
+    try:
+        if snapshot and snapshot.next:
+            print(f"---Resuming web research run {thread_id} at {list(snapshot.next)}---")
+            return await agent.ainvoke(None, config=config)
+        return await agent.ainvoke(graph_input, config=config)
+    except asyncio.CancelledError:
+        print(f"---Web research run {get_blob_scope(config)[0]} cancelled---")
+        discard_run_searches(get_blob_scope(config)[0])
+        raise
+    finally:
+        _active_threads.discard(thread_id)
 
 async def test_graph():
     """Test the graph with a sample input."""
@@ -476,7 +777,9 @@ async def test_graph():
     }
     # Run the graph
     config = Configuration()
-    result = await _graph.ainvoke(test_input, config={"configurable": config})
+    run_config = get_run_config(config)
+    result = await _graph.ainvoke(test_input, config=run_config)
+    release_blob_store(run_config)
     print(result)
     
     # Save the results
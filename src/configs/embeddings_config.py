@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 from langchain_core.embeddings import Embeddings
 from openai import OpenAI
 
+from src.agents.utils.rate_limiter import get_provider_limiter, estimate_tokens
+
 # Load environment variables
 load_dotenv()
 
@@ -15,17 +17,22 @@ class SimpleOpenAIEmbeddings(Embeddings):
         self.base_url = base_url
         self.client = OpenAI(
             api_key=api_key or os.getenv("METIS_API_KEY"),
-            base_url=base_url
+            base_url=base_url,
+            max_retries=0  # Retries are handled by the shared rate limiter
         )
+        self.limiter = get_provider_limiter("embeddings")
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents"""
         try:
-            response = self.client.embeddings.create(
-                input=texts,
-                model=self.model,
-                encoding_format="float",
-                dimensions=1024
+            response = self.limiter.call(
+                lambda: self.client.embeddings.create(
+                    input=texts,
+                    model=self.model,
+                    encoding_format="float",
+                    dimensions=1024
+                ),
+                tokens=sum(estimate_tokens(text) for text in texts)
             )
             return [data.embedding for data in response.data]
         except Exception as e:
@@ -34,11 +41,14 @@ class SimpleOpenAIEmbeddings(Embeddings):
     def embed_query(self, text: str) -> List[float]:
         """Embed a single query"""
         try:
-            response = self.client.embeddings.create(
-                input=text,
-                model=self.model,
-                encoding_format="float",
-                dimensions=1024
+            response = self.limiter.call(
+                lambda: self.client.embeddings.create(
+                    input=text,
+                    model=self.model,
+                    encoding_format="float",
+                    dimensions=1024
+                ),
+                tokens=estimate_tokens(text)
             )
             return response.data[0].embedding
         except Exception as e:
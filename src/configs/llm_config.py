@@ -1,17 +1,78 @@
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, ClassVar
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from src.agents.utils.concurrency import llm_slot
+from src.agents.utils.rate_limiter import get_provider_limiter, estimate_tokens
+
 # Load environment variables
 load_dotenv()
 
+
+def _estimate_prompt_tokens(messages) -> int:
+    return sum(estimate_tokens(str(getattr(message, "content", message))) for message in messages)
+
+
+class _SharedBudgetMixin:
+    """Routes generation through the provider's rate limiter and the process-wide LLM concurrency budget."""
+
+    _limiter_name: ClassVar[str] = "llm"
+
+    def _generate(self, messages, *args, **kwargs):
+        parent = super()._generate
+        limiter = get_provider_limiter(self._limiter_name)
+        return limiter.call(lambda: parent(messages, *args, **kwargs), tokens=_estimate_prompt_tokens(messages))
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        parent = super()._agenerate
+        limiter = get_provider_limiter(self._limiter_name)
+        return await limiter.acall(
+            lambda: parent(messages, *args, **kwargs),
+            tokens=_estimate_prompt_tokens(messages),
+            slot=llm_slot
+        )
+
+    async def _astream(self, messages, *args, **kwargs):
+        parent = super()._astream
+        limiter = get_provider_limiter(self._limiter_name)
+        stream = None
+
+        async def open_stream():
+            # Retries are only safe until the first chunk has been handed out
+            nonlocal stream
+            stream = parent(messages, *args, **kwargs)
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        async with llm_slot():
+            first_chunk = await limiter.acall(open_stream, tokens=_estimate_prompt_tokens(messages))
+            if first_chunk is None:
+                return
+            yield first_chunk
+            async for chunk in stream:
+                yield chunk
+
+
+class BudgetedChatOpenAI(_SharedBudgetMixin, ChatOpenAI):
+    """ChatOpenAI that shares the process-wide rate limits and LLM concurrency budget."""
+
+    _limiter_name: ClassVar[str] = "openai"
+
+
+class BudgetedChatGoogleGenerativeAI(_SharedBudgetMixin, ChatGoogleGenerativeAI):
+    """ChatGoogleGenerativeAI that shares the process-wide rate limits and LLM concurrency budget."""
+
+    _limiter_name: ClassVar[str] = "gemini"
+
 # LLM Provider Configuration
 LLM_PROVIDERS = {
     "openai": {
         "base_url": "https://openrouter.ai/api/v1",
-        "class": ChatOpenAI,
+        "class": BudgetedChatOpenAI,
         "models": {
             "gpt-4o-mini": {"api_key_env": "OPENAI_API_KEY"},
             "gpt-4.1-mini": {"api_key_env": "OPENAI_API_KEY"},
@@ -21,7 +82,7 @@ LLM_PROVIDERS = {
     },
     "gemini": {
         "base_url": "https://generativelanguage.googleapis.com/v1beta",
-        "class": ChatGoogleGenerativeAI,
+        "class": BudgetedChatGoogleGenerativeAI,
         "models": {
             "gemini-1.5-flash": {"api_key_env": "GEMINI_API_KEY"},
             "gemini-1.5-pro": {"api_key_env": "GEMINI_API_KEY"},
@@ -83,6 +144,9 @@ def get_llm(
         **kwargs
     }
     
+    # Retries are handled by the shared rate limiter, not by the client library
+    init_params.setdefault("max_retries", 0)
+
     # Add provider-specific API key parameter
     if provider == "openai":
         init_params["openai_api_key"] = api_key
@@ -0,0 +1,79 @@
+"""
+Tests for local extractive compression of section sources
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.utils.web_deep_research.compression import (
+    compress_sources,
+    parse_sources,
+    score_sentences,
+    split_sentences,
+)
+
+SEPARATOR = "-" * 80
+
+
+def tavily_sources(*sources):
+    """A source string in the shape tavily_search formats it."""
+    blocks = [
+        f"--- SOURCE {index}: {title} ---\nURL: {url}\n\nSUMMARY:\n{body}\n\n{SEPARATOR}\n"
+        for index, (title, url, body) in enumerate(sources, start=1)
+    ]
+    return "Search results:\n\n" + "\n".join(blocks)
+
+
+def test_split_sentences_handles_persian_punctuation():
+    text = "قیمت آپارتمان در تهران امسال بالا رفت؟ خریداران منتظر کاهش نرخ وام ماندند. کوتاه."
+    assert split_sentences(text) == [
+        "قیمت آپارتمان در تهران امسال بالا رفت؟",
+        "خریداران منتظر کاهش نرخ وام ماندند.",
+    ]
+
+
+def test_score_sentences_ranks_query_terms_and_boosts_numbers():
+    sentences = [
+        "The weather in the city was sunny and warm all week.",
+        "Apartment prices in Tehran rose quickly this year.",
+        "Apartment prices in Tehran rose 12 percent this year.",
+    ]
+    scores = score_sentences(sentences, "Tehran apartment prices")
+    assert scores[0] == 0
+    assert scores[2] > scores[1] > 0
+
+
+def test_score_sentences_without_shared_terms():
+    assert np.array_equal(score_sentences(["Nothing in common with the query here."], "zoning"), np.zeros(1))
+
+
+def test_parse_sources_strips_labels():
+    sources = parse_sources(tavily_sources(("Prices", "https://a.example", "Prices rose again in the capital.")))
+    assert sources == [("Prices", "https://a.example", "Prices rose again in the capital.")]
+
+
+def test_compress_sources_keeps_relevant_sentences_with_attribution():
+    relevant = "Apartment prices in Tehran rose 12 percent in the last quarter."
+    filler = " ".join(f"The local football team won match number {i} after extra time." for i in range(40))
+    source_str = tavily_sources(
+        ("Sports", "https://sports.example", filler),
+        ("Housing", "https://housing.example", relevant + " " + filler),
+    )
+    compressed = compress_sources(source_str, "Tehran apartment prices", token_budget=100)
+
+    assert len(compressed) < len(source_str)
+    assert relevant in compressed
+    # The kept sentence stays under the source it came from
+    assert compressed.index("URL: https://housing.example") < compressed.index(relevant)
+
+
+def test_compress_sources_leaves_short_or_unparsable_input_alone():
+    short = tavily_sources(("Prices", "https://a.example", "Prices rose again in the capital."))
+    assert compress_sources(short, "prices", token_budget=1000) == short
+    unparsable = "no sources here " * 100
+    assert compress_sources(unparsable, "prices", token_budget=10) == unparsable
@@ -0,0 +1,65 @@
+"""
+Tests for the process-wide concurrency budgets
+"""
+
+import os
+import sys
+import asyncio
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.utils.concurrency import ConcurrencyBudget
+
+
+def test_waiters_are_served_by_priority():
+    budget = ConcurrencyBudget("test", 1)
+    order = []
+
+    async def call(name, priority):
+        async with budget.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        async with budget.slot("normal"):
+            tasks = [asyncio.create_task(call(name, priority))
+                     for name, priority in [("low", "low"), ("normal", "normal"), ("high", "high")]]
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert order == ["high", "normal", "low"]
+
+
+def test_bulk_cancelled_waiters_release_every_slot():
+    budget = ConcurrencyBudget("test", 2)
+
+    async def call(release: asyncio.Event):
+        async with budget.slot("normal"):
+            await release.wait()
+
+    async def scenario():
+        release = asyncio.Event()
+        holders = [asyncio.create_task(call(release)) for _ in range(2)]
+        waiting = [asyncio.create_task(call(asyncio.Event())) for _ in range(6)]
+        await asyncio.sleep(0)
+        slots = budget._get_slots()
+        assert slots.in_use == 2 and len(slots.waiters) == 6
+
+        # The holders finish in the same loop iteration as the waiters are cancelled,
+        # as when a disconnecting client cancels a whole workflow
+        release.set()
+        for task in waiting:
+            task.cancel()
+        results = await asyncio.gather(*holders, *waiting, return_exceptions=True)
+
+        assert results[:2] == [None, None]
+        assert all(isinstance(result, asyncio.CancelledError) for result in results[2:])
+        assert slots.in_use == 0 and slots.waiters == []
+
+        # The budget is still usable afterwards
+        async with budget.slot("normal"):
+            assert slots.in_use == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+"""
+Tests for near-duplicate detection of search results
+"""
+
+import os
+import sys
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.utils.web_deep_research.dedup import (
+    minhash_signature,
+    normalize_text,
+    remove_near_duplicates,
+)
+
+ARTICLE = (
+    "Average apartment prices in northern Tehran rose by twelve percent over the last quarter "
+    "according to the central bank report, while transaction volume fell for the third month in a row "
+    "as buyers waited for clearer signals on mortgage rates and the new housing tax."
+)
+OTHER_ARTICLE = (
+    "The municipality of Shiraz approved a new zoning plan for the eastern districts that allows "
+    "taller residential towers near the metro line and requires developers to include green space "
+    "and parking in every project larger than two thousand square meters."
+)
+
+
+def test_normalize_text_unifies_persian_and_arabic_variants():
+    # Arabic yeh and kaf, a diacritic and a zero-width non-joiner
+    assert normalize_text("كتاب‌هاي مِلك") == normalize_text("کتاب‌های ملک")
+    assert normalize_text("Tehran APARTMENT") == ["tehran", "apartment"]
+
+
+def test_short_texts_have_no_signature():
+    assert minhash_signature("too short to compare") is None
+    assert minhash_signature(ARTICLE) is not None
+
+
+def test_identical_content_has_identical_signatures():
+    assert (minhash_signature(ARTICLE) == minhash_signature(ARTICLE.upper())).all()
+
+
+def test_syndicated_copy_keeps_the_highest_scoring_result():
+    results = [
+        {"url": "https://mirror.example/a", "content": ARTICLE + " Read more on our site.", "score": 0.4},
+        {"url": "https://other.example/b", "content": OTHER_ARTICLE, "score": 0.5},
+        {"url": "https://origin.example/a", "content": ARTICLE, "score": 0.9},
+    ]
+    kept = remove_near_duplicates(results, threshold=0.7)
+    # The best copy survives and the original order is preserved
+    assert [r["url"] for r in kept] == ["https://other.example/b", "https://origin.example/a"]
+
+
+def test_distinct_and_short_results_are_kept():
+    results = [
+        {"url": "a", "content": ARTICLE, "score": 0.1},
+        {"url": "b", "content": OTHER_ARTICLE, "score": 0.2},
+        {"url": "c", "content": "short snippet", "score": 0.3},
+        {"url": "d", "content": "short snippet", "score": 0.4},
+    ]
+    assert remove_near_duplicates(results) == results
+
+
+def test_raw_content_is_compared_when_present():
+    results = [
+        {"url": "a", "content": "first teaser", "raw_content": ARTICLE, "score": 0.8},
+        {"url": "b", "content": "second teaser", "raw_content": ARTICLE, "score": 0.3},
+    ]
+    assert [r["url"] for r in remove_near_duplicates(results)] == ["a"]
@@ -0,0 +1,87 @@
+"""
+Tests for the fragment-level JSON repair of field researcher extractions
+"""
+
+import os
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+field_researcher = pytest.importorskip("src.agents.analysis.field_researcher")
+from src.agents.analysis.models.field_researcher_models import MarketData
+
+
+class RepairLLM:
+    """Answers every repair prompt with the same fragment, recording the prompts."""
+
+    def __init__(self, fragment):
+        self.fragment = fragment
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[0].content)
+        return SimpleNamespace(content=json.dumps(self.fragment))
+
+
+def extraction(market_data):
+    return {
+        "analysis": {
+            "key_market_data": market_data,
+            "market_outlook": "Positive",
+            "raw_text_summary": "Prices rose.",
+        },
+        "trend_summary": "Prices rose in Tehran.",
+    }
+
+
+def test_get_fragment_stops_at_the_list_element():
+    assert field_researcher.get_fragment(("analysis", "key_market_data", 1, "value")) == (
+        ("analysis", "key_market_data", 1),
+        MarketData,
+    )
+    assert field_researcher.get_fragment(("analysis", "market_outlook")) == (("analysis", "market_outlook"), str)
+
+
+def test_valid_data_needs_no_repair():
+    llm = RepairLLM({})
+    data = extraction([{"metric_name": "Median price", "value": "85 billion rials"}])
+    result, errors = asyncio.run(field_researcher.validate_with_repair(llm, data))
+    assert result is not None and errors == []
+    assert llm.prompts == []
+
+
+def test_only_the_invalid_element_is_repaired():
+    llm = RepairLLM({"metric_name": "Average rent", "value": "40 million rials"})
+    data = extraction([
+        {"metric_name": "Median price", "value": "85 billion rials"},
+        {"metric_name": "Average rent"},  # missing value
+    ])
+    result, errors = asyncio.run(field_researcher.validate_with_repair(llm, data))
+
+    assert errors == []
+    assert [m.value for m in result.analysis.key_market_data] == ["85 billion rials", "40 million rials"]
+    # One small repair call for the broken entry, not a full re-extraction
+    assert len(llm.prompts) == 1
+    assert "analysis.key_market_data.1" in llm.prompts[0]
+
+
+def test_unrepairable_elements_are_dropped():
+    llm = RepairLLM({"still": "wrong"})
+    data = extraction([
+        {"metric_name": "Median price", "value": "85 billion rials"},
+        {"value": "no name"},
+    ])
+    result, errors = asyncio.run(field_researcher.validate_with_repair(llm, data))
+    assert errors == []
+    assert [m.metric_name for m in result.analysis.key_market_data] == ["Median price"]
+
+
+def test_non_object_extraction_is_rejected():
+    result, errors = asyncio.run(field_researcher.validate_with_repair(RepairLLM({}), ["not", "an", "object"]))
+    assert result is None and errors
@@ -0,0 +1,195 @@
+"""
+Tests for background report jobs: report assembly, fair scheduling and coalescing
+"""
+
+import os
+import sys
+import asyncio
+
+import pytest
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+jobs = pytest.importorskip("backend.jobs")
+from src.agents.events import (
+    WorkflowEvent, STAGE_WORKFLOW, STAGE_STRATEGIC_ADVICE, STAGE_REPORT_GENERATION
+)
+
+REPORT_TEXT = "Prices in Tehran keep rising."
+
+
+def streamed_workflow(*args, **kwargs):
+    """The events of a run with stream_tokens=True, as main_events sends them."""
+    async def events():
+        yield WorkflowEvent(type="stage_start", stage=STAGE_WORKFLOW, data={"language": "English"})
+        yield WorkflowEvent(type="stage_start", stage=STAGE_STRATEGIC_ADVICE, data={"report_date": "2025-01-01"})
+        for token in ['{"recommendation": ', '"buy"}']:
+            yield WorkflowEvent(type="token", stage=STAGE_STRATEGIC_ADVICE, data=token)
+        yield WorkflowEvent(type="advice", stage=STAGE_STRATEGIC_ADVICE, data={"recommendation": "buy"})
+        yield WorkflowEvent(type="stage_start", stage=STAGE_REPORT_GENERATION, data={})
+        for token in ["Prices in Tehran ", "keep rising."]:
+            yield WorkflowEvent(type="token", stage=STAGE_REPORT_GENERATION, data=token)
+        yield WorkflowEvent(type="final_report", stage=STAGE_REPORT_GENERATION, data=REPORT_TEXT)
+        yield WorkflowEvent(type="stage_end", stage=STAGE_WORKFLOW, data={"partial": False})
+    return events()
+
+
+def test_report_is_built_without_the_token_stream(monkeypatch):
+    monkeypatch.setattr(jobs, "main_events", streamed_workflow)
+    stored = []
+
+    def on_success(job):
+        # The report is persisted before anyone waiting for the job is told it finished
+        stored.append((job.report, job.finished))
+
+    async def scenario():
+        manager = jobs.ReportJobManager(workers=1, queue_size=4, use_processes=False, on_success=on_success)
+        job = await manager.submit("Tehran apartments")
+        await job.wait()
+        await manager.stop()
+        return job
+
+    job = asyncio.run(scenario())
+
+    assert job.status == "succeeded"
+    assert "```json" not in job.report
+    assert job.report.count(REPORT_TEXT) == 1
+    assert stored == [(job.report, False)]
+    # Live subscribers still got every token
+    assert sum(event.type == "token" for event in job.events) == 4
+
+
+def queued_job(level, created_at=None):
+    tier = {"high": "premium", "normal": "standard", "low": "batch"}[level]
+    job = jobs.ReportJob(f"{level} query", priority=jobs.RunPriority(tier))
+    if created_at is not None:
+        job.created_at = created_at
+    return job
+
+
+def test_fair_queue_starts_levels_in_proportion_to_their_weights():
+    async def scenario():
+        queue = jobs.FairJobQueue(maxsize=100, weights={"high": 6, "normal": 3, "low": 1})
+        for level in ("low", "normal", "high"):
+            for _ in range(20):
+                queue.put_nowait(queued_job(level))
+        return [(await queue.get()).priority.level for _ in range(10)]
+
+    order = asyncio.run(scenario())
+    assert order[0] == "high"
+    assert {level: order.count(level) for level in ("high", "normal", "low")} == {"high": 6, "normal": 3, "low": 1}
+
+
+def test_fair_queue_idle_level_does_not_catch_up():
+    async def scenario():
+        queue = jobs.FairJobQueue(maxsize=100, weights={"high": 1, "normal": 1, "low": 1})
+        for _ in range(6):
+            queue.put_nowait(queued_job("normal"))
+        for _ in range(4):
+            await queue.get()
+        # Low was idle while normal ran; it now alternates with normal instead of
+        # taking every start until its virtual clock caught up
+        for _ in range(4):
+            queue.put_nowait(queued_job("low"))
+        return [(await queue.get()).priority.level for _ in range(4)]
+
+    assert sorted(asyncio.run(scenario())) == ["low", "low", "normal", "normal"]
+
+
+def test_fair_queue_starts_a_job_that_waited_too_long(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_MAX_WAIT_SECONDS", 60)
+
+    async def scenario():
+        queue = jobs.FairJobQueue(maxsize=10)
+        queue.put_nowait(queued_job("high"))
+        queue.put_nowait(queued_job("low", created_at=jobs.time.time() - 120))
+        return (await queue.get()).priority.level
+
+    assert asyncio.run(scenario()) == "low"
+
+
+def test_fair_queue_is_bounded_and_reprioritizes():
+    async def scenario():
+        queue = jobs.FairJobQueue(maxsize=2)
+        low = queued_job("low")
+        queue.put_nowait(queued_job("normal"))
+        queue.put_nowait(low)
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait(queued_job("high"))
+
+        # An urgent work order moves the batch job up to the normal level
+        low.priority.urgency_level = "urgent"
+        queue.reprioritize(low, "low")
+        assert queue.sizes() == {"high": 0, "normal": 2, "low": 0}
+
+    asyncio.run(scenario())
+
+
+def slow_workflow(*args, **kwargs):
+    async def events():
+        yield WorkflowEvent(type="stage_start", stage=STAGE_WORKFLOW, data={"language": "English"})
+        await asyncio.sleep(10)
+        yield WorkflowEvent(type="final_report", stage=STAGE_REPORT_GENERATION, data=REPORT_TEXT)
+    return events()
+
+
+def test_coalesced_job_outlives_a_client_that_lets_go_twice(monkeypatch):
+    monkeypatch.setattr(jobs, "main_events", slow_workflow)
+
+    async def scenario():
+        manager = jobs.ReportJobManager(workers=1, queue_size=4, use_processes=False)
+        first = jobs.JobClient(manager, await manager.submit("Tehran apartments"))
+        # The same request, worded slightly differently, attaches to the running job
+        second = jobs.JobClient(manager, await manager.submit("  tehran  Apartments "))
+        assert first.job is second.job and first.job.clients == 2
+        await asyncio.sleep(0.01)
+
+        # The first client's disconnect watcher and its cleanup both let go
+        assert first.release("client disconnected")
+        assert not first.release("client disconnected")
+        await asyncio.sleep(0.01)
+        assert first.job.status == "running" and first.job.clients == 1
+
+        # The job is only cancelled once the second client lets go too
+        assert second.release("client disconnected")
+        await first.job.wait()
+        await manager.stop()
+        return first.job
+
+    job = asyncio.run(scenario())
+    assert job.status == "cancelled"
+
+
+def test_disconnect_watcher_and_cleanup_detach_once(monkeypatch):
+    app = pytest.importorskip("backend.app")
+    monkeypatch.setattr(jobs, "main_events", slow_workflow)
+
+    class Request:
+        def __init__(self, disconnected):
+            self.disconnected = disconnected
+
+        async def is_disconnected(self):
+            return self.disconnected
+
+    async def scenario():
+        manager = jobs.ReportJobManager(workers=1, queue_size=4, use_processes=False)
+        monkeypatch.setattr(app, "job_manager", manager)
+        leaving = jobs.JobClient(manager, await manager.submit("Tehran apartments"))
+        staying = jobs.JobClient(manager, await manager.submit("Tehran apartments"))
+
+        await app.cancel_on_disconnect(Request(disconnected=True), leaving, interval=0.01)
+        # What the endpoint's finally block does once the watcher has returned
+        leaving.release("client disconnected")
+        watcher = asyncio.create_task(app.cancel_on_disconnect(Request(disconnected=False), staying, interval=0.01))
+        await asyncio.sleep(0.05)
+
+        job = staying.job
+        assert job.clients == 1 and not job.finished
+        watcher.cancel()
+        staying.release("client disconnected")
+        await job.wait()
+        await manager.stop()
+        return job
+
+    assert asyncio.run(scenario()).status == "cancelled"
@@ -0,0 +1,59 @@
+"""
+Tests for the compact prompt serialization of structured data
+"""
+
+import os
+import sys
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.utils.prompt_serializer import prune_empty, serialize_for_prompt
+
+
+def test_empty_fields_are_dropped():
+    data = {"location": "تهران", "budget": None, "notes": "", "tags": [], "rooms": 0, "urgent": False}
+    assert prune_empty(data) == {"location": "تهران", "rooms": 0, "urgent": False}
+
+
+def test_multiline_field_keeps_its_line_breaks():
+    data = {
+        "advice": {
+            "summary": "Prices   are rising.\n\n\n\nRecommendations:\n-\tBuy  before spring\n- Avoid  the north",
+        }
+    }
+    assert serialize_for_prompt(data, token_budget=None) == (
+        "advice:\n"
+        "  summary: Prices are rising.\n"
+        "\n"
+        "    Recommendations:\n"
+        "    - Buy before spring\n"
+        "    - Avoid the north"
+    )
+
+
+def test_list_of_records_becomes_a_table():
+    data = {
+        "key_market_data": [
+            {"metric_name": "Median price", "value": "85 billion rials", "region": "District 1"},
+            {"metric_name": "Average rent", "value": "40 million rials\nper month", "source": "a | b"},
+        ]
+    }
+    assert serialize_for_prompt(data, token_budget=None).splitlines() == [
+        "key_market_data:",
+        "  metric_name | value | region | source",
+        "  Median price | 85 billion rials | District 1 | ",
+        # Cells stay on their row, and pipes inside them cannot break the columns
+        "  Average rent | 40 million rials per month |  | a / b",
+    ]
+
+
+def test_persian_text_is_not_escaped():
+    assert serialize_for_prompt({"location": "تهران، منطقه ۱"}, token_budget=None) == "location: تهران، منطقه ۱"
+
+
+def test_output_fits_the_token_budget():
+    data = {"listings": [{"description": "apartment " * 200, "price": str(i)} for i in range(50)]}
+    text = serialize_for_prompt(data, token_budget=300)
+    assert len(text) <= 300 * 4 + len("\n... [truncated]")
+    assert "more" in text
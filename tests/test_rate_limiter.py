@@ -0,0 +1,129 @@
+"""
+Tests for the provider rate limiter: token buckets, circuit breaking and backoff
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.utils.rate_limiter import (
+    CircuitBreaker,
+    ProviderLimiter,
+    ProviderUnavailableError,
+    TokenBucket,
+)
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("too many requests")
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+def test_token_bucket_waits_once_empty():
+    bucket = TokenBucket(60)  # one token per second
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+
+
+def test_breaker_open_half_open_closed():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.admit() == "probe"
+    # Only one probe at a time
+    assert breaker.admit() is None
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.admit() == "call"
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.admit() == "probe"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    limiter = ProviderLimiter("test", max_retries=0, failure_threshold=1, reset_timeout=0.05)
+
+    async def fail():
+        raise ServerError("down")
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def succeed():
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(ServerError):
+            await limiter.acall(fail)
+        with pytest.raises(ProviderUnavailableError):
+            await limiter.acall(succeed)
+
+        await asyncio.sleep(0.06)
+        probe = asyncio.create_task(limiter.acall(hang))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        # The cancelled probe proved nothing; the next call probes and closes the breaker
+        assert await limiter.acall(succeed) == "ok"
+        assert limiter.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_retries_transient_failures():
+    limiter = ProviderLimiter("test", max_retries=3, base_delay=0.001, max_delay=0.01)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ServerError("try again")
+        return "ok"
+
+    assert asyncio.run(limiter.acall(flaky)) == "ok"
+    assert len(attempts) == 3
+
+
+def test_backoff_is_jittered_within_the_exponential_cap():
+    limiter = ProviderLimiter("test", base_delay=1.0, max_delay=5.0)
+    for attempt in range(6):
+        cap = min(5.0, 2 ** attempt)
+        delays = [limiter._backoff(attempt, ServerError("down")) for _ in range(200)]
+        assert all(0 <= delay <= cap for delay in delays)
+        # Full jitter spreads retries instead of synchronizing them
+        assert len(set(delays)) > 100
+
+
+def test_backoff_honours_retry_after():
+    limiter = ProviderLimiter("test", max_delay=30.0)
+    assert limiter._backoff(0, ThrottledError(7)) == 7.0
+    assert limiter._backoff(0, ThrottledError(120)) == 30.0
@@ -0,0 +1,118 @@
+"""
+Tests for the semantic report cache and the partial results it must not store
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import numpy as np
+import pytest
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.utils import report_cache
+from src.agents.utils.report_cache import ReportCache, is_cacheable, work_order_constraints, work_order_text
+
+WORK_ORDER = {
+    "client_type": "Investor",
+    "primary_task": "buy",
+    "processed_query": "Two bedroom apartment in Tehran District 1 for investment",
+    "key_information": {"location": "Tehran", "timeline": "6 months"},
+    "property_specs": {"property_type": "apartment"},
+}
+ADVICE = {"recommendation": "buy"}
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ReportCache(str(tmp_path / "report_cache.sqlite"))
+
+
+def test_constraints_are_normalized():
+    other = {**WORK_ORDER, "client_type": "  investor ", "key_information": {"location": "TEHRAN", "timeline": "6 months"}}
+    assert work_order_constraints(other) == work_order_constraints(WORK_ORDER)
+
+
+def test_hit_and_warm_match(cache):
+    cache.store(WORK_ORDER, unit(1, 0), "English", "2025-01-01", ADVICE, "the report")
+
+    hit = cache.lookup(WORK_ORDER, unit(1, 0.1), "English", "2025-01-01")
+    assert hit["kind"] == "hit" and hit["report"] == "the report"
+
+    # cos ~ 0.92: close enough to reuse the advice, not to serve the report
+    warm = cache.lookup(WORK_ORDER, unit(1, 0.42), "English", "2025-01-01")
+    assert warm["kind"] == "warm" and warm["report"] is None and warm["advice"] == ADVICE
+
+    assert cache.lookup(WORK_ORDER, unit(0, 1), "English", "2025-01-01") is None
+    assert (cache.hits, cache.warm_hits, cache.misses) == (1, 1, 1)
+
+
+def test_no_reuse_across_languages_or_report_dates(cache):
+    cache.store(WORK_ORDER, unit(1, 0), "English", "2025-01-01", ADVICE, "the report")
+    # Neither the report nor (for a warm match) its advice is in the requested language
+    assert cache.lookup(WORK_ORDER, unit(1, 0), "Persian", "2025-01-01") is None
+    assert cache.lookup(WORK_ORDER, unit(1, 0.42), "Persian", "2025-01-01") is None
+    assert cache.lookup(WORK_ORDER, unit(1, 0), "English", "2025-02-01") is None
+
+
+def test_no_reuse_when_a_constraint_differs(cache):
+    cache.store(WORK_ORDER, unit(1, 0), "English", "2025-01-01", ADVICE, "the report")
+    other_city = {**WORK_ORDER, "key_information": {"location": "Karaj", "timeline": "6 months"}}
+    assert cache.lookup(other_city, unit(1, 0), "English", "2025-01-01") is None
+
+
+def test_failed_query_understanding_skips_the_cache(monkeypatch):
+    # The fallback work order of query_understanding_agent when its output cannot be parsed
+    fallback = {"client_type": "unknown", "request_type": "unknown", "key_info": {"query": "Villa in Karaj"}}
+    assert work_order_text(fallback) == "villa in karaj"
+    assert not is_cacheable(fallback)
+    assert is_cacheable(WORK_ORDER)
+
+    def embed(text):
+        raise AssertionError("vague work orders must not be embedded")
+
+    class Cache:
+        pass
+
+    fake = Cache()
+    fake.embed = embed
+    monkeypatch.setattr(report_cache, "REPORT_CACHE_ENABLED", True)
+    monkeypatch.setattr(report_cache, "get_report_cache", lambda: fake)
+    # No match, and no embedding to store the report under
+    assert asyncio.run(report_cache.find_cached_report(fallback, "English", "2025-01-01")) == (None, None)
+
+
+def test_expired_reports_are_not_served(cache, monkeypatch):
+    cache.store(WORK_ORDER, unit(1, 0), "English", "2025-01-01", ADVICE, "the report")
+    later = time.time() + 48 * 3600
+    monkeypatch.setattr(report_cache.time, "time", lambda: later)
+    # Too old to serve (24h), recent enough to reuse the advice (72h)
+    assert cache.lookup(WORK_ORDER, unit(1, 0), "English", "2025-01-01")["kind"] == "warm"
+
+
+def test_region_comparison_missing_a_region_is_partial(monkeypatch):
+    region_comparison = pytest.importorskip("src.agents.analysis.region_comparison")
+    from src.agents.utils.deadline import Deadline
+
+    async def run_field_researcher(topic, report_date=None, deadline=None):
+        if topic == "Karaj":
+            raise RuntimeError("search failed")
+        return {"structured_data": {}, "summary": f"{topic} summary", "full_report": topic}
+
+    monkeypatch.setattr(region_comparison, "run_field_researcher", run_field_researcher)
+    deadline = Deadline()
+    merged = asyncio.run(region_comparison.run_region_comparison(["Tehran", "Karaj"], lambda region: region, deadline=deadline))
+
+    assert merged["errors"] == {"Karaj": "search failed"}
+    assert merged["degraded"]
+    # main only caches reports of runs that are not partial
+    assert deadline.is_partial
+    assert [item["stage"] for item in deadline.degradations] == ["region_comparison"]
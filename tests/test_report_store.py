@@ -0,0 +1,219 @@
+"""
+Tests for the SQLite report store: pagination, retention, deletion, the read cache and search
+"""
+
+import os
+import sys
+import time
+import sqlite3
+
+import pytest
+
+# Add parent directory to Python path to find src module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import report_store as report_store_module
+from backend.report_store import ReportStore, build_match_query, build_snippet, compress, normalize_for_search
+
+
+def make_report(report_id, query="Tehran apartments", language="English", client_type="investor", report="The report."):
+    return {
+        "report_id": report_id,
+        "query": query,
+        "report": report,
+        "language": language,
+        "work_order": {"client_type": client_type},
+    }
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "reports.sqlite")
+
+
+@pytest.fixture
+def store(db_path):
+    return ReportStore(db_path)
+
+
+def test_round_trip_is_compressed(store):
+    body = "Apartment prices in Tehran rose. " * 500
+    store.put(make_report("r1", report=body))
+    assert store.get("r1")["report"] == body
+    assert store.stats()["stored_bytes"] < len(body) / 10
+    assert store.get("missing") is None
+
+
+def test_cursor_pagination_visits_every_report_once(store, monkeypatch):
+    # Several reports share a creation time; the report id breaks the tie
+    clock = iter([100.0, 100.0, 100.0, 101.0, 102.0, 102.0, 103.0])
+    monkeypatch.setattr(report_store_module.time, "time", lambda: next(clock))
+    for index in range(7):
+        store.put(make_report(f"r{index}"))
+
+    seen, cursor, total_counts = [], None, []
+    while True:
+        page, cursor, total_count = store.list(limit=3, cursor=cursor)
+        total_counts.append(total_count)
+        seen.extend(report["report_id"] for report in page)
+        if cursor is None:
+            break
+    assert seen == ["r6", "r5", "r4", "r3", "r2", "r1", "r0"]
+    # Only the first page is counted unless asked
+    assert total_counts == [7, None, None]
+    _, next_cursor, _ = store.list(limit=3)
+    assert store.list(limit=3, cursor=next_cursor, with_total=True)[2] == 7
+    assert store.list(limit=3, with_total=False)[2] is None
+
+
+def test_pagination_filters(store):
+    store.put(make_report("en", language="English"))
+    store.put(make_report("fa", language="Persian", client_type="developer"))
+    page, cursor, total_count = store.list(language="Persian")
+    assert [report["report_id"] for report in page] == ["fa"] and cursor is None and total_count == 1
+    page, _, _ = store.list(client_type="investor")
+    assert [report["report_id"] for report in page] == ["en"]
+
+
+def test_malformed_cursor_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.list(cursor="not-a-cursor")
+
+
+def test_retention_by_age_and_count(db_path, monkeypatch):
+    store = ReportStore(db_path)
+    now = time.time()
+    for index, age_days in enumerate([100, 10, 5, 1]):
+        monkeypatch.setattr(report_store_module.time, "time", lambda: now - age_days * 86400)
+        store.put(make_report(f"r{index}"))
+    monkeypatch.setattr(report_store_module.time, "time", lambda: now)
+
+    monkeypatch.setattr(report_store_module, "REPORT_RETENTION_DAYS", 90)
+    monkeypatch.setattr(report_store_module, "REPORT_MAX_COUNT", 2)
+    assert store.apply_retention() == 2
+    assert [report["report_id"] for report in store.list()[0]] == ["r3", "r2"]
+    assert store.get("r0") is None and store.get("r1") is None
+
+
+def test_delete(store):
+    store.put(make_report("r1"))
+    store.get("r1")
+    assert store.delete("r1")
+    assert store.get("r1") is None
+    assert not store.delete("r1")
+    assert store.list()[2] == 0
+
+
+def test_cached_report_deleted_by_another_worker_is_not_served(db_path):
+    reader, other_worker = ReportStore(db_path), ReportStore(db_path)
+    reader.put(make_report("r1", report="first version"))
+    assert reader.get("r1")["report"] == "first version"
+    assert reader.get("r1")["report"] == "first version"
+    assert reader.cache_hits == 1
+
+    other_worker.put(make_report("r1", report="second version"))
+    assert reader.get("r1")["report"] == "second version"
+
+    assert other_worker.delete("r1")
+    assert reader.get("r1") is None
+
+
+def test_persian_normalization():
+    # Arabic yeh and kaf, a diacritic, a zero-width non-joiner and Persian digits
+    assert normalize_for_search("كيفيت مَسكن\u200cها در منطقه ۱۲") == "کیفیت مسکن ها در منطقه 12"
+    assert build_match_query("  ؟ ") is None
+    assert build_match_query("منطقه ۱۲") == '"منطقه"* OR "12"'
+
+
+def test_search_finds_persian_variants(store):
+    store.put(make_report("fa", query="خرید آپارتمان در منطقه ۱", language="Persian",
+                          report="قیمت مسکن\u200cها در منطقهٔ یک افزایش یافت"))
+    store.put(make_report("en", query="Office space in Karaj"))
+    # Typed with Arabic letter forms and ASCII digits
+    results = store.search("آپارتمان منطقه 1")
+    assert [result["report_id"] for result in results] == ["fa"]
+    assert store.search("مسكن")[0]["report_id"] == "fa"
+    assert store.search("apartment", language="Persian") == []
+
+
+def test_snippets_keep_the_original_text():
+    report = "در سال ۱۴۰۲ قیمت مسكن\u200cها در منطقهٔ یک افزایش یافت. " + "جمله دیگر. " * 40
+    # Matched with Persian letter forms and ASCII digits, shown as written
+    snippet = build_snippet(report, ["مسکن", "1402"], size=8)
+    assert snippet == "در سال **۱۴۰۲** قیمت **مسكن**\u200cها در منطقهٔ…"
+    later = build_snippet("Intro. " * 30 + "Villas in Karaj are cheap.", ["karaj"], size=5)
+    assert later == "…Intro. Villas in **Karaj** are…"
+
+
+def test_search_index_keeps_no_copy_of_the_reports(store):
+    store.put(make_report("r1", report="Villas in Karaj"))
+    tables = {row[0] for row in store._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "reports_fts" in tables and "reports_fts_content" not in tables
+    assert store.search("karaj")[0]["snippet"] == "Villas in **Karaj**"
+
+
+def test_search_ranks_query_matches_above_body_matches(store):
+    store.put(make_report("body", query="Market overview", report="A short note about Karaj villas."))
+    store.put(make_report("query", query="Karaj villas for investors", report="Prices rose."))
+    # Enough other reports for the search terms to be rare (bm25 ignores terms most documents have)
+    for index in range(6):
+        store.put(make_report(f"unrelated{index}", query="Tehran offices", report="Prices fell."))
+    results = store.search("karaj villas")
+    assert [result["report_id"] for result in results] == ["query", "body"]
+    assert results[0]["score"] > results[1]["score"]
+    assert store.search("karaj")[1]["snippet"] == "A short note about **Karaj** villas."
+
+
+def test_search_index_follows_replacements_and_deletions(store):
+    store.put(make_report("r1", report="Villas in Karaj"))
+    store.put(make_report("r1", report="Offices in Tehran"))
+    store.put(make_report("r2", report="Karaj land"))
+    assert [result["report_id"] for result in store.search("karaj")] == ["r2"]
+    store.delete("r2")
+    assert store.search("karaj") == []
+    assert [result["report_id"] for result in store.search("offices")] == ["r1"]
+
+
+def test_store_without_integer_ids_is_migrated_and_indexed(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """CREATE TABLE reports (
+            report_id TEXT PRIMARY KEY, query TEXT NOT NULL, language TEXT, client_type TEXT,
+            timestamp TEXT NOT NULL, created_at REAL NOT NULL, work_order TEXT,
+            codec TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL
+        )"""
+    )
+    codec, body = compress("Villas in Karaj")
+    conn.execute(
+        "INSERT INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ("old", "Karaj villas", "English", None, "2025-01-01T00:00:00", time.time(), None, codec, body, 15)
+    )
+    conn.commit()
+    conn.close()
+
+    store = ReportStore(db_path)
+    assert store.get("old")["report"] == "Villas in Karaj"
+    assert [result["report_id"] for result in store.search("karaj")] == ["old"]
+    store.put(make_report("new", query="Karaj land"))
+    assert store.delete("old")
+    assert [result["report_id"] for result in store.search("karaj")] == ["new"]
+
+
+def test_search_index_with_a_copy_of_the_reports_is_rebuilt(db_path):
+    store = ReportStore(db_path)
+    store.put(make_report("r1", report="Villas in Karaj"))
+    # The index as it was before it became contentless, kept in step by a trigger
+    store._conn.executescript(
+        """DROP TABLE reports_fts;
+        CREATE VIRTUAL TABLE reports_fts USING fts5(query, work_order, report, tokenize = 'unicode61 remove_diacritics 2');
+        CREATE TRIGGER reports_fts_delete AFTER DELETE ON reports BEGIN
+            DELETE FROM reports_fts WHERE rowid = old.id;
+        END;"""
+    )
+    store._conn.close()
+
+    store = ReportStore(db_path)
+    assert [result["report_id"] for result in store.search("karaj")] == ["r1"]
+    assert store.delete("r1")
+    assert store.search("karaj") == []
+    assert store._conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0] == 0